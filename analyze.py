@@ -0,0 +1,259 @@
+"""
+Analyse hors ligne de vidéos enregistrées, sans interface
+
+Même détection et même suivi que l'application, un processus par fichier,
+décodage aussi rapide que possible. Pour chaque vidéo sont écrits :
+  <nom>_comptages.json      comptages (total, classes, voies, lignes, zones, intervalles)
+  <nom>_vitesses.csv        vitesse moyenne et maximale de chaque objet suivi
+  <nom>_trajectoires.csv    boîtes et vitesse de chaque objet à chaque détection
+ainsi qu'un résumé de toutes les vidéos (resume.csv)
+
+Usage : python analyze.py videos/ autre.mp4 [--output analyses] [--workers 4]
+"""
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import os
+import time
+import cv2
+from tracker import create_tracker, TRACKER_MODES
+from calibration import load_calibrations
+from counting import load_counters, DEFAULT_CLASS
+from roi import load_rois
+from pipeline import DirectionPipeline, frame_timestamp
+from scheduler import FrameScheduler
+from detectors import create_detector, InferenceWorker, DETECTOR_MODES
+from camera_config import load_display_settings, CONFIG_FILE
+
+# Extensions reconnues lors du parcours des répertoires
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v')
+
+
+def find_videos(paths):
+    """
+    Liste les vidéos à analyser : fichiers donnés et vidéos des répertoires (récursivement)
+    """
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                videos.extend(os.path.join(root, name) for name in sorted(files)
+                              if name.lower().endswith(VIDEO_EXTENSIONS))
+        elif os.path.isfile(path):
+            videos.append(path)
+        else:
+            print(f"Chemin ignoré (introuvable): {path}")
+    return videos
+
+
+def output_names(videos):
+    """
+    Nom de sortie unique de chaque vidéo (nom de fichier sans extension, suffixé si déjà pris)
+    """
+    names = {}
+    used = set()
+    for video_path in videos:
+        stem = os.path.splitext(os.path.basename(video_path))[0]
+        name, suffix = stem, 2
+        while name in used:
+            name, suffix = f"{stem}_{suffix}", suffix + 1
+        used.add(name)
+        names[video_path] = name
+    return names
+
+
+def analyze_video(video_path, name, options):
+    """
+    Analyse une vidéo dans le processus courant et écrit ses résultats dans options['output']
+    Retourne le résumé de l'analyse (une ligne de resume.csv)
+    """
+    # Un seul thread OpenCV par processus : le parallélisme vient des processus
+    cv2.setNumThreads(1)
+    started = time.perf_counter()
+    config = options['config']
+    key = os.path.basename(video_path)
+    videos = {key: video_path}
+
+    display = load_display_settings(videos, config)[key]
+    display_width, display_height = display['size']
+    tracker = create_tracker(options['tracker'])
+    calibration = load_calibrations(videos, config).get(key)
+    if calibration is not None:
+        tracker.ground_lookup = calibration.lookup(display_width, display_height)
+    counter = load_counters(videos, size=display['size'], path=config)[key]
+    roi = load_rois(videos, {key: display['detection_size']}, config)[key]
+
+    inference_worker = None
+    if options['detector'] == 'dnn':
+        inference_worker = InferenceWorker(options['model'])
+        inference_worker.start()
+    # Hors ligne, le détecteur DNN attend chaque résultat : aucune frame n'est remplacée
+    detector = create_detector(options['detector'], key, display_size=display['size'],
+                               detection_size=display['detection_size'], roi=roi,
+                               inference_worker=inference_worker, wait=True)
+    pipeline = DirectionPipeline(key, (0, 255, 0), tracker, display_size=display['size'],
+                                 detector=detector, draw=False)
+
+    summary = {'video': video_path, 'name': name, 'frames': 0, 'detections': 0, 'duration': 0.0,
+               'total': 0, 'average_speed': None, 'elapsed': 0.0, 'error': None}
+    # Objets suivis : id -> [classe, voie, première vue, dernière vue, somme, nombre, maximum des vitesses]
+    tracks = {}
+
+    cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+    trajectories_path = os.path.join(options['output'], f"{name}_trajectoires.csv")
+    try:
+        if not cap.isOpened():
+            raise IOError(f"Impossible d'ouvrir la vidéo {video_path}")
+        source_fps = cap.get(cv2.CAP_PROP_FPS)
+        if not source_fps or source_fps <= 0:
+            source_fps = 25.0
+        # Sans cadencement ni abandon : l'intervalle de détection reste fixe
+        scheduler = FrameScheduler(source_fps, interval=options['interval'], realtime=False)
+        frame_index = 0
+        media_time = 0.0
+
+        with open(trajectories_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['timestamp', 'id', 'x', 'y', 'w', 'h', 'speed', 'class', 'lane'])
+
+            while cap.grab():
+                frame_index += 1
+                media_time = frame_timestamp(cap, frame_index, source_fps)
+                # Seules les frames détectées sont converties
+                if not scheduler.should_detect():
+                    continue
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                frame = cv2.resize(frame, (display_width, display_height))
+
+                result = detector.detect(frame, media_time)
+                if result is None:
+                    # Inférence en cours : pas de nouvelle position
+                    continue
+                detections, classes, detected_at = result
+                tracked_objects = pipeline.track(frame, detections, detected_at, classes)
+                counter.update(tracked_objects, detected_at, classes=pipeline.last_classes,
+                               lanes=pipeline.last_lanes)
+                summary['detections'] += 1
+
+                for row, object_class, lane in zip(tracked_objects, pipeline.last_classes, pipeline.last_lanes):
+                    x, y, w, h, object_id, speed = row
+                    object_class = object_class or DEFAULT_CLASS
+                    writer.writerow([round(detected_at, 3), object_id, x, y, w, h, round(speed, 1),
+                                     object_class, lane or ''])
+                    track = tracks.get(object_id)
+                    if track is None:
+                        track = tracks[object_id] = [object_class, lane, detected_at, detected_at, 0.0, 0, 0.0]
+                    track[0] = object_class
+                    track[1] = track[1] or lane
+                    track[3] = detected_at
+                    if speed > 0:
+                        track[4] += speed
+                        track[5] += 1
+                        track[6] = max(track[6], speed)
+
+        summary['frames'] = frame_index
+        summary['duration'] = round(media_time, 2)
+    except Exception as e:
+        summary['error'] = str(e)
+    finally:
+        cap.release()
+        if inference_worker is not None:
+            inference_worker.stop()
+
+    # Vitesses par objet (objets dont la vitesse a pu être mesurée)
+    speeds = []
+    with open(os.path.join(options['output'], f"{name}_vitesses.csv"), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'class', 'lane', 'first_seen', 'last_seen', 'average_speed', 'max_speed'])
+        for object_id, (object_class, lane, first, last, total, count, maximum) in sorted(tracks.items()):
+            if not count:
+                continue
+            speeds.append(total / count)
+            writer.writerow([object_id, object_class, lane or '', round(first, 3), round(last, 3),
+                             round(total / count, 1), round(maximum, 1)])
+
+    summary['total'] = counter.total
+    summary['average_speed'] = round(sum(speeds) / len(speeds), 1) if speeds else None
+    summary['elapsed'] = round(time.perf_counter() - started, 2)
+    counts = {
+        'video': video_path,
+        'frames': summary['frames'],
+        'duration': summary['duration'],
+        'average_speed': summary['average_speed'],
+        # Intervalles d'agrégation horodatés en secondes depuis le début de la vidéo
+        **counter.snapshot(),
+        'intervals': counter.intervals(),
+        'error': summary['error']
+    }
+    with open(os.path.join(options['output'], f"{name}_comptages.json"), 'w', encoding='utf-8') as f:
+        json.dump(counts, f, indent=2, ensure_ascii=False)
+    return summary
+
+
+def _analyze_task(task):
+    video_path, name, _ = task
+    try:
+        return analyze_video(*task)
+    except Exception as e:
+        # Configuration ou modèle invalide : les autres vidéos sont tout de même analysées
+        return {'video': video_path, 'name': name, 'frames': 0, 'detections': 0, 'duration': 0.0,
+                'total': 0, 'average_speed': None, 'elapsed': 0.0, 'error': str(e)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse hors ligne de vidéos de trafic")
+    parser.add_argument('paths', nargs='+', help="fichiers vidéo ou répertoires")
+    parser.add_argument('--output', default='analyses', help="répertoire des résultats")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="nombre de processus (un fichier par processus)")
+    parser.add_argument('--tracker', default='euclidean', choices=TRACKER_MODES)
+    parser.add_argument('--detector', default='mog2', choices=DETECTOR_MODES)
+    parser.add_argument('--model', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                        'models', 'yolov8n.onnx'),
+                        help="modèle ONNX du détecteur 'dnn'")
+    parser.add_argument('--interval', type=int, default=2, help="détection toutes les N frames")
+    parser.add_argument('--config', default=CONFIG_FILE, help="configuration des caméras")
+    args = parser.parse_args()
+
+    videos = find_videos(args.paths)
+    if not videos:
+        parser.error("aucune vidéo à analyser")
+    os.makedirs(args.output, exist_ok=True)
+    options = {
+        'output': args.output,
+        'tracker': args.tracker,
+        'detector': args.detector,
+        'model': args.model,
+        'interval': max(args.interval, 1),
+        'config': args.config
+    }
+    names = output_names(videos)
+    tasks = [(video_path, names[video_path], options) for video_path in videos]
+
+    started = time.perf_counter()
+    summaries = []
+    # 'spawn' : même comportement sous Windows et Linux
+    context = mp.get_context('spawn')
+    with context.Pool(min(max(args.workers, 1), len(tasks))) as pool:
+        for summary in pool.imap_unordered(_analyze_task, tasks):
+            summaries.append(summary)
+            if summary['error']:
+                print(f"{summary['name']}: erreur - {summary['error']}")
+            else:
+                print(f"{summary['name']}: {summary['total']} objets, {summary['frames']} frames "
+                      f"en {summary['elapsed']:.1f}s ({summary['frames'] / max(summary['elapsed'], 1e-6):.0f} fps)")
+
+    summaries.sort(key=lambda summary: videos.index(summary['video']))
+    with open(os.path.join(args.output, 'resume.csv'), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(summaries[0]))
+        writer.writeheader()
+        writer.writerows(summaries)
+    print(f"{len(videos)} vidéo(s) analysée(s) en {time.perf_counter() - started:.1f}s -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
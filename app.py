@@ -6,86 +6,147 @@ import time
 import threading
 import json
 from datetime import datetime, timedelta
-import numpy as np
-from tracker import EuclideanDistTracker
+from tracker import create_tracker, TRACKER_MODES
+from calibration import load_calibrations
+from counting import load_counters
+from roi import load_rois
+from pipeline import DirectionPipeline, frame_timestamp
+from workers import DetectionWorkerPool
+from frame_ring import FrameRing
+from scheduler import FrameScheduler
+from batching import BatchPreprocessor
+from detectors import create_detector, InferenceWorker, DETECTOR_MODES
+from detection_cache import open_cache
+from camera_config import load_display_settings
+from streams import StreamUsage, STREAM_COLORS, stream_memory
+from broadcast import FrameBroadcaster, ClientProfile, MosaicBroadcaster
+from notify import Notifier
+from overlay import OverlayRenderer
 from traffic_manager import TrafficManager
-from queue import Queue
 
 app = Flask(__name__)
 
-# Variables globales pour chaque direction
-frames_global = {
-    'nord': None,
-    'sud': None,
-    'est': None,
-    'ouest': None
-}
-objets_detectes = {
-    'nord': set(),
-    'sud': set(),
-    'est': set(),
-    'ouest': set()
-}
-# Stockage des vitesses pour chaque direction
-vitesses_moyennes = {
-    'nord': 0,
-    'sud': 0,
-    'est': 0,
-    'ouest': 0
-}
+# Variables globales pour chaque flux (une direction par flux), remplies par add_stream()
+frames_global = {}
+# Stockage des vitesses pour chaque flux
+vitesses_moyennes = {}
 # Compteurs d'objets en temps réel sur l'image
-compteurs_temps_reel = {
-    'nord': 0,
-    'sud': 0,
-    'est': 0,
-    'ouest': 0
-}
+compteurs_temps_reel = {}
 donnees_csv = []
 csv_file = "static/resultats.csv"
 stop_thread = False
 processing_active = False
-video_ended = {
-    'nord': False,
-    'sud': False,
-    'est': False,
-    'ouest': False
-}
+# Signalé à chaque démarrage ou arrêt du traitement (réveille le thread de détection)
+processing_changed = Notifier()
+video_ended = {}
 
 # Variable pour stocker les captures vidéo
 caps = {}
 
 # Historical data storage
-historical_data = {
-    'nord': [],
-    'sud': [],
-    'est': [],
-    'ouest': []
-}
+historical_data = {}
 
 last_record_time = datetime.now()
 
 record_interval = 10
 
-# Initialisation du gestionnaire de trafic
-traffic_manager = TrafficManager()
+# Lecture au rythme réel (True) ou aussi vite que possible pour les fichiers enregistrés (False)
+# Les vitesses sont calculées sur le temps média de la vidéo, elles restent justes dans les deux cas
+replay_realtime = True
+# Instant de référence pour horodater les données historiques en temps média
+replay_origin = time.time()
+
+# Retard maximal toléré (secondes) entre l'heure prévue d'une frame et sa publication;
+# au-delà, des frames sont abandonnées et l'intervalle de détection augmente
+latency_budget = 0.2
+# État du cadencement de chaque direction (intervalle de détection, frames abandonnées...)
+planification = {}
+
+# Prétraitement par lot (mode threads) : redimensionnement, gris, seuillage et morphologie
+# des frames courantes de toutes les directions en une opération par tick
+batch_preprocessing = False
+batch_preprocessor = BatchPreprocessor()
 
-# Initialisation des trackers pour chaque direction
-trackers = {
-    'nord': EuclideanDistTracker(),
-    'sud': EuclideanDistTracker(),
-    'est': EuclideanDistTracker(),
-    'ouest': EuclideanDistTracker()
+# Cache des détections (répertoire cache/) : une vidéo déjà traitée avec les mêmes paramètres
+# de détection et de suivi est rejouée sans détection; tout changement de paramètre invalide le cache
+use_detection_cache = False
+
+# Mode de suivi par direction ('euclidean', 'kalman' ou 'iou')
+# Le mode 'kalman' associe sur les positions prédites et tolère un intervalle de traitement plus grand
+# Le mode 'iou' associe par recouvrement des boîtes (camions et motos côte à côte)
+tracker_modes = {
+    'nord': 'euclidean',
+    'sud': 'euclidean',
+    'est': 'euclidean',
+    'ouest': 'euclidean'
 }
 
-# Configuration des vidéos
-videos = {
+# Mode de détection par direction ('mog2' ou 'dnn')
+# Le mode 'dnn' classe les véhicules (voiture, moto, bus, camion) avec un modèle YOLO ONNX sur CPU;
+# l'inférence des directions concernées est regroupée dans un seul thread
+detector_modes = {
+    'nord': 'mog2',
+    'sud': 'mog2',
+    'est': 'mog2',
+    'ouest': 'mog2'
+}
+dnn_model_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'yolov8n.onnx')
+inference_worker = None
+inference_lock = threading.Lock()
+
+# Flux configurés au démarrage (identifiant -> vidéo)
+# D'autres flux peuvent être ajoutés, retirés ou reconfigurés à chaud (routes /streams)
+default_streams = {
     'nord': "static/vd1.mp4",
     'sud': "static/vd2.mp4",
     'est': "static/vd3.mp4",
     'ouest': "static/vd4.mp4"
 }
 
-# Couleurs pour l'affichage (BGR)
+# Registre des flux : identifiant -> vidéo
+# Un flux n'y apparaît qu'une fois toutes ses structures créées (voir add_stream)
+videos = {}
+# Protège le registre pendant les ajouts/retraits et les agrégations sur tous les flux
+streams_lock = threading.RLock()
+
+# Initialisation du gestionnaire de trafic (une approche du carrefour par flux)
+traffic_manager = TrafficManager(default_streams)
+
+# Résolutions par flux (section 'display' de cameras.json) : affichage, encodage et détection
+affichages = {}
+
+def frame_shape(direction):
+    """
+    Forme des frames diffusées d'une direction (barre de titre de 30 px + image affichée)
+    """
+    display_width, display_height = affichages[direction]['size']
+    return (display_height + 30, display_width, 3)
+
+# Calibrations par homographie (cameras.json), indexées par flux
+calibrations = {}
+
+def build_tracker(direction):
+    """
+    Crée le tracker d'une direction avec sa calibration éventuelle
+    """
+    tracker = create_tracker(tracker_modes[direction])
+    if direction in calibrations:
+        # Coordonnées du tracker exprimées dans l'image affichée
+        tracker.ground_lookup = calibrations[direction].lookup(*affichages[direction]['size'])
+    return tracker
+
+# Trackers de chaque flux
+trackers = {}
+
+# Compteurs de passage (lignes/zones virtuelles de cameras.json) dans l'image affichée
+# Leur taille reste constante quelle que soit la durée de fonctionnement
+compteurs_passage = {}
+
+# Voies de détection (section 'roi' de cameras.json) à la résolution de détection
+# Masques et recadrages précalculés une fois; les comptages sont aussi ventilés par voie
+rois = {}
+
+# Couleurs pour l'affichage (BGR); les flux ajoutés sans couleur prennent celles de STREAM_COLORS
 colors = {
     'nord': (0, 165, 255),  
     'sud': (0, 255, 0),     
@@ -94,19 +155,365 @@ colors = {
 }
 
 # Ajout des frames buffers 
-frame_buffers = {
-    'nord': Queue(maxsize=30),  
-    'sud': Queue(maxsize=30),
-    'est': Queue(maxsize=30),
-    'ouest': Queue(maxsize=30)
-}
+# Anneaux de frames préallouées (titre 30 px + image affichée) : écriture sur place,
+# lecture de la frame la plus récente sans copie, les plus anciennes sont écrasées
+frame_buffers = {}
+# Barres de titre et frames d'état en cache, tampon de sortie réutilisé de chaque flux
+overlays = {}
+
+# Pipeline en cours et thread de traitement de chaque flux (mode threads)
+pipelines = {}
+stream_threads = {}
+# Consommation CPU et mémoire de chaque flux
+stream_usage = {}
+# Diffuseurs MJPEG : chaque frame d'un flux est encodée une fois pour tous ses clients
+broadcasters = {}
+# Attente maximale d'un client MJPEG sans nouvelle frame (réveil anticipé à chaque frame écrite)
+frame_wait_timeout = 0.5
+# Renvoi de la frame d'attente d'un flux terminé (maintient la connexion des clients)
+idle_frame_interval = 1.0
+
+# Mosaïque de tous les flux (/mosaic_feed) : une connexion et un encodage par tick pour tous les flux
+mosaic_fps = 5.0
+mosaic_tile_size = (400, 330)
+mosaic_quality = 80
+
+# Mode multi-processus : décodage + détection + suivi de chaque direction dans son propre processus
+# Les frames annotées reviennent par mémoire partagée, les détections par une file légère
+use_process_workers = False
+worker_pool = DetectionWorkerPool()
+
+def get_inference_worker():
+    """
+    Thread d'inférence DNN partagé, créé au premier besoin
+    Retourne None si le modèle ne peut pas être chargé
+    """
+    global inference_worker
+    with inference_lock:
+        if inference_worker is None:
+            try:
+                inference_worker = InferenceWorker(dnn_model_path)
+            except cv2.error as e:
+                print(f"Modèle DNN indisponible ({dnn_model_path}): {e}")
+                return None
+        inference_worker.start()
+        return inference_worker
+
+def build_detector(direction):
+    """
+    Crée le détecteur d'une direction; repli sur MOG2 si le modèle DNN est indisponible
+    """
+    mode = detector_modes[direction]
+    worker = get_inference_worker() if mode == 'dnn' else None
+    if mode == 'dnn' and worker is None:
+        print(f"Direction {direction}: repli sur la détection MOG2")
+        mode = 'mog2'
+    return create_detector(mode, direction,
+                           display_size=affichages[direction]['size'],
+                           detection_size=affichages[direction]['detection_size'],
+                           roi=rois[direction], inference_worker=worker)
+
+def check_stream_modes(tracker_mode, detector_mode):
+    """
+    Vérifie les modes de suivi et de détection demandés pour un flux
+    """
+    if tracker_mode is not None and tracker_mode not in TRACKER_MODES:
+        raise ValueError(f"Mode de suivi inconnu: {tracker_mode}. Options: {', '.join(TRACKER_MODES)}")
+    if detector_mode is not None and detector_mode not in DETECTOR_MODES:
+        raise ValueError(f"Mode de détection inconnu: {detector_mode}. Options: {', '.join(DETECTOR_MODES)}")
+
+def add_stream(stream_id, video_path, color=None, tracker_mode=None, detector_mode=None):
+    """
+    Ajoute un flux au registre : affichage, calibration, tracker, compteurs, voies,
+    anneau de frames, consommation et approche du carrefour régulé
+    Le flux démarre aussitôt si le traitement est en cours
+    """
+    if not stream_id or not all(c.isalnum() or c in '_-' for c in stream_id):
+        raise ValueError(f"Identifiant de flux invalide: {stream_id!r}")
+    check_stream_modes(tracker_mode, detector_mode)
+    
+    # Configuration de la caméra (cameras.json), lue hors du verrou
+    sources = {stream_id: video_path}
+    settings = load_display_settings(sources)[stream_id]
+    calibration = load_calibrations(sources).get(stream_id)
+    counter = load_counters(sources, size=settings['size'])[stream_id]
+    roi = load_rois(sources, {stream_id: settings['detection_size']})[stream_id]
+    
+    with streams_lock:
+        if stream_id in videos:
+            raise ValueError(f"Flux déjà existant: {stream_id}")
+        affichages[stream_id] = settings
+        if calibration is not None:
+            calibrations[stream_id] = calibration
+        else:
+            calibrations.pop(stream_id, None)
+        if color is not None:
+            colors[stream_id] = tuple(int(c) for c in color)
+        elif stream_id not in colors:
+            colors[stream_id] = STREAM_COLORS[len(videos) % len(STREAM_COLORS)]
+        tracker_modes[stream_id] = tracker_mode or tracker_modes.get(stream_id, 'euclidean')
+        detector_modes[stream_id] = detector_mode or detector_modes.get(stream_id, 'mog2')
+        trackers[stream_id] = build_tracker(stream_id)
+        compteurs_passage[stream_id] = counter
+        rois[stream_id] = roi
+        frame_buffers[stream_id] = FrameRing(frame_shape(stream_id))
+        overlays[stream_id] = OverlayRenderer(settings['size'])
+        frames_global[stream_id] = None
+        vitesses_moyennes[stream_id] = 0
+        compteurs_temps_reel[stream_id] = 0
+        video_ended[stream_id] = False
+        historical_data[stream_id] = []
+        stream_usage[stream_id] = StreamUsage()
+        broadcasters[stream_id] = FrameBroadcaster(lambda: frame_ring(stream_id),
+                                                   lambda frame, quality, scale: encode_frame(stream_id, frame, quality, scale))
+        traffic_manager.add_approach(stream_id)
+        # En dernier : le flux devient visible des boucles sur le registre
+        videos[stream_id] = video_path
+    
+    if processing_active and not stop_thread:
+        start_stream(stream_id)
+
+def remove_stream(stream_id):
+    """
+    Arrête un flux puis le retire du registre et du carrefour régulé
+    """
+    with streams_lock:
+        if stream_id not in videos:
+            raise KeyError(stream_id)
+        # D'abord invisible des boucles sur le registre
+        del videos[stream_id]
+    
+    # Attente de la fin du thread ou du processus hors du verrou
+    thread = stream_threads.get(stream_id)
+    stop_stream(stream_id)
+    worker_pool.remove(stream_id)
+    # Le thread de traitement lit le registre du flux jusqu'à sa fin : pas de retrait avant
+    while thread is not None and thread.is_alive() and thread is not threading.current_thread():
+        print(f"Attente de la fin du traitement du flux {stream_id}...")
+        thread.join(1.0)
+    
+    with streams_lock:
+        # Les clients MJPEG du flux se terminent sans attendre leur échéance
+        frame_written(stream_id)
+        for registry in (affichages, calibrations, colors, tracker_modes, detector_modes, trackers,
+                         compteurs_passage, rois, frame_buffers, overlays, frames_global, vitesses_moyennes,
+                         compteurs_temps_reel, video_ended, historical_data, stream_usage,
+                         broadcasters, planification, pipelines, caps):
+            registry.pop(stream_id, None)
+        traffic_manager.remove_approach(stream_id)
+
+def configure_stream(stream_id, video_path=None, color=None, tracker_mode=None, detector_mode=None):
+    """
+    Reconfigure un flux (vidéo, couleur, modes de suivi et de détection)
+    Le flux est retiré puis ajouté à nouveau : ses comptages repartent de zéro
+    """
+    check_stream_modes(tracker_mode, detector_mode)
+    with streams_lock:
+        if stream_id not in videos:
+            raise KeyError(stream_id)
+        config = stream_config(stream_id)
+    remove_stream(stream_id)
+    add_stream(stream_id, video_path or config['video'],
+               color=color if color is not None else config['color'],
+               tracker_mode=tracker_mode or config['tracker_mode'],
+               detector_mode=detector_mode or config['detector_mode'])
+
+def start_stream(stream_id):
+    """
+    Démarre le traitement d'un flux (thread de traitement ou processus de détection)
+    """
+    video_ended[stream_id] = False
+    stream_usage[stream_id].begin()
+    if use_process_workers:
+        abs_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), videos[stream_id])
+        worker_pool.start(stream_id, abs_path, colors[stream_id],
+                          tracker_modes[stream_id], replay_realtime, latency_budget,
+                          frame_shape=frame_shape(stream_id),
+                          detection_size=affichages[stream_id]['detection_size'],
+                          detector_mode=detector_modes[stream_id],
+                          model_path=dnn_model_path,
+                          use_cache=use_detection_cache)
+        return
+    thread = threading.Thread(
+        target=process_video, 
+        args=(stream_id, videos[stream_id], trackers[stream_id]),
+        daemon=True
+    )
+    thread.start()
+    stream_threads[stream_id] = thread
+
+def stop_stream(stream_id, timeout=2.0):
+    """
+    Arrête le traitement d'un flux et attend la fin de son thread ou de son processus
+    """
+    video_ended[stream_id] = True
+    # Les clients MJPEG passent aussitôt à la frame d'attente
+    frame_written(stream_id)
+    worker_pool.stop(stream_id, timeout)
+    thread = stream_threads.pop(stream_id, None)
+    if thread is not None and thread is not threading.current_thread():
+        thread.join(timeout)
+
+def stream_usage_stats(stream_id):
+    """
+    Consommation CPU et mémoire d'un flux
+    En mode threads, la mémoire est mesurée ici (anneau de frames, pistes, masques, modèle de fond);
+    en mode multi-processus, elle est remontée par le processus avec sa mémoire résidente
+    """
+    usage = stream_usage[stream_id]
+    if not use_process_workers:
+        usage.memory_bytes = stream_memory(frame_buffers[stream_id], pipelines.get(stream_id))
+    return usage.stats()
+
+def stream_config(stream_id):
+    """
+    Configuration et état d'un flux
+    """
+    return {
+        'video': videos[stream_id],
+        'color': list(colors[stream_id]),
+        'tracker_mode': tracker_modes[stream_id],
+        'detector_mode': detector_modes[stream_id],
+        'display': affichages[stream_id]['size'],
+        'active': not video_ended[stream_id],
+        'usage': stream_usage_stats(stream_id),
+        'broadcast': broadcasters[stream_id].stats(),
+        'overlay': overlays[stream_id].stats()
+    }
+
+def mosaic_sources():
+    """
+    Anneaux de frames de tous les flux, dans l'ordre du registre
+    """
+    with streams_lock:
+        return [(direction, frame_ring(direction)) for direction in videos]
+
+mosaic = MosaicBroadcaster(mosaic_sources, fps=mosaic_fps, tile_size=mosaic_tile_size,
+                           quality=mosaic_quality)
+
+# Enregistrement des flux configurés au démarrage
+for direction, video_path in default_streams.items():
+    add_stream(direction, video_path)
+
+def publish_frame(direction, frame):
+    """
+    Publie une frame unique (fin, erreur...) comme frame la plus récente d'une direction
+    """
+    ring = frame_ring(direction)
+    if frame.shape != ring.shape:
+        frame = cv2.resize(frame, (ring.shape[1], ring.shape[0]))
+    ring.write(frame)
+    frame_written(direction)
+
+def frame_written(direction):
+    """
+    Réveille les clients MJPEG d'un flux après l'écriture d'une frame dans son anneau
+    """
+    broadcaster = broadcasters.get(direction)
+    if broadcaster is not None:
+        broadcaster.updated.notify()
+
+def frame_ring(direction):
+    """
+    Anneau de frames d'une direction (mémoire partagée en mode multi-processus)
+    """
+    if use_process_workers and direction in worker_pool.rings:
+        return worker_pool.rings[direction]
+    return frame_buffers[direction]
+
+def encode_frame(direction, frame, quality=None, scale=1.0):
+    """
+    Encode une frame en JPEG à la résolution et à la qualité d'encodage de la direction
+    quality, scale: profil d'un client (qualité JPEG, échelle de la résolution d'encodage)
+    """
+    settings = affichages[direction]
+    encode_width, encode_height = settings['encode_size']
+    encode_height += 30
+    if scale != 1.0:
+        encode_width, encode_height = max(int(encode_width * scale), 16), max(int(encode_height * scale), 16)
+    if frame.shape[1] != encode_width or frame.shape[0] != encode_height:
+        frame = cv2.resize(frame, (encode_width, encode_height), interpolation=cv2.INTER_AREA)
+    if quality is None:
+        quality = settings['jpeg_quality']
+    return cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+
+def wait_frame(direction):
+    """
+    Frame d'attente diffusée quand la vidéo d'un flux est terminée
+    """
+    return overlays[direction].status_frame(f"{direction.upper()}: En attente...", colors[direction],
+                                            "En attente de vidéo...", (80, 150))
+
+def finish_video(direction):
+    """
+    Fin de lecture d'une vidéo : frame finale, transmission des comptages et arrêt synchronisé
+    """
+    video_ended[direction] = True
+    display_width, display_height = affichages[direction]['size']
+    final_frame = overlays[direction].status_frame(
+        f"{direction.upper()}: {compteurs_passage[direction].total} objets", colors[direction],
+        "Vidéo terminée", (int(display_width/2) - 80, int(display_height/2)))
+    publish_frame(direction, final_frame)
+    
+    traffic_manager.update_detection(
+        direction, 
+        compteurs_passage[direction].total, 
+        compteurs_passage[direction].snapshot(), 
+        vitesses_moyennes[direction]
+    )
+    
+    if not all(video_ended.values()):
+        print(f"La vidéo {direction} est terminée. Arrêt synchronisé de toutes les vidéos.")
+        stop_all_videos_and_regulate()
+
+def collect_worker_results():
+    """
+    Reçoit les détections des processus de détection et met à jour les compteurs globaux
+    """
+    next_record_media_time = {}
+    while processing_active and not stop_thread:
+        message = worker_pool.poll(timeout=0.1)
+        if message is None:
+            continue
+        kind, direction, generation = message[0], message[1], message[2]
+        if direction not in videos or not worker_pool.is_current(direction, generation):
+            # Flux retiré ou redémarré entre-temps : message d'un processus remplacé
+            continue
+        try:
+            if kind == 'detections':
+                (_, _, _, media_time, tracked_objects, lanes, classes, current_count, average_speed,
+                 scheduling, usage) = message
+                with streams_lock:
+                    # Revérifié sous le verrou : le flux ne peut plus être retiré pendant la mise à jour
+                    if not worker_pool.is_current(direction, generation):
+                        continue
+                    planification[direction] = scheduling
+                    stream_usage[direction].sample(**usage)
+                    # Le processus a écrit la frame dans l'anneau partagé avant d'envoyer ses détections
+                    frame_written(direction)
+                    compteurs_passage[direction].update(tracked_objects, replay_origin + media_time,
+                                                        classes=classes, lanes=lanes)
+                    compteurs_temps_reel[direction] = current_count
+                    update_average_speed(direction, average_speed)
+                    worker_pool.set_total(direction, compteurs_passage[direction].total)
+
+                    # Hors temps réel, l'historique suit le temps média de la vidéo (propre à chaque démarrage)
+                    next_record = next_record_media_time.setdefault((direction, generation), record_interval)
+                    if not replay_realtime and media_time >= next_record:
+                        append_historical_point(direction, replay_origin + media_time)
+                        next_record_media_time[(direction, generation)] = next_record + record_interval
+            elif kind == 'ended' and not video_ended[direction]:
+                finish_video(direction)
+        except Exception as e:
+            print(f"Erreur lors de la réception des résultats {direction}: {e}")
+    print("Collecte des résultats des processus terminée")
 
 def process_video(direction, video_path, tracker):
     """
     Traite une source vidéo dans un thread dédié
 
     """
-    global frames_global, objets_detectes, donnees_csv, stop_thread, vitesses_moyennes, compteurs_temps_reel, video_ended, caps
+    global frames_global, donnees_csv, stop_thread, vitesses_moyennes, compteurs_temps_reel, video_ended, caps
     
 
     cv2.setNumThreads(0)
@@ -130,27 +537,14 @@ def process_video(direction, video_path, tracker):
         if not os.path.isfile(abs_path):
             print(f"ERREUR: Le fichier vidéo n'existe pas: {abs_path}")
             
-            display_width, display_height = 400, 300
-            error_frame = np.zeros((display_height + 30, display_width, 3), dtype=np.uint8)
-            title_bar = np.zeros((30, display_width, 3), dtype=np.uint8)
-            color = colors[direction]
-            cv2.rectangle(title_bar, (0, 0), (display_width, 30), color, -1)
-            cv2.putText(title_bar, f"{direction.upper()}: ERREUR", (10, 20), 
-                      cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            cv2.putText(error_frame[30:, :], "Fichier vidéo non trouvé", (int(display_width/2) - 120, int(display_height/2)), 
-                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-            frame_with_title = np.vstack((title_bar, error_frame[30:, :]))
-            frames_global[direction] = frame_with_title
+            display_width, display_height = affichages[direction]['size']
+            error_frame = overlays[direction].status_frame(
+                f"{direction.upper()}: ERREUR", colors[direction], "Fichier vidéo non trouvé",
+                (int(display_width/2) - 120, int(display_height/2)), 0.7, (0, 0, 255))
+            frames_global[direction] = error_frame
             
             # La frame d'erreur dans le buffer
-            if not frame_buffers[direction].full():
-                
-                while not frame_buffers[direction].empty():
-                    try:
-                        frame_buffers[direction].get(block=False)
-                    except:
-                        pass
-                frame_buffers[direction].put(frame_with_title)
+            publish_frame(direction, error_frame)
             
             video_ended[direction] = True
             return
@@ -169,12 +563,21 @@ def process_video(direction, video_path, tracker):
         return
     
     
+    # FPS natif de la source, utilisé quand le conteneur ne fournit pas de position en ms
+    source_fps = cap.get(cv2.CAP_PROP_FPS)
+    if not source_fps or source_fps <= 0:
+        source_fps = 25.0
+    frame_index = 0
+
     target_fps = 15  
     cap.set(cv2.CAP_PROP_FPS, target_fps)
     cap.set(cv2.CAP_PROP_BUFFERSIZE, 2)  
     
     # Précharger quelques frames pour éviter les saccades au démarrage
-    display_width, display_height = 400, 300
+    display_width, display_height = affichages[direction]['size']
+    # Barre de titre et image composées directement dans l'emplacement réservé de l'anneau
+    overlay = overlays[direction]
+    ring = frame_buffers[direction]
     preload_frames = 5
     for _ in range(preload_frames):
         if stop_thread:
@@ -182,209 +585,181 @@ def process_video(direction, video_path, tracker):
         ret, frame = cap.read()
         if not ret:
             break
+        frame_index += 1
         
-        
-        frame = cv2.resize(frame, (display_width, display_height))
-        
-       
-        title_bar = np.zeros((30, display_width, 3), dtype=np.uint8)
-        cv2.rectangle(title_bar, (0, 0), (display_width, 30), colors[direction], -1)
-        
-       
-        title_text = f"{direction.upper()}: Préchargement..."
-        cv2.putText(title_bar, title_text, (10, 20), 
-                  cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-        
-       
-        frame_with_title = np.vstack((title_bar, frame))
-        
-       
-        if not frame_buffers[direction].full():
-            frame_buffers[direction].put(frame_with_title)
-    
-    # Paramètres de détection optimisés
-    object_detector = cv2.createBackgroundSubtractorMOG2(
-        history=100,  
-        varThreshold=30,
-        detectShadows=False
-    )
-    
-    
-    area_threshold = 400
-    roi_top = int(display_height * 0.2)
-    roi_bottom = int(display_height * 0.9)
-    
+        frame_with_title = ring.begin_write()
+        try:
+            overlay.load(frame, frame_with_title)
+            overlay.draw_title(frame_with_title, f"{direction.upper()}: Préchargement...", colors[direction])
+        finally:
+            ring.commit()
+        frame_written(direction)
+    
+    # Chaîne détection + suivi + annotation de la direction
+    pipeline = DirectionPipeline(direction, colors[direction], tracker,
+                                 lines=compteurs_passage[direction].lines,
+                                 display_size=(display_width, display_height),
+                                 detector=build_detector(direction))
+    pipelines[direction] = pipeline
+    usage = stream_usage[direction]
     color = colors[direction]
-    total_speed = 0
-    speed_count = 0
-    current_objects = set()
     
-    
-    frame_count = 0
-    processing_interval = 2  # Traiter 1 frame sur 2 pour la détection
+    # Lecture cadencée au FPS source, intervalle de détection adapté au budget de latence
+    scheduler = FrameScheduler(source_fps, latency_budget=latency_budget, realtime=replay_realtime)
+    planification[direction] = scheduler.stats()
+    cached, recorder = open_cache(abs_path, pipeline, scheduler) if use_detection_cache else (None, None)
+    completed = False
+    # Seul le détecteur MOG2 passe par le prétraitement par lot (pas les directions rejouées)
+    batched = batch_preprocessing and pipeline.detector.batchable and cached is None
+    next_record_media_time = record_interval
     
     print(f"Démarrage du traitement vidéo pour {direction}")
+    if batched:
+        batch_preprocessor.register(direction, pipeline.detector)
+    # Image décodée, réutilisée d'une frame à l'autre par cap.retrieve()
+    decoded = None
     
-    while not stop_thread and not video_ended[direction]:
+    while not stop_thread and not video_ended.get(direction, True):
         try:
-            ret, frame = cap.read()
-            if not ret:
-                video_ended[direction] = True
-                final_frame = np.zeros((display_height + 30, display_width, 3), dtype=np.uint8)
-                title_bar = np.zeros((30, display_width, 3), dtype=np.uint8)
-                cv2.rectangle(title_bar, (0, 0), (display_width, 30), color, -1)
-                
-                title_text = f"{direction.upper()}: {len(objets_detectes[direction])} objets"
-                cv2.putText(title_bar, title_text, (10, 20), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-                
-                cv2.putText(final_frame[30:, :], "Vidéo terminée", (int(display_width/2) - 80, int(display_height/2)), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
-                
-                frame_with_title = np.vstack((title_bar, final_frame[30:, :]))
-                
-                
-                while not frame_buffers[direction].empty():
-                    try:
-                        frame_buffers[direction].get(block=False)
-                    except:
-                        pass
-                frame_buffers[direction].put(frame_with_title)
-                
-                traffic_manager.update_detection(
-                    direction, 
-                    len(objets_detectes[direction]), 
-                    objets_detectes[direction], 
-                    vitesses_moyennes[direction]
-                )
-                
-                if not all(video_ended.values()):
-                    print(f"La vidéo {direction} est terminée. Arrêt synchronisé de toutes les vidéos.")
-                    stop_all_videos_and_regulate()
-                
+            if not cap.grab():
+                completed = True
+                finish_video(direction)
                 break
             
-            # Redimension pour l'affichage
-            frame = cv2.resize(frame, (display_width, display_height))
+            frame_index += 1
+            media_time = frame_timestamp(cap, frame_index, source_fps)
             
-           
-            title_bar = np.zeros((30, display_width, 3), dtype=np.uint8)
-            cv2.rectangle(title_bar, (0, 0), (display_width, 30), color, -1)
-            
-           
-            title_text = f"{direction.upper()}: {len(objets_detectes[direction])} objets"
-            cv2.putText(title_bar, title_text, (10, 20), 
-                      cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            
-           
-            frame_with_title = np.vstack((title_bar, frame))
+            # Frame en retard sur le budget de latence : abandonnée sans conversion ni détection
+            if scheduler.should_drop(media_time):
+                continue
             
+            ret, decoded = cap.retrieve(decoded)
+            if not ret:
+                completed = True
+                finish_video(direction)
+                break
             
-            frames_global[direction] = frame_with_title
-            
-            frame_count += 1
-            if frame_count % processing_interval == 0:
-                # Détection des objets
-                mask = object_detector.apply(frame)
-                _, mask = cv2.threshold(mask, 254, 255, cv2.THRESH_BINARY)
-                
-                # Extraction des contours
-                contours, _ = cv2.findContours(mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-                
-                # Définition de la région d'intérêt
-                roi = mask[roi_top:roi_bottom, :]
-                
-                # Liste pour stocker les détections
-                detections = []
-                
-                for cnt in contours:
-                    # Calcul de l'aire du contour
-                    area = cv2.contourArea(cnt)
-                    
-                    # Filtrage par taille
-                    if area > area_threshold:
-                        # Calcul du rectangle englobant
-                        x, y, w, h = cv2.boundingRect(cnt)
-                        
-                        # Vérification que l'objet est dans la ROI
-                        if y >= roi_top and y + h <= roi_bottom:
-                            detections.append([x, y, w, h])
-                
-                # Mise à jour du tracker
-                tracked_objects = tracker.update(detections)
-                
-                # Mise à jour des compteurs et l'affichage
-                current_objects = set()
-                current_total_speed = 0
-                current_speed_count = 0
-                
-                # Affichage des détections sur la frame
-                for box_id in tracked_objects:
-                    x, y, w, h, object_id, speed = box_id
-                    
-                    # Dessiner le rectangle autour de l'objet
-                    cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+            if scheduler.should_detect():
+                # Frame composée sur place dans l'emplacement réservé de l'anneau (image redimensionnée
+                # sous la barre de titre, annotée par le pipeline), publiée par commit()
+                frame_with_title = ring.begin_write()
+                try:
+                    frame = overlay.load(decoded, frame_with_title)
                     
-                    # Afficher l'ID et la vitesse
-                    label = f"ID:{object_id} {int(speed)}km/h"
-                    cv2.putText(frame, label, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+                    # Détection, suivi et annotation des objets
+                    started = time.perf_counter()
+                    if cached is not None and cached.covers(frame_index):
+                        # Détections en cache : ni détection ni suivi
+                        tracked_objects = pipeline.replay(frame, *cached.lookup(frame_index))
+                    else:
+                        if cached is not None:
+                            # Fin d'un cache partiel : suivi en direct avec de nouveaux identifiants
+                            pipeline.tracker.id_count = cached.next_id
+                            cached = None
+                        if batched:
+                            detections = batch_preprocessor.detect(pipeline, frame)
+                            tracked_objects = pipeline.track(frame, detections, media_time)
+                        else:
+                            tracked_objects = pipeline.process(frame, media_time)
+                        if recorder is not None:
+                            recorder.add(frame_index, media_time, tracked_objects,
+                                         pipeline.last_classes, pipeline.last_lanes)
+                    detection_duration = time.perf_counter() - started
                     
-                    # Mettre à jour les compteurs
-                    objets_detectes[direction].add(object_id)
-                    current_objects.add(object_id)
+                    # Comptage des passages sur les lignes/zones virtuelles
+                    compteurs_passage[direction].update(tracked_objects, replay_origin + media_time,
+                                                        classes=pipeline.last_classes,
+                                                        lanes=pipeline.last_lanes)
                     
-                    # Calcul de la vitesse moyenne
-                    if speed > 0:
-                        current_total_speed += speed
-                        current_speed_count += 1
-                
-                # Mise à jour des compteurs en temps réel
-                compteurs_temps_reel[direction] = len(current_objects)
-                
-                # Calcul de la vitesse moyenne avec lissage
-                if current_speed_count > 0:
-                    current_avg_speed = current_total_speed / current_speed_count
-                    alpha = 0.3  # facteur de lissage
-                    if vitesses_moyennes[direction] == 0:
-                        vitesses_moyennes[direction] = current_avg_speed
-                    else:
-                        vitesses_moyennes[direction] = (vitesses_moyennes[direction] * (1-alpha) + 
-                                                      current_avg_speed * alpha)
-                
-                # Mettre à jour la barre de titre avec le nombre d'objets
-                title_text = f"{direction.upper()}: {len(objets_detectes[direction])} objets"
-                cv2.rectangle(title_bar, (0, 0), (display_width, 30), color, -1)
-                cv2.putText(title_bar, title_text, (10, 20), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-                
-                # Mettre à jour la frame avec les détections
-                frame_with_title = np.vstack((title_bar, frame))
+                    # Barre de titre avec le nombre d'objets à jour
+                    overlay.draw_title(frame_with_title, f"{direction.upper()}: {compteurs_passage[direction].total} objets",
+                                       color)
+                finally:
+                    ring.commit()
                 frames_global[direction] = frame_with_title
+                frame_written(direction)
                 
-                # Mettre à jour le buffer avec la frame contenant les détections
-                if frame_buffers[direction].full():
-                    try:
-                        frame_buffers[direction].get(block=False)
-                    except:
-                        pass
-                frame_buffers[direction].put(frame_with_title)
+                # Mise à jour des compteurs en temps réel et de la vitesse moyenne
+                compteurs_temps_reel[direction] = pipeline.current_count
+                update_average_speed(direction, pipeline.last_average_speed)
+                
+                scheduler.record_detection(detection_duration, media_time)
+                planification[direction] = {**scheduler.stats(), **pipeline.stats()}
+                # Temps CPU du thread de ce flux
+                usage.sample(time.thread_time())
             
-            # Délai adaptatif - réduire à 10ms pour plus de fluidité
-            time.sleep(0.01)
+            # Hors temps réel, l'historique suit le temps média de la vidéo
+            if not replay_realtime and media_time >= next_record_media_time:
+                append_historical_point(direction, replay_origin + media_time)
+                next_record_media_time += record_interval
+            
+            # Attente de l'heure prévue de la frame suivante (temps réel uniquement)
+            scheduler.wait(media_time)
             
         except Exception as e:
             print(f"Erreur lors du traitement de la vidéo {direction}: {e}")
             time.sleep(0.1)  # Pause en cas d'erreur
     
+    # Les autres directions n'attendent plus cette frame dans les lots
+    batch_preprocessor.unregister(direction)
+    
+    if recorder is not None:
+        recorder.save(completed)
+    
     # Libérer les ressources avant de quitter
     try:
         cap.release()
         caps[direction] = None
     except:
         pass
+    if pipelines.get(direction) is pipeline:
+        del pipelines[direction]
     
     print(f"Traitement vidéo pour {direction} terminé")
 
+def update_average_speed(direction, current_avg_speed):
+    """
+    Lissage de la vitesse moyenne d'une direction avec la moyenne de la dernière frame
+    """
+    if current_avg_speed is None:
+        return
+    alpha = 0.3  # facteur de lissage
+    if vitesses_moyennes[direction] == 0:
+        vitesses_moyennes[direction] = current_avg_speed
+    else:
+        vitesses_moyennes[direction] = (vitesses_moyennes[direction] * (1-alpha) + 
+                                      current_avg_speed * alpha)
+
+def append_historical_point(direction, timestamp):
+    """
+    Ajoute un point de données historiques pour une direction
+    """
+    # Get current traffic data
+    count = compteurs_temps_reel[direction]
+    speed = vitesses_moyennes[direction]
+    
+    # Get traffic light state
+    traffic_state = traffic_manager.get_traffic_state()
+    light_state = traffic_state['feux'].get(direction, {}).get('etat')
+    
+    # Record the data point
+    data_point = {
+        'timestamp': timestamp,
+        'count': count,
+        'speed': speed,
+        'light_state': light_state
+    }
+    
+    # Add to historical data
+    historical_data[direction].append(data_point)
+    
+    # Limit the size of historical data (keep last 24 hours max)
+    cutoff = timestamp - timedelta(hours=24).total_seconds()
+    historical_data[direction] = [
+        entry for entry in historical_data[direction]
+        if entry['timestamp'] >= cutoff
+    ]
+
 def record_historical_data():
     """
     Enregistre périodiquement les données de trafic pour l'analyse historique
@@ -395,32 +770,9 @@ def record_historical_data():
     if (current_time - last_record_time).total_seconds() >= record_interval:
         timestamp = current_time.timestamp()
         
-        for direction in ['nord', 'sud', 'est', 'ouest']:
-            # Get current traffic data
-            count = compteurs_temps_reel[direction]
-            speed = vitesses_moyennes[direction]
-            
-            # Get traffic light state
-            traffic_state = traffic_manager.get_traffic_state()
-            light_state = traffic_state['feux'][direction]['etat']
-            
-            # Record the data point
-            data_point = {
-                'timestamp': timestamp,
-                'count': count,
-                'speed': speed,
-                'light_state': light_state
-            }
-            
-            # Add to historical data
-            historical_data[direction].append(data_point)
-            
-            # Limit the size of historical data (keep last 24 hours max)
-            cutoff = current_time - timedelta(hours=24)
-            historical_data[direction] = [
-                entry for entry in historical_data[direction]
-                if entry['timestamp'] >= cutoff.timestamp()
-            ]
+        with streams_lock:
+            for direction in videos:
+                append_historical_point(direction, timestamp)
         
         last_record_time = current_time
 
@@ -430,25 +782,24 @@ def update_traffic_manager():
     """
    
     print(f"Mise à jour du traffic_manager avec les données actuelles:")
-    print(f"Nord: {compteurs_temps_reel['nord']} objets actuels, {len(objets_detectes['nord'])} total")
-    print(f"Sud: {compteurs_temps_reel['sud']} objets actuels, {len(objets_detectes['sud'])} total")
-    print(f"Est: {compteurs_temps_reel['est']} objets actuels, {len(objets_detectes['est'])} total")
-    print(f"Ouest: {compteurs_temps_reel['ouest']} objets actuels, {len(objets_detectes['ouest'])} total")
-    
-    for direction in ['nord', 'sud', 'est', 'ouest']:
+    with streams_lock:
+        for direction in videos:
+            print(f"{direction.capitalize()}: {compteurs_temps_reel[direction]} objets actuels, {compteurs_passage[direction].total} total")
         
-        traffic_manager.update_detection(
-            direction, 
-            len(objets_detectes[direction]),  
-            objets_detectes[direction], 
-            vitesses_moyennes[direction]
-        )
+        for direction in videos:
+            
+            traffic_manager.update_detection(
+                direction, 
+                compteurs_passage[direction].total,  
+                compteurs_passage[direction].snapshot(), 
+                vitesses_moyennes[direction]
+            )
     
     
     traffic_manager._update_scoot()
 
 def detection_thread():
-    global processing_active, stop_thread, frames_global, objets_detectes, vitesses_moyennes, compteurs_temps_reel, caps, video_ended
+    global processing_active, stop_thread, frames_global, vitesses_moyennes, compteurs_temps_reel, caps, video_ended, replay_origin
     
     
     cv2.setNumThreads(0)
@@ -471,22 +822,14 @@ def detection_thread():
         video_ended[direction] = False
     
     
-    for direction in videos:
-        display_width, display_height = 400, 300
-        color = colors[direction]
-        wait_frame = np.zeros((display_height + 30, display_width, 3), dtype=np.uint8)
-        title_bar = np.zeros((30, display_width, 3), dtype=np.uint8)
-        cv2.rectangle(title_bar, (0, 0), (display_width, 30), color, -1)
-        
-        title_text = f"{direction.upper()}: En attente de démarrage"
-        cv2.putText(title_bar, title_text, (10, 20), 
-                  cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
-        
-        cv2.putText(wait_frame[30:, :], "Cliquez sur Play pour démarrer", (int(display_width/2) - 120, int(display_height/2)), 
-                  cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-        
-        frame_with_title = np.vstack((title_bar, wait_frame[30:, :]))
-        frames_global[direction] = frame_with_title
+    for direction in list(videos):
+        display_width, display_height = affichages[direction]['size']
+        frames_global[direction] = overlays[direction].status_frame(
+            f"{direction.upper()}: En attente de démarrage", colors[direction],
+            "Cliquez sur Play pour démarrer", (int(display_width/2) - 120, int(display_height/2)),
+            0.6, title_scale=0.5)
+    
+    replay_origin = time.time()
     
     print("Thread de détection démarré")
     
@@ -496,27 +839,23 @@ def detection_thread():
         last_record_historical = time.time()
         
        
-        threads = []
-        for direction, video_path in videos.items():
+        if use_process_workers:
+            threading.Thread(target=collect_worker_results, daemon=True).start()
+        for direction in list(videos):
             try:
-               
-                thread = threading.Thread(
-                    target=process_video, 
-                    args=(direction, video_path, trackers[direction]),
-                    daemon=True
-                )
-                thread.start()
-                threads.append(thread)
-                
-                time.sleep(0.5)
+                start_stream(direction)
+                if not use_process_workers:
+                    time.sleep(0.5)
             except Exception as e:
                 print(f"Erreur lors du démarrage du thread vidéo {direction}: {e}")
         
+        version = processing_changed.version
         while processing_active and not stop_thread:
             current_time = time.time()
             
             
-            if current_time - last_record_historical >= 5.0:
+            # Hors temps réel, chaque vidéo enregistre son historique en temps média
+            if replay_realtime and current_time - last_record_historical >= 5.0:
                 try:
                     record_historical_data()
                     last_record_historical = current_time
@@ -531,11 +870,15 @@ def detection_thread():
                 except Exception as e:
                     print(f"Erreur lors de la mise à jour du gestionnaire de trafic: {e}")
             
-            
-            time.sleep(0.01)  
+            # Attente de la prochaine échéance, ou d'un arrêt du traitement
+            next_deadline = last_update_traffic + 1.0
+            if replay_realtime:
+                next_deadline = min(next_deadline, last_record_historical + 5.0)
+            version = processing_changed.wait(version, timeout=max(next_deadline - time.time(), 0.0))
     except Exception as e:
         print(f"Erreur dans le thread de détection: {e}")
     finally:
+        worker_pool.stop_all()
        
         if 'caps' in globals():
             for cap in caps.values():
@@ -546,169 +889,202 @@ def detection_thread():
                         pass
         print("Thread de détection terminé")
 
-def generate_frames_nord():
-    while True:
-        try:
-            if not frame_buffers['nord'].empty():
-                frame = frame_buffers['nord'].get(block=False)
-                ret, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
-                frame = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            else:
-                # Ne pas afficher la frame d'attente si la vidéo est en cours de lecture
-                if not video_ended['nord']:
-                    time.sleep(0.01)  # Réduire le délai d'attente
-                    continue
-                
-                # Afficher la frame d'attente uniquement si la vidéo est terminée
-                display_width, display_height = 400, 300
-                wait_frame = np.zeros((display_height + 30, display_width, 3), dtype=np.uint8)
-                title_bar = np.zeros((30, display_width, 3), dtype=np.uint8)
-                color = colors['nord']
-                cv2.rectangle(title_bar, (0, 0), (display_width, 30), color, -1)
-                cv2.putText(title_bar, "NORD: En attente...", (10, 20), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-                cv2.putText(wait_frame[30:, :], "En attente de vidéo...", (80, 150), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
-                frame_with_title = np.vstack((title_bar, wait_frame[30:, :]))
-                ret, buffer = cv2.imencode('.jpg', frame_with_title, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
-                frame = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-                time.sleep(0.05)
-        except Exception as e:
-            print(f"Erreur dans generate_frames_nord: {e}")
-            time.sleep(0.05)
-
-def generate_frames_sud():
-    while True:
-        try:
-            if not frame_buffers['sud'].empty():
-                frame = frame_buffers['sud'].get(block=False)
-                ret, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
-                frame = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            else:
-                # Ne pas afficher la frame d'attente si la vidéo est en cours de lecture
-                if not video_ended['sud']:
-                    time.sleep(0.01)  # Réduire le délai d'attente
-                    continue
-                
-                # Afficher la frame d'attente uniquement si la vidéo est terminée
-                display_width, display_height = 400, 300
-                wait_frame = np.zeros((display_height + 30, display_width, 3), dtype=np.uint8)
-                title_bar = np.zeros((30, display_width, 3), dtype=np.uint8)
-                color = colors['sud']
-                cv2.rectangle(title_bar, (0, 0), (display_width, 30), color, -1)
-                cv2.putText(title_bar, "SUD: En attente...", (10, 20), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-                cv2.putText(wait_frame[30:, :], "En attente de vidéo...", (80, 150), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
-                frame_with_title = np.vstack((title_bar, wait_frame[30:, :]))
-                ret, buffer = cv2.imencode('.jpg', frame_with_title, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
-                frame = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-                time.sleep(0.05)
-        except Exception as e:
-            print(f"Erreur dans generate_frames_sud: {e}")
-            time.sleep(0.05)
-
-def generate_frames_est():
-    while True:
-        try:
-            if not frame_buffers['est'].empty():
-                frame = frame_buffers['est'].get(block=False)
-                ret, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
-                frame = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            else:
-                # Ne pas afficher la frame d'attente si la vidéo est en cours de lecture
-                if not video_ended['est']:
-                    time.sleep(0.01)  # Réduire le délai d'attente
-                    continue
+def generate_frames(stream_id, profile=None):
+    """
+    Flux MJPEG d'un client : frames encodées une fois par profil par le diffuseur du flux et partagées
+    Un client lent reçoit directement la frame la plus récente, et son profil est dégradé
+    si l'écriture de ses frames prend du retard
+    Sans nouvelle frame, le client attend le signal du producteur (ou l'échéance)
+    profile: ClientProfile du client (qualité et résolution du flux par défaut)
+    """
+    if profile is None:
+        profile = ClientProfile(affichages[stream_id]['jpeg_quality'])
+    broadcaster = None
+    last_seq = 0
+    yielded = time.monotonic()
+    try:
+        # Fin du flux MJPEG quand le flux est retiré du registre
+        while stream_id in videos:
+            try:
+                current = broadcasters.get(stream_id)
+                if current is None:
+                    break
+                if current is not broadcaster:
+                    # Flux reconfiguré : nouveau diffuseur
+                    if broadcaster is not None:
+                        broadcaster.disconnect()
+                    broadcaster, last_seq = current, 0
+                    broadcaster.connect()
                 
-                # Afficher la frame d'attente uniquement si la vidéo est terminée
-                display_width, display_height = 400, 300
-                wait_frame = np.zeros((display_height + 30, display_width, 3), dtype=np.uint8)
-                title_bar = np.zeros((30, display_width, 3), dtype=np.uint8)
-                color = colors['est']
-                cv2.rectangle(title_bar, (0, 0), (display_width, 30), color, -1)
-                cv2.putText(title_bar, "EST: En attente...", (10, 20), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-                cv2.putText(wait_frame[30:, :], "En attente de vidéo...", (80, 150), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
-                frame_with_title = np.vstack((title_bar, wait_frame[30:, :]))
-                ret, buffer = cv2.imencode('.jpg', frame_with_title, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
-                frame = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+                # Version lue avant la frame : une frame écrite entre-temps réveille l'attente
+                version = broadcaster.updated.version
+                last_seq, payload = broadcaster.next_payload(last_seq, profile.key)
+                if payload is None and not video_ended[stream_id] \
+                        and time.monotonic() - yielded >= idle_frame_interval:
+                    # Contenu inchangé (caméra statique) : les derniers octets sont renvoyés
+                    # régulièrement, sans réencodage, pour détecter un client déconnecté
+                    payload = broadcaster.repeat_payload(profile.key)
+                if payload is not None:
+                    # Le générateur reprend quand le serveur a écrit la frame sur la socket
+                    yielded = time.monotonic()
+                    yield payload
+                    write_duration = time.monotonic() - yielded
+                    if profile.record_write(write_duration):
+                        print(f"Client {stream_id} en retard : profil dégradé à "
+                              f"qualité {profile.quality}, échelle {profile.scale}")
+                    # FPS maximal demandé par le client
+                    if profile.frame_interval > write_duration:
+                        time.sleep(profile.frame_interval - write_duration)
+                else:
+                    # Ne pas afficher la frame d'attente si la vidéo est en cours de lecture
+                    if not video_ended[stream_id]:
+                        broadcaster.updated.wait(version, timeout=frame_wait_timeout)
+                        continue
+                    
+                    # Afficher la frame d'attente uniquement si la vidéo est terminée
+                    payload = broadcaster.idle_payload(lambda: wait_frame(stream_id), profile.key)
+                    if payload is not None:
+                        yield payload
+                    broadcaster.updated.wait(version, timeout=idle_frame_interval)
+            except Exception as e:
+                print(f"Erreur dans generate_frames {stream_id}: {e}")
                 time.sleep(0.05)
-        except Exception as e:
-            print(f"Erreur dans generate_frames_est: {e}")
-            time.sleep(0.05)
+    finally:
+        if broadcaster is not None:
+            broadcaster.disconnect()
 
-def generate_frames_ouest():
-    while True:
-        try:
-            if not frame_buffers['ouest'].empty():
-                frame = frame_buffers['ouest'].get(block=False)
-                ret, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
-                frame = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            else:
-                # Ne pas afficher la frame d'attente si la vidéo est en cours de lecture
-                if not video_ended['ouest']:
-                    time.sleep(0.01)  # Réduire le délai d'attente
-                    continue
-                
-                # Afficher la frame d'attente uniquement si la vidéo est terminée
-                display_width, display_height = 400, 300
-                wait_frame = np.zeros((display_height + 30, display_width, 3), dtype=np.uint8)
-                title_bar = np.zeros((30, display_width, 3), dtype=np.uint8)
-                color = colors['ouest']
-                cv2.rectangle(title_bar, (0, 0), (display_width, 30), color, -1)
-                cv2.putText(title_bar, "OUEST: En attente...", (10, 20), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-                cv2.putText(wait_frame[30:, :], "En attente de vidéo...", (80, 150), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
-                frame_with_title = np.vstack((title_bar, wait_frame[30:, :]))
-                ret, buffer = cv2.imencode('.jpg', frame_with_title, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
-                frame = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+def generate_mosaic():
+    """
+    Flux MJPEG de la mosaïque : la même mosaïque encodée est envoyée à tous ses clients
+    """
+    mosaic.connect()
+    last_seq = 0
+    yielded = time.monotonic()
+    try:
+        while True:
+            try:
+                version = mosaic.updated.version
+                last_seq, payload = mosaic.next_payload(last_seq)
+                if payload is None and time.monotonic() - yielded >= idle_frame_interval:
+                    # Mosaïque inchangée : les derniers octets sont renvoyés sans réencodage
+                    payload = mosaic.repeat_payload()
+                if payload is not None:
+                    yielded = time.monotonic()
+                    yield payload
+                else:
+                    # Attente du tick suivant (ou de la mosaïque composée par un autre client)
+                    mosaic.updated.wait(version, timeout=mosaic.time_to_tick())
+            except Exception as e:
+                print(f"Erreur dans generate_mosaic: {e}")
                 time.sleep(0.05)
-        except Exception as e:
-            print(f"Erreur dans generate_frames_ouest: {e}")
-            time.sleep(0.05)
+    finally:
+        mosaic.disconnect()
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/video_feed')
-def video_feed():
-    return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+@app.route('/video_feed/<stream_id>')
+def video_feed(stream_id=None):
+    """
+    Flux MJPEG d'un flux du registre (le premier par défaut)
+    Paramètres optionnels : quality (qualité JPEG), scale (échelle de la résolution, 0.25 à 1),
+    fps (FPS maximal); arrondis aux profils partagés entre clients
+    """
+    if stream_id is None:
+        stream_id = next(iter(videos), None)
+    if stream_id not in videos:
+        return jsonify({"status": "error", "message": f"Flux inconnu: {stream_id}"}), 404
+    quality = request.args.get('quality', None, type=int)
+    scale = request.args.get('scale', 1.0, type=float)
+    max_fps = request.args.get('fps', None, type=float)
+    profile = ClientProfile(affichages[stream_id]['jpeg_quality'], quality=quality,
+                            scale=min(max(scale, 0.25), 1.0),
+                            max_fps=max_fps if max_fps and max_fps > 0 else None)
+    return Response(generate_frames(stream_id, profile), mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/mosaic_feed')
+def mosaic_feed():
+    """
+    Mosaïque MJPEG de tous les flux du registre (une tuile par flux)
+    """
+    return Response(generate_mosaic(), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+# Anciennes routes par direction, utilisées par les templates
 @app.route('/video_feed_nord')
 def video_feed_nord():
-    return Response(generate_frames_nord(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return video_feed('nord')
 
 @app.route('/video_feed_sud')
 def video_feed_sud():
-    return Response(generate_frames_sud(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return video_feed('sud')
 
 @app.route('/video_feed_est')
 def video_feed_est():
-    return Response(generate_frames_est(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return video_feed('est')
 
 @app.route('/video_feed_ouest')
 def video_feed_ouest():
-    return Response(generate_frames_ouest(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return video_feed('ouest')
+
+@app.route('/streams', methods=['GET'])
+def list_streams():
+    """
+    Configuration, état et consommation CPU/mémoire de chaque flux
+    """
+    with streams_lock:
+        return jsonify({stream_id: stream_config(stream_id) for stream_id in videos})
+
+@app.route('/streams', methods=['POST'])
+def create_stream():
+    """
+    Ajoute un flux : {"id": ..., "video": ..., "color": [b, g, r], "tracker_mode": ..., "detector_mode": ...}
+    """
+    data = request.get_json(silent=True) or {}
+    stream_id = data.get('id')
+    video_path = data.get('video')
+    if not stream_id or not video_path:
+        return jsonify({"status": "error", "message": "Champs 'id' et 'video' requis"}), 400
+    if not os.path.isfile(os.path.join(os.path.dirname(os.path.abspath(__file__)), video_path)):
+        return jsonify({"status": "error", "message": f"Fichier vidéo introuvable: {video_path}"}), 400
+    try:
+        add_stream(stream_id, video_path, color=data.get('color'),
+                   tracker_mode=data.get('tracker_mode'), detector_mode=data.get('detector_mode'))
+    except (ValueError, TypeError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    with streams_lock:
+        return jsonify({"status": "success", "stream": stream_config(stream_id)}), 201
+
+@app.route('/streams/<stream_id>', methods=['PUT'])
+def update_stream(stream_id):
+    """
+    Reconfigure un flux (champs optionnels : video, color, tracker_mode, detector_mode)
+    """
+    data = request.get_json(silent=True) or {}
+    video_path = data.get('video')
+    if video_path and not os.path.isfile(os.path.join(os.path.dirname(os.path.abspath(__file__)), video_path)):
+        return jsonify({"status": "error", "message": f"Fichier vidéo introuvable: {video_path}"}), 400
+    try:
+        configure_stream(stream_id, video_path=video_path, color=data.get('color'),
+                         tracker_mode=data.get('tracker_mode'), detector_mode=data.get('detector_mode'))
+    except KeyError:
+        return jsonify({"status": "error", "message": f"Flux inconnu: {stream_id}"}), 404
+    except (ValueError, TypeError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    with streams_lock:
+        return jsonify({"status": "success", "stream": stream_config(stream_id)})
+
+@app.route('/streams/<stream_id>', methods=['DELETE'])
+def delete_stream(stream_id):
+    """
+    Arrête et retire un flux
+    """
+    try:
+        remove_stream(stream_id)
+    except KeyError:
+        return jsonify({"status": "error", "message": f"Flux inconnu: {stream_id}"}), 404
+    return jsonify({"status": "success", "message": f"Flux {stream_id} retiré"})
 
 @app.route('/start_processing')
 def start_processing():
@@ -724,17 +1100,19 @@ def start_processing():
 def stop_processing():
     global stop_thread
     stop_thread = True
+    processing_changed.notify()
     return jsonify({"status": "success", "message": "Traitement arrêté"})
 
 @app.route('/reset_detection')
 def reset_detection():
-    global objets_detectes, donnees_csv, compteurs_temps_reel, vitesses_moyennes
+    global donnees_csv, compteurs_temps_reel, vitesses_moyennes
     
     
-    for direction in objets_detectes:
-        objets_detectes[direction] = set()
-        compteurs_temps_reel[direction] = 0
-        vitesses_moyennes[direction] = 0
+    with streams_lock:
+        for direction in videos:
+            compteurs_passage[direction].reset()
+            compteurs_temps_reel[direction] = 0
+            vitesses_moyennes[direction] = 0
     
     
     donnees_csv = []
@@ -742,51 +1120,52 @@ def reset_detection():
         pd.DataFrame(donnees_csv).to_csv(csv_file, index=False)
     
     
-    for direction in trackers:
-        trackers[direction] = EuclideanDistTracker()
+    with streams_lock:
+        for direction in videos:
+            trackers[direction] = build_tracker(direction)
     
     return jsonify({"status": "success", "message": "Détections réinitialisées"})
 
 @app.route('/get_stats')
 def get_stats():
    
-    stats = {
-        'directions': {
-            'nord': {
-                'total': len(objets_detectes['nord']),
-                'actuel': compteurs_temps_reel['nord'],
-                'vitesse_moyenne': round(vitesses_moyennes['nord'], 1)
+    with streams_lock:
+        stats = {
+            'directions': {
+                direction: {
+                    'total': compteurs_passage[direction].total,
+                    'actuel': compteurs_temps_reel[direction],
+                    'vitesse_moyenne': round(vitesses_moyennes[direction], 1),
+                    'classes': dict(compteurs_passage[direction].classes)
+                }
+                for direction in videos
             },
-            'sud': {
-                'total': len(objets_detectes['sud']),
-                'actuel': compteurs_temps_reel['sud'],
-                'vitesse_moyenne': round(vitesses_moyennes['sud'], 1)
-            },
-            'est': {
-                'total': len(objets_detectes['est']),
-                'actuel': compteurs_temps_reel['est'],
-                'vitesse_moyenne': round(vitesses_moyennes['est'], 1)
-            },
-            'ouest': {
-                'total': len(objets_detectes['ouest']),
-                'actuel': compteurs_temps_reel['ouest'],
-                'vitesse_moyenne': round(vitesses_moyennes['ouest'], 1)
-            }
-        },
-        'total': sum(len(objets_detectes[d]) for d in objets_detectes),
-        'processing_active': processing_active,
-    }
+            'total': sum(compteurs_passage[d].total for d in videos),
+            'processing_active': processing_active,
+            'scheduling': dict(planification),
+        }
     
     
     traffic_state = traffic_manager.get_traffic_state()
-    for direction in traffic_state['detection']:
-        if 'objects' in traffic_state['detection'][direction] and isinstance(traffic_state['detection'][direction]['objects'], set):
-            traffic_state['detection'][direction]['objects'] = list(traffic_state['detection'][direction]['objects'])
-    
     stats['traffic_state'] = traffic_state
     
     return jsonify(stats)
 
+@app.route('/get_counts')
+def get_counts():
+    """
+    Retourne les compteurs de passage par direction (lignes, zones, classes)
+    et leurs intervalles d'agrégation, éventuellement depuis un horodatage
+    """
+    since = request.args.get('since', None, type=float)
+    counts = {}
+    with streams_lock:
+        for direction in videos:
+            counter = compteurs_passage[direction]
+            counts[direction] = counter.snapshot()
+            counts[direction]['intervals'] = counter.intervals(since)
+    return jsonify(counts)
+
 @app.route('/get_traffic_state')
 def get_traffic_state():
     return jsonify(traffic_manager.get_traffic_state())
@@ -796,14 +1175,7 @@ def get_traffic_state():
 def start_video(direction):
     global video_ended
     if direction in videos:
-        video_ended[direction] = False
-        
-        thread = threading.Thread(
-            target=process_video, 
-            args=(direction, videos[direction], trackers[direction])
-        )
-        thread.daemon = True
-        thread.start()
+        start_stream(direction)
         return jsonify({"status": "success", "message": f"Vidéo {direction} démarrée"})
     return jsonify({"status": "error", "message": "Direction invalide"})
 
@@ -813,33 +1185,18 @@ def stop_video(direction):
     if direction in videos:
         video_ended[direction] = True
         
-        display_width, display_height = 400, 300
-        color = colors[direction]
-        final_frame = np.zeros((display_height + 30, display_width, 3), dtype=np.uint8)
-        title_bar = np.zeros((30, display_width, 3), dtype=np.uint8)
-        cv2.rectangle(title_bar, (0, 0), (display_width, 30), color, -1)
-        
-        title_text = f"{direction.upper()}: {len(objets_detectes[direction])} objets"
-        cv2.putText(title_bar, title_text, (10, 20), 
-                  cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-        
-        cv2.putText(final_frame[30:, :], "Vidéo arrêtée", (int(display_width/2) - 80, int(display_height/2)), 
-                  cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
-        
-        frame_with_title = np.vstack((title_bar, final_frame[30:, :]))
-        frames_global[direction] = frame_with_title
+        display_width, display_height = affichages[direction]['size']
+        frames_global[direction] = overlays[direction].status_frame(
+            f"{direction.upper()}: {compteurs_passage[direction].total} objets", colors[direction],
+            "Vidéo arrêtée", (int(display_width/2) - 80, int(display_height/2)))
         
         return jsonify({"status": "success", "message": f"Vidéo {direction} arrêtée"})
     return jsonify({"status": "error", "message": "Direction invalide"})
 
 @app.route('/check_videos')
 def check_videos():
-    return jsonify({
-        'nord': not video_ended['nord'],
-        'sud': not video_ended['sud'],
-        'est': not video_ended['est'],
-        'ouest': not video_ended['ouest']
-    })
+    with streams_lock:
+        return jsonify({direction: not video_ended[direction] for direction in videos})
 
 @app.route('/set_manual_mode/<enabled>')
 def set_manual_mode(enabled):
@@ -897,7 +1254,7 @@ def get_historical_data():
     
     
     filtered_data = {}
-    for direction in ['nord', 'sud', 'est', 'ouest']:
+    for direction in list(historical_data):
         filtered_data[direction] = [
             entry for entry in historical_data[direction]
             if entry['timestamp'] >= cutoff.timestamp()
@@ -914,8 +1271,8 @@ def export_data(format):
     if format == 'csv':
         
         all_data = []
-        for direction in ['nord', 'sud', 'est', 'ouest']:
-            for entry in historical_data[direction]:
+        for direction, entries in list(historical_data.items()):
+            for entry in entries:
                 entry_copy = entry.copy()
                 entry_copy['direction'] = direction
                 entry_copy['timestamp'] = datetime.fromtimestamp(entry['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
@@ -933,7 +1290,7 @@ def export_data(format):
         
         export_data = {
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'data': historical_data
+            'data': dict(historical_data)
         }
         
        
@@ -953,56 +1310,36 @@ def get_app_state():
     les statistiques de détection et l'état du trafic
     """
     
-    for direction in ['nord', 'sud', 'est', 'ouest']:
-       
-        traffic_manager.update_detection(
-            direction, 
-            len(objets_detectes[direction]),  
-            objets_detectes[direction], 
-            vitesses_moyennes[direction]
-        )
+    with streams_lock:
+        for direction in videos:
+           
+            traffic_manager.update_detection(
+                direction, 
+                compteurs_passage[direction].total,  
+                compteurs_passage[direction].snapshot(), 
+                vitesses_moyennes[direction]
+            )
     
     
     traffic_manager._update_scoot()
     
 
     traffic_state = traffic_manager.get_traffic_state()
-    for direction in traffic_state['detection']:
-        if 'objects' in traffic_state['detection'][direction] and isinstance(traffic_state['detection'][direction]['objects'], set):
-            traffic_state['detection'][direction]['objects'] = list(traffic_state['detection'][direction]['objects'])
-    
-    state = {
-        'processing_active': processing_active,
-        'videos_active': {
-            'nord': not video_ended['nord'],
-            'sud': not video_ended['sud'],
-            'est': not video_ended['est'],
-            'ouest': not video_ended['ouest']
-        },
-        'detection_stats': {
-            'nord': {
-                'total': len(objets_detectes['nord']),
-                'actuel': compteurs_temps_reel['nord'],
-                'vitesse_moyenne': round(vitesses_moyennes['nord'], 1)
-            },
-            'sud': {
-                'total': len(objets_detectes['sud']),
-                'actuel': compteurs_temps_reel['sud'],
-                'vitesse_moyenne': round(vitesses_moyennes['sud'], 1)
-            },
-            'est': {
-                'total': len(objets_detectes['est']),
-                'actuel': compteurs_temps_reel['est'],
-                'vitesse_moyenne': round(vitesses_moyennes['est'], 1)
+    
+    with streams_lock:
+        state = {
+            'processing_active': processing_active,
+            'videos_active': {direction: not video_ended[direction] for direction in videos},
+            'detection_stats': {
+                direction: {
+                    'total': compteurs_passage[direction].total,
+                    'actuel': compteurs_temps_reel[direction],
+                    'vitesse_moyenne': round(vitesses_moyennes[direction], 1)
+                }
+                for direction in videos
             },
-            'ouest': {
-                'total': len(objets_detectes['ouest']),
-                'actuel': compteurs_temps_reel['ouest'],
-                'vitesse_moyenne': round(vitesses_moyennes['ouest'], 1)
-            }
-        },
-        'traffic_state': traffic_state
-    }
+            'traffic_state': traffic_state
+        }
     
     return jsonify(state)
 
@@ -1013,10 +1350,10 @@ def auto_start_processing():
     Initialise et démarre automatiquement le traitement au démarrage de l'application
     """
     
-    global objets_detectes, compteurs_temps_reel, vitesses_moyennes, video_ended, processing_active, stop_thread, caps
+    global compteurs_temps_reel, vitesses_moyennes, video_ended, processing_active, stop_thread, caps
     
    
-    for direction in caps:
+    for direction in list(caps):
         if caps[direction] is not None:
             try:
                 caps[direction].release()
@@ -1028,14 +1365,15 @@ def auto_start_processing():
     traffic_manager.start()
     
     
-    for direction in ['nord', 'sud', 'est', 'ouest']:
-        objets_detectes[direction] = set()
-        compteurs_temps_reel[direction] = 0
-        vitesses_moyennes[direction] = 0
-    
-    
-    for direction in video_ended:
-        video_ended[direction] = True
+    with streams_lock:
+        for direction in videos:
+            compteurs_passage[direction].reset()
+            compteurs_temps_reel[direction] = 0
+            vitesses_moyennes[direction] = 0
+        
+        
+        for direction in videos:
+            video_ended[direction] = True
     
     
     processing_active = True
@@ -1070,9 +1408,10 @@ def restart_app():
         
         stop_thread = True
         processing_active = False
+        processing_changed.notify()
         
         
-        for direction in caps:
+        for direction in list(caps):
             if caps[direction] is not None:
                 try:
                     caps[direction].release()
@@ -1081,19 +1420,16 @@ def restart_app():
                     print(f"Erreur lors de la libération de la capture {direction}: {e}")
         
        
-        for direction in frame_buffers:
-            while not frame_buffers[direction].empty():
-                try:
-                    frame_buffers[direction].get(block=False)
-                except:
-                    pass
-        
-      
-        for direction in ['nord', 'sud', 'est', 'ouest']:
-            objets_detectes[direction] = set()
-            compteurs_temps_reel[direction] = 0
-            vitesses_moyennes[direction] = 0
-            video_ended[direction] = True
+        with streams_lock:
+            for direction in videos:
+                frame_buffers[direction].clear()
+            
+          
+            for direction in videos:
+                compteurs_passage[direction].reset()
+                compteurs_temps_reel[direction] = 0
+                vitesses_moyennes[direction] = 0
+                video_ended[direction] = True
         
         
         traffic_manager.stop()
@@ -1123,46 +1459,23 @@ def health_check():
     Route de diagnostic pour vérifier l'état de l'application et faciliter le dépannage
     """
     try:
-        # Statut des vidéos
-        video_status = {
-            'nord': not video_ended['nord'],
-            'sud': not video_ended['sud'],
-            'est': not video_ended['est'],
-            'ouest': not video_ended['ouest']
-        }
-        
-        # Statut des files d'attente
-        queue_status = {
-            'nord': {
-                'size': frame_buffers['nord'].qsize(),
-                'maxsize': frame_buffers['nord'].maxsize,
-                'empty': frame_buffers['nord'].empty(),
-                'full': frame_buffers['nord'].full()
-            },
-            'sud': {
-                'size': frame_buffers['sud'].qsize(),
-                'maxsize': frame_buffers['sud'].maxsize,
-                'empty': frame_buffers['sud'].empty(),
-                'full': frame_buffers['sud'].full()
-            },
-            'est': {
-                'size': frame_buffers['est'].qsize(),
-                'maxsize': frame_buffers['est'].maxsize,
-                'empty': frame_buffers['est'].empty(),
-                'full': frame_buffers['est'].full()
-            },
-            'ouest': {
-                'size': frame_buffers['ouest'].qsize(),
-                'maxsize': frame_buffers['ouest'].maxsize,
-                'empty': frame_buffers['ouest'].empty(),
-                'full': frame_buffers['ouest'].full()
-            }
-        }
-        
-        # Vérification des vidéos
-        video_exists = {}
-        for direction, path in videos.items():
-            video_exists[direction] = os.path.isfile(path)
+        with streams_lock:
+            # Statut des vidéos
+            video_status = {direction: not video_ended[direction] for direction in videos}
+            
+            # Statut des anneaux de frames (séquence courante, frames écrasées sans lecture)
+            queue_status = {direction: frame_ring(direction).stats() for direction in videos}
+            
+            # Vérification des vidéos
+            video_exists = {}
+            for direction, path in videos.items():
+                video_exists[direction] = os.path.isfile(path)
+            
+            # Consommation CPU et mémoire de chaque flux
+            usage = {direction: stream_usage_stats(direction) for direction in videos}
+            # Diffusion MJPEG (clients, frames encodées, envois)
+            broadcast = {direction: broadcasters[direction].stats() for direction in videos}
+            object_counts = {direction: compteurs_passage[direction].total for direction in videos}
         
         
         app_status = {
@@ -1177,14 +1490,14 @@ def health_check():
             'timestamp': datetime.now().isoformat(),
             'videos': video_status,
             'queues': queue_status,
+            'scheduling': dict(planification),
+            'batching': batch_preprocessor.stats() if batch_preprocessing else None,
+            'usage': usage,
+            'broadcast': broadcast,
+            'mosaic': mosaic.stats(),
             'video_files': video_exists,
             'app_status': app_status,
-            'object_counts': {
-                'nord': len(objets_detectes['nord']),
-                'sud': len(objets_detectes['sud']),
-                'est': len(objets_detectes['est']),
-                'ouest': len(objets_detectes['ouest'])
-            }
+            'object_counts': object_counts
         }
         
         return jsonify(health_data)
@@ -1200,16 +1513,19 @@ def stop_all_videos_and_regulate():
     Arrête toutes les vidéos en cours et utilise les comptages actuels
     pour optimiser la régulation des feux.
     """
-    global video_ended, frames_global, objets_detectes, vitesses_moyennes, caps
+    global video_ended, frames_global, vitesses_moyennes, caps
     
     print("Synchronisation des arrêts de vidéo pour optimiser la régulation des feux")
     
     # Marquer toutes les vidéos comme terminées
-    for direction in video_ended:
+    for direction in list(video_ended):
         video_ended[direction] = True
     
+    # Arrêter les processus de détection éventuels
+    worker_pool.stop_all()
+    
     # Libérer les ressources des captures vidéo
-    for direction in caps:
+    for direction in list(caps):
         if caps[direction] is not None:
             try:
                 caps[direction].release()
@@ -1218,38 +1534,27 @@ def stop_all_videos_and_regulate():
                 pass
     
     
-    for direction in ['nord', 'sud', 'est', 'ouest']:
-        color = colors[direction]
-        
-        display_width, display_height = 400, 300
-        final_frame = np.zeros((display_height + 30, display_width, 3), dtype=np.uint8)
-        title_bar = np.zeros((30, display_width, 3), dtype=np.uint8)
-        cv2.rectangle(title_bar, (0, 0), (display_width, 30), color, -1)
-        
-        title_text = f"{direction.upper()}: {len(objets_detectes[direction])} objets"
-        cv2.putText(title_bar, title_text, (10, 20), 
-                  cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-        
-        cv2.putText(final_frame[30:, :], "Synchronisation terminée", (int(display_width/2) - 120, int(display_height/2)), 
-                  cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        
-        frame_with_title = np.vstack((title_bar, final_frame[30:, :]))
-        frames_global[direction] = frame_with_title
+    streams = list(videos)
+    for direction in streams:
+        display_width, display_height = affichages[direction]['size']
+        frames_global[direction] = overlays[direction].status_frame(
+            f"{direction.upper()}: {compteurs_passage[direction].total} objets", colors[direction],
+            "Synchronisation terminée", (int(display_width/2) - 120, int(display_height/2)), 0.7)
     
    
     print("Envoi des données de comptage au système de régulation")
     print("Comptages finaux utilisés pour la régulation:")
     
-    for direction in ['nord', 'sud', 'est', 'ouest']:
+    for direction in streams:
         
-        count = len(objets_detectes[direction])
+        count = compteurs_passage[direction].total
         print(f"{direction.capitalize()}: {count} objets")
         
         
         traffic_manager.update_detection(
             direction,
             count,  
-            objets_detectes[direction],
+            compteurs_passage[direction].snapshot(),
             vitesses_moyennes[direction]
         )
     
@@ -1279,7 +1584,7 @@ if __name__ == '__main__':
     logger.info("Démarrage de l'application de régulation de trafic")
     
     
-    for direction, video_path in videos.items():
+    for direction, video_path in list(videos.items()):
         if not os.path.isfile(video_path):
             logger.warning(f"Le fichier vidéo pour la direction {direction} n'existe pas: {video_path}")
             
@@ -0,0 +1,202 @@
+import threading
+import time
+import cv2
+import numpy as np
+
+
+class _MaskLayout:
+    """
+    Disposition des masques d'un lot : un emplacement par détecteur inscrit, empilés verticalement
+    Les masques de voies et le remplissage sont précalculés pour ces détecteurs
+    """
+    def __init__(self, detectors, pad):
+        shapes = [detector.roi.labels.shape for detector in detectors]
+        self.shapes = shapes
+        # Emplacement de chaque détecteur (clé : l'instance, remplacée avec sa ROI à la reconfiguration)
+        self.index = {detector: i for i, detector in enumerate(detectors)}
+        self.slot_height = max(h for h, _ in shapes) + pad
+        self.slot_width = max(w for _, w in shapes)
+
+        count = len(detectors)
+        size = (count, self.slot_height, self.slot_width)
+        self.canvas = np.zeros(size, dtype=np.uint8)
+        # Pixels dans les voies, pixels dans le recadrage, pixels de remplissage
+        self.lanes = np.zeros(size, dtype=np.uint8)
+        self.inside = np.zeros(size, dtype=np.uint8)
+        for i, (detector, (h, w)) in enumerate(zip(detectors, shapes)):
+            self.inside[i, :h, :w] = 255
+            self.lanes[i, :h, :w] = detector.roi.mask if detector.roi.mask is not None else 255
+        self.outside = cv2.bitwise_not(self.inside)
+
+    def flat(self, array):
+        return array.reshape(-1, self.slot_width)
+
+    def slot(self, i):
+        h, w = self.shapes[i]
+        return self.canvas[i, :h, :w]
+
+    def covers(self, detectors):
+        return all(detector in self.index for detector in detectors)
+
+
+class BatchPreprocessor:
+    """
+    Regroupe la frame courante de chaque direction pour exécuter redimensionnement,
+    conversion en niveaux de gris, seuillage et morphologie en une opération par lot
+    La soustraction de fond (modèle propre à chaque direction) reste appliquée par direction
+    Réservé aux détecteurs MOG2 (detector.batchable)
+
+    Chaque thread de direction s'inscrit avec son détecteur (register) puis appelle detect();
+    le lot part quand toutes les directions inscrites ont soumis leur frame ou après `max_wait` secondes
+    """
+    def __init__(self, max_wait=0.02):
+        self.max_wait = max_wait
+        self._condition = threading.Condition()
+        # Direction -> détecteur inscrit
+        self._members = {}
+        self._pending = {}
+        self._results = {}
+        self._generation = 0
+        # Disposition des masques des détecteurs inscrits, par paramètres de détection;
+        # reconstruites à chaque inscription ou désinscription
+        self._layouts = {}
+
+        self.batches = 0
+        self.batched_frames = 0
+
+    def register(self, direction, detector):
+        with self._condition:
+            self._members[direction] = detector
+            self._layouts.clear()
+
+    def unregister(self, direction):
+        with self._condition:
+            self._members.pop(direction, None)
+            self._layouts.clear()
+            # Les directions en attente n'attendent plus celle-ci
+            self._condition.notify_all()
+
+    def detect(self, pipeline, frame):
+        """
+        Boîtes détectées par le détecteur MOG2 du pipeline (aucune si porte de mouvement fermée),
+        calculées dans le lot courant
+        """
+        direction = pipeline.direction
+        with self._condition:
+            self._pending[direction] = (pipeline.detector, frame)
+            generation = self._generation
+            deadline = time.monotonic() + self.max_wait
+
+            while self._generation == generation:
+                remaining = deadline - time.monotonic()
+                if self._members.keys() <= self._pending.keys() or remaining <= 0:
+                    # Dernière frame attendue (ou délai écoulé) : ce thread exécute le lot
+                    self._run_pending()
+                    break
+                self._condition.wait(remaining)
+
+            result = self._results.pop(direction)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _run_pending(self):
+        items, self._pending = self._pending, {}
+        try:
+            groups = {}
+            for direction, (detector, frame) in items.items():
+                key = (frame.shape, detector.detection_size, detector.morph_size)
+                groups.setdefault(key, []).append((direction, detector, frame))
+            for members in groups.values():
+                self._results.update(self._run_group(members))
+            self.batches += 1
+            self.batched_frames += len(items)
+        except Exception as e:
+            for direction in items:
+                self._results.setdefault(direction, e)
+        finally:
+            self._generation += 1
+            self._condition.notify_all()
+
+    def _run_group(self, members):
+        """
+        Traite un groupe de frames de même forme et de mêmes paramètres de détection
+        """
+        detectors = [detector for _, detector, _ in members]
+        frames = [frame for _, _, frame in members]
+        count = len(frames)
+        height, width = frames[0].shape[:2]
+        detection_width, detection_height = detectors[0].detection_size
+
+        # Redimensionnement et conversion en gris de toutes les frames empilées
+        stacked = np.concatenate(frames)
+        if (width, height) == (detection_width, detection_height):
+            small = stacked
+        elif height % detection_height == 0 and width % detection_width == 0:
+            # Facteur entier : INTER_AREA moyenne des blocs qui ne chevauchent jamais deux frames
+            small = cv2.resize(stacked, (detection_width, count * detection_height),
+                               interpolation=cv2.INTER_AREA)
+        else:
+            small = np.concatenate([cv2.resize(frame, (detection_width, detection_height),
+                                               interpolation=cv2.INTER_AREA) for frame in frames])
+        grays = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).reshape(count, detection_height, detection_width)
+
+        # Soustraction de fond par direction (porte de mouvement comprise)
+        results = {}
+        active = []
+        for (direction, detector, _), gray in zip(members, grays):
+            mask = detector.foreground(gray)
+            if mask is None:
+                results[direction] = np.empty((0, 4), dtype=np.int64)
+            else:
+                active.append((direction, detector, mask))
+        if not active:
+            return results
+
+        layout = self._layout(detectors)
+        # Emplacements des directions sans masque (porte fermée, frame non soumise) vidés
+        filled = set()
+        for _, detector, mask in active:
+            i = layout.index[detector]
+            layout.slot(i)[...] = mask
+            filled.add(i)
+        for i in range(len(layout.shapes)):
+            if i not in filled:
+                layout.slot(i)[...] = 0
+
+        # Seuillage, restriction aux voies et ouverture sur le lot entier
+        canvas = layout.flat(layout.canvas)
+        cv2.threshold(canvas, 254, 255, cv2.THRESH_BINARY, dst=canvas)
+        cv2.bitwise_and(canvas, layout.flat(layout.lanes), dst=canvas)
+        kernel = detectors[0].morph_kernel
+        if kernel is not None:
+            # Remplissage à 255 pour l'érosion puis à 0 pour la dilatation : mêmes bords
+            # qu'une ouverture appliquée séparément à chaque masque
+            cv2.bitwise_or(canvas, layout.flat(layout.outside), dst=canvas)
+            cv2.erode(canvas, kernel, dst=canvas)
+            cv2.bitwise_and(canvas, layout.flat(layout.inside), dst=canvas)
+            cv2.dilate(canvas, kernel, dst=canvas)
+
+        for direction, detector, _ in active:
+            results[direction] = detector.blobs(layout.slot(layout.index[detector]))
+        return results
+
+    def _layout(self, detectors):
+        """
+        Disposition des détecteurs inscrits partageant les paramètres de détection de ce groupe
+        (un détecteur non inscrit y est ajouté)
+        """
+        key = (detectors[0].detection_size, detectors[0].morph_size)
+        layout = self._layouts.get(key)
+        if layout is None or not layout.covers(detectors):
+            members = [detector for detector in self._members.values()
+                       if (detector.detection_size, detector.morph_size) == key]
+            members += [detector for detector in detectors if detector not in members]
+            layout = self._layouts[key] = _MaskLayout(members, detectors[0].morph_size)
+        return layout
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'average_batch': round(self.batched_frames / self.batches, 2) if self.batches else 0.0
+        }
@@ -0,0 +1,54 @@
+"""
+Micro-benchmark des modes d'association du tracker
+
+Usage : python bench_tracker.py [--frames 300] [--sizes 10 50 200]
+"""
+import argparse
+import time
+import numpy as np
+from tracker import create_tracker
+
+
+def generate_scene(n_objects, n_frames, width=400, height=300, seed=0):
+    """
+    Génère des boîtes qui se déplacent à vitesse constante, avec des tailles
+    variées (motos à camions), pour n_frames images
+    """
+    rng = np.random.default_rng(seed)
+    sizes = rng.integers(45, 120, size=(n_objects, 2))
+    starts = rng.uniform(0, [width, height], size=(n_objects, 2))
+    velocities = rng.uniform(-4, 4, size=(n_objects, 2))
+
+    frames = []
+    for k in range(n_frames):
+        positions = (starts + velocities * k) % [width, height]
+        boxes = np.hstack((positions.astype(int), sizes))
+        frames.append(boxes.tolist())
+    return frames
+
+
+def bench(mode, frames):
+    tracker = create_tracker(mode)
+    start = time.perf_counter()
+    for detections in frames:
+        tracker.update(detections)
+    elapsed = time.perf_counter() - start
+    return elapsed / len(frames) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des modes d'association du tracker")
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--modes', nargs='+', default=['euclidean', 'iou'])
+    args = parser.parse_args()
+
+    print(f"{'boîtes':>8} " + " ".join(f"{mode:>12}" for mode in args.modes) + "   (ms/frame)")
+    for n_objects in args.sizes:
+        frames = generate_scene(n_objects, args.frames)
+        timings = [bench(mode, frames) for mode in args.modes]
+        print(f"{n_objects:>8} " + " ".join(f"{t:>12.3f}" for t in timings))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,391 @@
+import math
+import threading
+import time
+import cv2
+import numpy as np
+from notify import Notifier
+
+# Séparateur multipart des flux MJPEG (boundary=frame)
+MJPEG_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+
+
+def mjpeg_part(jpeg):
+    """
+    Partie multipart d'une image JPEG encodée
+    """
+    return MJPEG_HEADER + jpeg + b'\r\n'
+
+
+def frame_signature(frame, cell=8):
+    """
+    Empreinte grossière d'une frame : moyenne de chaque bloc de cell x cell pixels
+    Le bruit du capteur s'y moyenne; un objet qui bouge ou un texte qui change modifie ses blocs
+    """
+    height, width = frame.shape[:2]
+    return cv2.resize(frame, (max(width // cell, 1), max(height // cell, 1)), interpolation=cv2.INTER_AREA)
+
+
+def same_content(signature, previous, tolerance):
+    """
+    Deux empreintes sont identiques si aucun bloc ne diffère de plus de `tolerance` niveaux
+    """
+    return (previous is not None and signature.shape == previous.shape
+            and cv2.norm(signature, previous, cv2.NORM_INF) <= tolerance)
+
+
+# Qualités JPEG et échelles proposées aux clients, de la meilleure à la plus légère
+# Les demandes sont arrondies à ces niveaux pour que les clients partagent les mêmes encodages
+QUALITY_LEVELS = (95, 85, 70, 55, 40, 25)
+SCALE_LEVELS = (1.0, 0.75, 0.5, 0.25)
+
+
+def _nearest(levels, value):
+    return min(levels, key=lambda level: abs(level - value))
+
+
+class ClientProfile:
+    """
+    Profil d'encodage d'un client MJPEG : qualité JPEG, échelle et FPS maximal
+    Dégradé d'un cran (qualité, puis échelle) quand l'écriture sur sa socket prend du retard :
+    `patience` envois consécutifs de plus de `slow_write` secondes
+    """
+    def __init__(self, default_quality, quality=None, scale=1.0, max_fps=None, slow_write=0.25, patience=3):
+        self.quality = default_quality if quality is None else _nearest(QUALITY_LEVELS, quality)
+        self.scale = _nearest(SCALE_LEVELS, scale)
+        self.frame_interval = 1.0 / max_fps if max_fps else 0.0
+        self.slow_write = slow_write
+        self.patience = patience
+        self.slow_writes = 0
+        self.downgrades = 0
+
+    @property
+    def key(self):
+        return (self.quality, self.scale)
+
+    def record_write(self, duration):
+        """
+        Durée d'écriture d'une frame chez le client (temps passé hors du générateur)
+        Retourne True si le profil vient d'être dégradé
+        """
+        if duration <= self.slow_write:
+            self.slow_writes = 0
+            return False
+        self.slow_writes += 1
+        if self.slow_writes < self.patience:
+            return False
+        self.slow_writes = 0
+        lower_qualities = [level for level in QUALITY_LEVELS if level < self.quality]
+        if lower_qualities:
+            self.quality = lower_qualities[0]
+        elif self.scale > SCALE_LEVELS[-1]:
+            self.scale = SCALE_LEVELS[SCALE_LEVELS.index(self.scale) + 1]
+        else:
+            # Profil déjà le plus léger
+            return False
+        self.downgrades += 1
+        return True
+
+
+class FrameBroadcaster:
+    """
+    Diffusion d'un flux vers plusieurs clients MJPEG
+    Chaque nouvelle frame de l'anneau est encodée une seule fois par profil (qualité, échelle),
+    par le premier client de ce profil qui la demande; les autres clients du profil reçoivent
+    les mêmes octets. Un client lent ne reçoit que la frame la plus récente au moment où il
+    est prêt (les frames intermédiaires sont sautées)
+
+    source: fonction retournant l'anneau de frames courant du flux (il change d'un processus à l'autre)
+    encode: fonction (frame, qualité, échelle) -> (ok, tampon JPEG); qualité None : qualité du flux
+    Le producteur signale chaque frame écrite par updated.notify(); les clients l'attendent
+    Une frame réécrite par le producteur pendant sa lecture (is_current faux après l'encodage)
+    est relue, jusqu'à `retries` fois
+    Une frame identique à la précédente (empreinte à `tolerance` niveaux près : caméra statique,
+    frame de fin republiée) n'est pas encodée : les clients gardent la précédente, dont les octets
+    peuvent être renvoyés tels quels (repeat_payload)
+    """
+    def __init__(self, source, encode, tolerance=2, retries=3):
+        self.source = source
+        self.encode = encode
+        self.tolerance = tolerance
+        self.retries = retries
+        self._lock = threading.Lock()
+        # Numéro de la dernière frame lue, propre au diffuseur (les anneaux repartent de zéro)
+        self.sequence = 0
+        self._ring = None
+        self._ring_sequence = 0
+        # Empreinte de la dernière frame retenue
+        self._signature = None
+        # Dernier encodage de chaque profil : profil -> (séquence, partie multipart)
+        self._payloads = {}
+        # Frame d'attente encodée de chaque profil (flux terminé) : profil -> partie multipart
+        self._idle = {}
+        # Signalé à chaque frame écrite dans l'anneau et au retrait du flux
+        self.updated = Notifier()
+
+        self.clients = 0
+        self.encoded = 0
+        self.sent = 0
+        # Frames non encodées : identiques à la précédente, ou frame d'attente déjà encodée
+        self.reused = 0
+        # Lectures recommencées : emplacement réécrit pendant l'empreinte ou l'encodage
+        self.torn = 0
+        self.profile_encodes = {}
+
+    def connect(self):
+        with self._lock:
+            self.clients += 1
+
+    def disconnect(self):
+        with self._lock:
+            self.clients -= 1
+
+    def next_payload(self, last_sequence, profile=(None, 1.0)):
+        """
+        Retourne (séquence, partie multipart) de la frame la plus récente encodée pour ce profil
+        (qualité, échelle) si elle est plus récente que last_sequence, sinon (last_sequence, None)
+        """
+        with self._lock:
+            ring = self.source()
+            if ring is not self._ring:
+                self._ring = ring
+                self._ring_sequence = 0
+            for _ in range(self.retries):
+                result = self._read(ring, last_sequence, profile)
+                if result is not None:
+                    return result
+                self.torn += 1
+            return last_sequence, None
+
+    def _read(self, ring, last_sequence, profile):
+        """
+        Lecture de la frame la plus récente, empreinte et encodage éventuel
+        Retourne None si l'emplacement lu a été réécrit entre-temps (rien n'est alors retenu)
+        """
+        ring_sequence, frame = ring.read_latest()
+        if ring_sequence > self._ring_sequence:
+            signature = frame_signature(frame)
+            if not ring.is_current(ring_sequence):
+                return None
+            self._ring_sequence = ring_sequence
+            if same_content(signature, self._signature, self.tolerance):
+                # Contenu inchangé : les octets déjà envoyés restent valables
+                self.reused += 1
+            else:
+                self._signature = signature
+                self.sequence += 1
+        if self.sequence <= last_sequence:
+            return last_sequence, None
+
+        encoded_sequence, payload = self._payloads.get(profile, (0, None))
+        if encoded_sequence < self.sequence and frame is not None:
+            ret, buffer = self.encode(frame, *profile)
+            if not ring.is_current(ring_sequence):
+                return None
+            if ret:
+                payload = mjpeg_part(buffer.tobytes())
+                self._payloads[profile] = (self.sequence, payload)
+                self.encoded += 1
+                self.profile_encodes[profile] = self.profile_encodes.get(profile, 0) + 1
+        if payload is None:
+            return last_sequence, None
+        self.sent += 1
+        return self.sequence, payload
+
+    def repeat_payload(self, profile=(None, 1.0)):
+        """
+        Derniers octets encodés pour ce profil, renvoyés tels quels (contenu inchangé), ou None
+        """
+        with self._lock:
+            _, payload = self._payloads.get(profile, (0, None))
+            if payload is not None:
+                self.sent += 1
+            return payload
+
+    def idle_payload(self, build_frame, profile=(None, 1.0)):
+        """
+        Partie multipart de la frame d'attente, construite et encodée une seule fois par profil
+        profile: clé (qualité, échelle) du profil du client
+        """
+        with self._lock:
+            payload = self._idle.get(profile)
+            if payload is None:
+                ret, buffer = self.encode(build_frame(), *profile)
+                if not ret:
+                    return None
+                payload = self._idle[profile] = mjpeg_part(buffer.tobytes())
+                self.encoded += 1
+            else:
+                self.reused += 1
+            self.sent += 1
+            return payload
+
+    def stats(self):
+        return {
+            'clients': self.clients,
+            'encoded': self.encoded,
+            'sent': self.sent,
+            # Envois par encodage : proche du nombre de clients quand l'encodage est partagé
+            'fanout': round(self.sent / self.encoded, 2) if self.encoded else 0.0,
+            'reused': self.reused,
+            # Part des frames servies sans encodage
+            'reuse_ratio': round(self.reused / (self.reused + self.encoded), 3) if self.reused + self.encoded else 0.0,
+            'torn': self.torn,
+            # Encodages par profil "qualité@échelle"
+            'profiles': {f"{quality}@{scale}": count
+                         for (quality, scale), count in self.profile_encodes.items()}
+        }
+
+
+class MosaicBroadcaster:
+    """
+    Mosaïque de tous les flux en un seul flux MJPEG
+    La dernière frame de chaque flux est copiée dans sa tuile d'un canevas préalloué,
+    encodé une fois par tick (fps) pour tous les clients de la mosaïque; rien n'est
+    calculé tant qu'aucun client ne la demande
+
+    sources: fonction retournant la liste [(identifiant, anneau de frames)] des flux
+    """
+    def __init__(self, sources, fps=5.0, tile_size=(400, 330), quality=80):
+        self.sources = sources
+        self.period = 1.0 / fps
+        self.tile_width, self.tile_height = tile_size
+        self.quality = quality
+        self._lock = threading.Lock()
+        # Canevas et identifiants des tuiles, réalloués quand l'ensemble des flux change
+        self.canvas = None
+        self._layout = None
+        # Anneau et séquence de chaque tuile lors de la dernière composition
+        self._generations = None
+        self.sequence = 0
+        self.payload = None
+        self.next_tick = 0.0
+        # Signalé à chaque mosaïque encodée
+        self.updated = Notifier()
+
+        self.clients = 0
+        self.encoded = 0
+        self.sent = 0
+        # Ticks sans nouvelle frame d'aucun flux : mosaïque ni recomposée ni réencodée
+        self.reused = 0
+
+    def connect(self):
+        with self._lock:
+            self.clients += 1
+
+    def disconnect(self):
+        with self._lock:
+            self.clients -= 1
+
+    def time_to_tick(self):
+        return max(self.next_tick - time.monotonic(), 0.0)
+
+    def _arrange(self, stream_ids):
+        """
+        Grille la plus carrée possible : une tuile par flux
+        """
+        columns = max(math.ceil(math.sqrt(len(stream_ids))), 1)
+        rows = max(math.ceil(len(stream_ids) / columns), 1)
+        self.canvas = np.zeros((rows * self.tile_height, columns * self.tile_width, 3), dtype=np.uint8)
+        self._layout = stream_ids
+
+    def _tile(self, index):
+        columns = self.canvas.shape[1] // self.tile_width
+        row, column = divmod(index, columns)
+        y, x = row * self.tile_height, column * self.tile_width
+        return self.canvas[y:y + self.tile_height, x:x + self.tile_width]
+
+    def _generation(self, ring):
+        try:
+            return id(ring), ring.sequence
+        except Exception:
+            return id(ring), None
+
+    def _compose(self):
+        """
+        Copie la dernière frame de chaque flux dans sa tuile
+        Retourne False sans rien copier si aucun flux n'a publié de frame depuis la dernière composition
+        """
+        sources = self.sources()
+        generations = [(stream_id, self._generation(ring)) for stream_id, ring in sources]
+        if generations == self._generations:
+            return False
+        self._generations = generations
+        stream_ids = [stream_id for stream_id, _ in sources]
+        if stream_ids != self._layout:
+            self._arrange(stream_ids)
+        for index, (stream_id, ring) in enumerate(sources):
+            tile = self._tile(index)
+            for _ in range(3):
+                try:
+                    sequence, frame = ring.read_latest()
+                    self._copy(frame, tile)
+                    # Emplacement réécrit pendant la copie : frame relue
+                    if frame is None or ring.is_current(sequence):
+                        break
+                except Exception:
+                    # Anneau fermé (flux retiré pendant la composition)
+                    tile[...] = 0
+                    break
+        return True
+
+    def _copy(self, frame, tile):
+        if frame is None:
+            tile[...] = 0
+        elif frame.shape == tile.shape:
+            tile[...] = frame
+        else:
+            # Redimensionnement directement dans la tuile
+            resized = cv2.resize(frame, (self.tile_width, self.tile_height), dst=tile,
+                                 interpolation=cv2.INTER_AREA)
+            if resized.ctypes.data != tile.ctypes.data:
+                tile[...] = resized
+
+    def next_payload(self, last_sequence):
+        """
+        Retourne (séquence, partie multipart) de la dernière mosaïque si elle est plus récente
+        que last_sequence, sinon (last_sequence, None); compose et encode la mosaïque si le tick est échu
+        """
+        composed = False
+        with self._lock:
+            now = time.monotonic()
+            if now >= self.next_tick:
+                if not self._compose():
+                    ret = False
+                    self.reused += 1
+                else:
+                    ret, buffer = cv2.imencode('.jpg', self.canvas, [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
+                if ret:
+                    self.payload = mjpeg_part(buffer.tobytes())
+                    self.sequence += 1
+                    self.encoded += 1
+                    composed = True
+                # Tick suivant, sans rattraper les ticks manqués
+                self.next_tick = max(self.next_tick + self.period, now)
+            if self.sequence > last_sequence:
+                self.sent += 1
+                result = self.sequence, self.payload
+            else:
+                result = last_sequence, None
+        if composed:
+            self.updated.notify()
+        return result
+
+    def repeat_payload(self):
+        """
+        Dernière mosaïque encodée, renvoyée telle quelle (aucun flux n'a publié de frame), ou None
+        """
+        with self._lock:
+            if self.payload is not None:
+                self.sent += 1
+            return self.payload
+
+    def stats(self):
+        return {
+            'clients': self.clients,
+            'encoded': self.encoded,
+            'sent': self.sent,
+            'reused': self.reused,
+            'reuse_ratio': round(self.reused / (self.reused + self.encoded), 3) if self.reused + self.encoded else 0.0,
+            'tiles': len(self._layout or ()),
+            'fps': round(1.0 / self.period, 2)
+        }
@@ -0,0 +1,83 @@
+import logging
+import cv2
+import numpy as np
+from camera_config import load_camera_config, camera_settings, CONFIG_FILE
+
+logger = logging.getLogger(__name__)
+
+
+class GroundLookup:
+    """
+    Table précalculée pixel -> plan du sol (mètres) pour une résolution donnée
+    """
+    def __init__(self, table):
+        # table[y, x] = (X, Y) en mètres
+        self.table = table
+        self.height, self.width = table.shape[:2]
+
+    def to_ground(self, points):
+        """
+        Convertit des points image (N, 2) en coordonnées sol (N, 2) par simple lecture de table
+        """
+        points = np.asarray(points)
+        xs = np.clip(points[:, 0].astype(np.intp), 0, self.width - 1)
+        ys = np.clip(points[:, 1].astype(np.intp), 0, self.height - 1)
+        return self.table[ys, xs]
+
+
+class GroundCalibration:
+    """
+    Calibration d'une caméra par homographie à partir de quatre points de référence
+    """
+    def __init__(self, image_points, ground_points, resolution):
+        # Points image exprimés dans la résolution `resolution` (largeur, hauteur)
+        self.resolution = tuple(resolution)
+        self.homography = cv2.getPerspectiveTransform(
+            np.asarray(image_points, dtype=np.float32),
+            np.asarray(ground_points, dtype=np.float32)
+        )
+        # Tables précalculées par résolution
+        self._lookups = {}
+
+    @classmethod
+    def from_settings(cls, settings):
+        """
+        Crée une calibration depuis la section 'calibration' de cameras.json
+        """
+        return cls(settings['image_points'], settings['ground_points'],
+                   settings.get('resolution', (400, 300)))
+
+    def lookup(self, width, height):
+        """
+        Retourne la table pixel -> sol pour une résolution, calculée une seule fois
+        """
+        key = (width, height)
+        if key not in self._lookups:
+            # Mise à l'échelle de la résolution demandée vers celle de la calibration
+            scale = np.diag([self.resolution[0] / width, self.resolution[1] / height, 1.0])
+            matrix = self.homography @ scale
+
+            xs, ys = np.meshgrid(np.arange(width, dtype=np.float32),
+                                 np.arange(height, dtype=np.float32))
+            pixels = np.stack((xs, ys), axis=-1).reshape(-1, 1, 2)
+            ground = cv2.perspectiveTransform(pixels, matrix)
+            self._lookups[key] = GroundLookup(ground.reshape(height, width, 2))
+        return self._lookups[key]
+
+
+def load_calibrations(videos, path=CONFIG_FILE):
+    """
+    Charge les calibrations par direction depuis le fichier de configuration caméras
+    videos: dictionnaire direction -> chemin vidéo
+    """
+    config = load_camera_config(path)
+    calibrations = {}
+    for direction, video_path in videos.items():
+        settings = camera_settings(config, video_path, 'calibration')
+        if not settings:
+            continue
+        try:
+            calibrations[direction] = GroundCalibration.from_settings(settings)
+        except (KeyError, ValueError, cv2.error) as e:
+            logger.error(f"Calibration invalide pour {direction} ({video_path}): {e}")
+    return calibrations
@@ -0,0 +1,87 @@
+import json
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Fichier de configuration des caméras, indexé par le chemin vidéo (entrées de `videos` dans app.py)
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cameras.json")
+
+
+def load_camera_config(path=CONFIG_FILE):
+    """
+    Charge la configuration des caméras
+    Retourne un dictionnaire vide si le fichier n'existe pas ou est invalide
+    """
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"Configuration caméras invalide ({path}): {e}")
+        return {}
+
+
+def camera_settings(config, video_path, section):
+    """
+    Retourne la section demandée pour une vidéo ('calibration', ...) ou None
+    La vidéo est recherchée par son chemin puis par son nom de fichier
+    """
+    entry = config.get(video_path)
+    if entry is None:
+        entry = config.get(os.path.basename(video_path))
+    if entry is None:
+        return None
+    return entry.get(section)
+
+
+def scale_points(points, resolution, size):
+    """
+    Convertit des points exprimés dans `resolution` (largeur, hauteur) vers `size`
+    """
+    sx = size[0] / resolution[0]
+    sy = size[1] / resolution[1]
+    return [(x * sx, y * sy) for x, y in points]
+
+
+# Résolutions par défaut d'un flux : image affichée, image encodée (identique par défaut)
+# et image réduite en niveaux de gris pour la détection
+DEFAULT_DISPLAY = {
+    'size': (400, 300),
+    'encode_size': None,
+    'detection_size': (200, 150),
+    'jpeg_quality': 85
+}
+
+
+def display_settings(settings):
+    """
+    Complète la section 'display' d'une caméra avec les valeurs par défaut
+    """
+    result = dict(DEFAULT_DISPLAY)
+    result.update(settings or {})
+    for key in ('size', 'encode_size', 'detection_size'):
+        if result[key] is not None:
+            width, height = (int(v) for v in result[key])
+            result[key] = (width, height)
+    if result['encode_size'] is None:
+        result['encode_size'] = result['size']
+    result['jpeg_quality'] = int(result['jpeg_quality'])
+    return result
+
+
+def load_display_settings(videos, path=CONFIG_FILE):
+    """
+    Résolutions d'affichage, d'encodage et de détection de chaque direction
+    videos: dictionnaire direction -> chemin vidéo
+    """
+    config = load_camera_config(path)
+    settings = {}
+    for direction, video_path in videos.items():
+        try:
+            settings[direction] = display_settings(camera_settings(config, video_path, 'display'))
+        except (TypeError, ValueError) as e:
+            logger.error(f"Configuration d'affichage invalide pour {direction} ({video_path}): {e}")
+            settings[direction] = display_settings(None)
+    return settings
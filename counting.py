@@ -0,0 +1,202 @@
+from collections import deque
+import logging
+import cv2
+import numpy as np
+from camera_config import load_camera_config, camera_settings, scale_points, CONFIG_FILE
+
+logger = logging.getLogger(__name__)
+
+# Classe attribuée aux objets quand le détecteur ne fournit pas de classe
+DEFAULT_CLASS = 'vehicule'
+
+
+class CountingLine:
+    """
+    Ligne virtuelle de comptage : un objet est compté quand son centre la traverse
+    """
+    def __init__(self, name, start, end):
+        self.name = name
+        self.start = np.asarray(start, dtype=np.float64)
+        self.end = np.asarray(end, dtype=np.float64)
+
+    def crossed(self, previous, current):
+        """
+        Indique pour chaque piste si le segment précédent -> courant coupe la ligne
+        """
+        a, b = self.start, self.end
+        direction = b - a
+        side_prev = direction[0] * (previous[:, 1] - a[1]) - direction[1] * (previous[:, 0] - a[0])
+        side_curr = direction[0] * (current[:, 1] - a[1]) - direction[1] * (current[:, 0] - a[0])
+
+        move = current - previous
+        side_a = move[:, 0] * (a[1] - previous[:, 1]) - move[:, 1] * (a[0] - previous[:, 0])
+        side_b = move[:, 0] * (b[1] - previous[:, 1]) - move[:, 1] * (b[0] - previous[:, 0])
+
+        # Un point situé exactement sur la ligne est rattaché au côté positif
+        return ((side_prev < 0) != (side_curr < 0)) & (side_a * side_b <= 0)
+
+
+class CountingZone:
+    """
+    Zone virtuelle de comptage : un objet est compté à son entrée dans le polygone
+    """
+    def __init__(self, name, polygon, size):
+        self.name = name
+        width, height = size
+        # Masque précalculé une seule fois pour la résolution d'affichage
+        points = np.asarray(polygon, dtype=np.int32).reshape(-1, 1, 2)
+        mask = np.zeros((height, width), dtype=np.uint8)
+        cv2.fillPoly(mask, [points], 1)
+        self.mask = mask.astype(bool)
+
+    def contains(self, points):
+        height, width = self.mask.shape
+        xs = np.clip(points[:, 0].astype(np.intp), 0, width - 1)
+        ys = np.clip(points[:, 1].astype(np.intp), 0, height - 1)
+        return self.mask[ys, xs]
+
+
+class DirectionCounter:
+    """
+    Compteurs de passage d'une direction sur des lignes et des zones virtuelles
+    La mémoire utilisée ne dépend que du nombre de pistes actives, pas de la durée
+    """
+    def __init__(self, lines, zones=(), bin_seconds=60, max_bins=1440, forget_after=30):
+        self.lines = list(lines)
+        self.zones = list(zones)
+        # Durée d'un intervalle d'agrégation et nombre d'intervalles conservés
+        self.bin_seconds = bin_seconds
+        self.max_bins = max_bins
+        # Nombre de mises à jour sans voir une piste avant d'oublier son état
+        self.forget_after = forget_after
+        self.reset()
+
+    def reset(self):
+        self.total = 0
+        self.classes = {}
+        self.lane_counts = {}
+        self.line_counts = {line.name: 0 for line in self.lines}
+        self.zone_counts = {zone.name: 0 for zone in self.zones}
+        self.bins = deque(maxlen=self.max_bins)
+        # État des pistes actives : id -> [cx, cy, inside zones (bits), counted, last update]
+        self._tracks = {}
+        self._updates = 0
+
+    def _add_to_bin(self, timestamp, object_class):
+        start = int(timestamp // self.bin_seconds) * self.bin_seconds
+        if not self.bins or self.bins[-1]['start'] != start:
+            self.bins.append({'start': start, 'total': 0, 'classes': {}})
+        current = self.bins[-1]
+        current['total'] += 1
+        current['classes'][object_class] = current['classes'].get(object_class, 0) + 1
+
+    def update(self, tracked_objects, timestamp, classes=None, lanes=None):
+        """
+        Met à jour les compteurs avec les objets suivis de la frame courante
+        tracked_objects: lignes [x, y, w, h, id, vitesse] retournées par le tracker
+        classes: classe de chaque objet, None si inconnue (optionnel)
+        lanes: voie de détection de chaque objet, None hors des voies (optionnel)
+        """
+        self._updates += 1
+        if len(tracked_objects):
+            rows = np.asarray([row[:5] for row in tracked_objects], dtype=np.float64)
+            ids = rows[:, 4].astype(np.int64).tolist()
+            current = np.column_stack((rows[:, 0] + rows[:, 2] / 2, rows[:, 1] + rows[:, 3] / 2))
+
+            known = [self._tracks.get(obj_id) for obj_id in ids]
+            previous = np.array([state[:2] if state else (cx, cy)
+                                 for state, (cx, cy) in zip(known, current.tolist())])
+
+            line_hits = [line.crossed(previous, current) for line in self.lines]
+            zone_inside = [zone.contains(current) for zone in self.zones]
+
+            for i, obj_id in enumerate(ids):
+                state = known[i]
+                object_class = (classes[i] if classes is not None else None) or DEFAULT_CLASS
+                inside_bits = 0
+                event = False
+
+                for line, hits in zip(self.lines, line_hits):
+                    if hits[i]:
+                        self.line_counts[line.name] += 1
+                        event = True
+
+                for z, (zone, inside) in enumerate(zip(self.zones, zone_inside)):
+                    if inside[i]:
+                        inside_bits |= 1 << z
+                        # Entrée dans la zone (objet déjà suivi, précédemment à l'extérieur)
+                        if state and not state[2] & (1 << z):
+                            self.zone_counts[zone.name] += 1
+                            event = True
+
+                counted = bool(state and state[3])
+                if event and not counted:
+                    # Un objet n'est compté qu'une fois au total, quel que soit le nombre de lignes
+                    self.total += 1
+                    self.classes[object_class] = self.classes.get(object_class, 0) + 1
+                    lane = lanes[i] if lanes is not None else None
+                    if lane is not None:
+                        self.lane_counts[lane] = self.lane_counts.get(lane, 0) + 1
+                    self._add_to_bin(timestamp, object_class)
+                    counted = True
+
+                self._tracks[obj_id] = [current[i, 0], current[i, 1], inside_bits, counted, self._updates]
+
+        # Oubli des pistes disparues
+        expired = [obj_id for obj_id, state in self._tracks.items()
+                   if self._updates - state[4] > self.forget_after]
+        for obj_id in expired:
+            del self._tracks[obj_id]
+
+    def snapshot(self):
+        """
+        Résumé de taille constante pour les API et le gestionnaire de trafic
+        """
+        return {
+            'total': self.total,
+            'classes': dict(self.classes),
+            'lanes': dict(self.lane_counts),
+            'lines': dict(self.line_counts),
+            'zones': dict(self.zone_counts),
+            'current_interval': dict(self.bins[-1]) if self.bins else None
+        }
+
+    def intervals(self, since=None):
+        """
+        Intervalles d'agrégation conservés, éventuellement à partir d'un horodatage
+        """
+        return [dict(b) for b in self.bins if since is None or b['start'] >= since]
+
+
+def build_counter(settings, size=(400, 300)):
+    """
+    Crée les compteurs d'une direction depuis la section 'counting' de cameras.json
+    Sans configuration, une ligne horizontale traverse l'image à 55% de la hauteur
+    """
+    width, height = size
+    if not settings:
+        return DirectionCounter([CountingLine('ligne', (0, height * 0.55), (width, height * 0.55))])
+
+    resolution = settings.get('resolution', size)
+    lines = [CountingLine(line['name'], *scale_points(line['points'], resolution, size))
+             for line in settings.get('lines', [])]
+    zones = [CountingZone(zone['name'], scale_points(zone['polygon'], resolution, size), size)
+             for zone in settings.get('zones', [])]
+    return DirectionCounter(lines, zones, bin_seconds=settings.get('bin_seconds', 60))
+
+
+def load_counters(videos, size=(400, 300), path=CONFIG_FILE):
+    """
+    Crée les compteurs de chaque direction
+    videos: dictionnaire direction -> chemin vidéo
+    """
+    config = load_camera_config(path)
+    counters = {}
+    for direction, video_path in videos.items():
+        settings = camera_settings(config, video_path, 'counting')
+        try:
+            counters[direction] = build_counter(settings, size)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"Configuration de comptage invalide pour {direction} ({video_path}): {e}")
+            counters[direction] = build_counter(None, size)
+    return counters
@@ -0,0 +1,281 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Répertoire des caches de détections
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+# Incrémenté à chaque changement du format des fichiers de cache ou du suivi enregistré
+CACHE_VERSION = 2
+
+# Une entrée par frame détectée : indice de frame, horodatage média, premières ligne et nombre de lignes
+FRAME_DTYPE = np.dtype([('index', np.int64), ('time', np.float64), ('start', np.int64), ('count', np.int32)])
+# Une ligne par objet suivi; classe et voie sont des indices dans les tables de noms (-1 : inconnue)
+ROW_DTYPE = np.dtype([('box', np.int32, 4), ('id', np.int64), ('speed', np.float64),
+                      ('class', np.int16), ('lane', np.int16)])
+
+# Empreintes des fichiers vidéo déjà calculées : (chemin, taille, date) -> empreinte
+_digests = {}
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    Empreinte SHA-1 du contenu d'un fichier, calculée une fois par version du fichier
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    digest = _digests.get(key)
+    if digest is None:
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                sha1.update(chunk)
+        digest = _digests[key] = sha1.hexdigest()
+    return digest
+
+
+def pipeline_params(pipeline, scheduler):
+    """
+    Paramètres de détection, de suivi et de cadencement dont dépend le contenu du cache
+    Les frames détectées dépendent de l'intervalle de détection et du mode temps réel
+    """
+    return {
+        'version': CACHE_VERSION,
+        'detector': pipeline.detector.params(),
+        'tracker': pipeline.tracker.params(),
+        'scheduler': scheduler.params()
+    }
+
+
+def cache_key(video_path, params):
+    """
+    Nom du cache d'une vidéo : empreinte du fichier et empreinte des paramètres
+    """
+    params_digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+    return f"{file_digest(video_path)[:16]}_{params_digest[:16]}"
+
+
+def read_meta(base_path):
+    """
+    Métadonnées d'un cache, ou None s'il n'existe pas
+    """
+    try:
+        with open(base_path + '.json', 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+class CachedDetections:
+    """
+    Détections et pistes enregistrées d'une vidéo, lues par projection mémoire (np.load mmap)
+    """
+    def __init__(self, base_path):
+        meta = read_meta(base_path)
+        if meta is None:
+            raise FileNotFoundError(base_path + '.json')
+        self.classes = meta['classes']
+        self.lanes = meta['lanes']
+        # Dernière frame couverte par l'enregistrement
+        self.end = meta['end']
+        self.complete = meta['complete']
+        self.frames = np.load(base_path + '.frames.npy', mmap_mode='r')
+        self.rows = np.load(base_path + '.rows.npy', mmap_mode='r')
+        # Indices de frame chargés en mémoire pour la recherche
+        self.indices = np.asarray(self.frames['index'])
+        # Premier identifiant libre, pour poursuivre le suivi en direct après un cache partiel
+        self.next_id = int(self.rows['id'].max()) + 1 if len(self.rows) else 0
+
+    def covers(self, frame_index):
+        return frame_index <= self.end
+
+    def lookup(self, frame_index):
+        """
+        Objets suivis, classes et voies de la dernière frame détectée au plus tard à frame_index
+        """
+        position = int(np.searchsorted(self.indices, frame_index, side='right')) - 1
+        if position < 0:
+            return [], [], []
+        entry = self.frames[position]
+        rows = self.rows[entry['start']:entry['start'] + entry['count']]
+        tracked_objects = [[*box, object_id, speed] for box, object_id, speed
+                           in zip(rows['box'].tolist(), rows['id'].tolist(), rows['speed'].tolist())]
+        classes = [self.classes[c] if c >= 0 else None for c in rows['class'].tolist()]
+        lanes = [self.lanes[lane] if lane >= 0 else None for lane in rows['lane'].tolist()]
+        return tracked_objects, classes, lanes
+
+
+class _Spool:
+    """
+    Entrées d'un tableau structuré accumulées par blocs de chunk_size dans un fichier temporaire
+    """
+    def __init__(self, dtype, directory, chunk_size):
+        self.dtype = dtype
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.count = 0
+        self._pending = []
+        self._file = None
+
+    def append(self, entry):
+        self._pending.append(entry)
+        self.count += 1
+        if len(self._pending) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._file = tempfile.TemporaryFile(dir=self.directory, suffix='.part')
+        np.array(self._pending, dtype=self.dtype).tofile(self._file)
+        self._pending = []
+
+    def save(self, path):
+        """
+        Écrit toutes les entrées dans un fichier .npy, recopié bloc par bloc
+        """
+        self.flush()
+        with open(path, 'wb') as f:
+            np.lib.format.write_array_header_1_0(f, {'descr': np.lib.format.dtype_to_descr(self.dtype),
+                                                     'fortran_order': False, 'shape': (self.count,)})
+            if self._file is not None:
+                self._file.seek(0)
+                shutil.copyfileobj(self._file, f)
+
+    def close(self):
+        self._pending = []
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class DetectionRecorder:
+    """
+    Enregistre les pistes de chaque frame détectée d'une vidéo, depuis sa première frame,
+    puis les écrit dans le cache
+    Les entrées passent par blocs de chunk_size dans des fichiers temporaires du répertoire du cache :
+    la mémoire utilisée reste bornée quelle que soit la durée de la vidéo
+    """
+    def __init__(self, video_path, params, directory=CACHE_DIR, chunk_size=4096):
+        self.base_path = os.path.join(directory, cache_key(video_path, params))
+        self.video_path = video_path
+        self.classes = []
+        self.lanes = []
+        self.end = 0
+        self._frames = _Spool(FRAME_DTYPE, directory, chunk_size)
+        self._rows = _Spool(ROW_DTYPE, directory, chunk_size)
+        self._last = None
+        self.failed = False
+
+    def _name_index(self, names, name):
+        if name is None:
+            return -1
+        try:
+            return names.index(name)
+        except ValueError:
+            names.append(name)
+            return len(names) - 1
+
+    def add(self, frame_index, media_time, tracked_objects, classes, lanes):
+        """
+        Enregistre les objets suivis d'une frame détectée
+        Les frames sans nouvelle détection (même liste que la précédente) ne sont pas dupliquées
+        """
+        if self.failed:
+            return
+        self.end = frame_index
+        if tracked_objects is self._last:
+            return
+        self._last = tracked_objects
+        try:
+            self._frames.append((frame_index, media_time, self._rows.count, len(tracked_objects)))
+            for row, object_class, lane in zip(tracked_objects, classes, lanes):
+                x, y, w, h, object_id, speed = row
+                self._rows.append(((x, y, w, h), object_id, speed,
+                                   self._name_index(self.classes, object_class),
+                                   self._name_index(self.lanes, lane)))
+        except OSError as e:
+            # Disque plein ou répertoire non accessible : lecture poursuivie sans enregistrement
+            logger.error(f"Enregistrement des détections abandonné pour {self.video_path}: {e}")
+            self.close()
+
+    def save(self, complete):
+        """
+        Écrit le cache (remplacement atomique de chaque fichier, métadonnées en dernier)
+        complete: la vidéo a été lue jusqu'au bout
+        """
+        try:
+            if self.failed or not self._frames.count:
+                return
+            meta = {'video': self.video_path, 'classes': self.classes, 'lanes': self.lanes,
+                    'end': self.end, 'complete': complete, 'frames': self._frames.count,
+                    'rows': self._rows.count}
+
+            os.makedirs(os.path.dirname(self.base_path), exist_ok=True)
+            # Un cache plus complet (même vidéo lue par une autre direction) est conservé
+            existing = read_meta(self.base_path)
+            if existing is not None and (existing['complete'], existing['end']) >= (complete, self.end):
+                return
+            for suffix, spool in (('.frames.npy', self._frames), ('.rows.npy', self._rows)):
+                temporary = self.base_path + suffix + '.tmp'
+                spool.save(temporary)
+                os.replace(temporary, self.base_path + suffix)
+            temporary = self.base_path + '.json.tmp'
+            with open(temporary, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.replace(temporary, self.base_path + '.json')
+        except (OSError, ValueError) as e:
+            logger.error(f"Impossible d'écrire le cache de détections {self.base_path}: {e}")
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Abandonne l'enregistrement et supprime ses fichiers temporaires
+        """
+        self.failed = True
+        self._frames.close()
+        self._rows.close()
+
+
+def open_cache(video_path, pipeline, scheduler, directory=CACHE_DIR):
+    """
+    Retourne (détections en cache ou None, enregistreur ou None) d'une vidéo pour un pipeline
+    et le cadencement de sa lecture
+    Un cache complet est rejoué tel quel. Un cache partiel (lecture interrompue) est rejoué puis
+    la détection continue en direct sans enregistrement : le modèle de fond MOG2, froid à la reprise,
+    donnerait des détections différentes d'une lecture complète. Sans cache, la lecture est enregistrée
+    video_path: chemin absolu, celui ouvert par la capture
+    """
+    params = pipeline_params(pipeline, scheduler)
+    try:
+        cached = load_detections(video_path, params, directory)
+        if cached is not None:
+            return cached, None
+        return None, DetectionRecorder(video_path, params, directory)
+    except OSError as e:
+        # Vidéo illisible : lecture sans cache
+        logger.error(f"Cache de détections indisponible pour {video_path}: {e}")
+        return None, None
+
+
+def load_detections(video_path, params, directory=CACHE_DIR):
+    """
+    Détections en cache d'une vidéo pour ces paramètres, ou None (cache absent, paramètres modifiés)
+    """
+    base_path = os.path.join(directory, cache_key(video_path, params))
+    if not os.path.isfile(base_path + '.json'):
+        return None
+    try:
+        return CachedDetections(base_path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Cache de détections illisible {base_path}: {e}")
+        return None
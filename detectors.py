@@ -0,0 +1,469 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+import cv2
+import numpy as np
+from roi import build_roi, OUTSIDE
+
+logger = logging.getLogger(__name__)
+
+# Classes COCO retenues par le détecteur DNN et leur nom dans les statistiques
+VEHICLE_CLASSES = {2: 'voiture', 3: 'moto', 5: 'bus', 7: 'camion'}
+
+
+def extract_blobs(mask, method='components'):
+    """
+    Extrait les blobs d'un masque binaire
+    Retourne (boîtes (N, 4) [x, y, w, h], surfaces (N,)) sous forme de tableaux NumPy
+    method: 'components' (composantes connexes, surface en pixels)
+            ou 'contours' (contours externes, surface du polygone)
+    """
+    if method == 'components':
+        _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        # La composante 0 est le fond
+        stats = stats[1:]
+        return stats[:, :4], stats[:, cv2.CC_STAT_AREA]
+    if method == 'contours':
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        boxes = np.array([cv2.boundingRect(cnt) for cnt in contours], dtype=np.int32).reshape(-1, 4)
+        areas = np.array([cv2.contourArea(cnt) for cnt in contours], dtype=np.float64)
+        return boxes, areas
+    raise ValueError(f"Méthode d'extraction inconnue: {method}")
+
+
+class MotionGate:
+    """
+    Porte de mouvement : différence entre deux vignettes très réduites de la région de détection
+    Sans mouvement, la détection complète est évitée et le modèle de fond n'est rafraîchi
+    qu'une frame sur `refresh_every`
+    """
+    def __init__(self, downscale=4, pixel_threshold=15, min_changed=2, refresh_every=10, warmup=100):
+        self.downscale = downscale
+        # Variation minimale d'une case de la vignette (niveaux de gris) pour compter comme mouvement
+        self.pixel_threshold = pixel_threshold
+        # Nombre minimal de cases en mouvement pour ouvrir la porte
+        self.min_changed = min_changed
+        self.refresh_every = refresh_every
+        # Frames toujours analysées au démarrage, le temps que le modèle de fond s'établisse
+        self.warmup = warmup
+        self.previous = None
+        self.energy = 0
+        self.frames = 0
+        self.gated = 0
+
+    def is_open(self, gray):
+        """
+        Indique si la frame (niveaux de gris) présente assez de mouvement pour être analysée
+        """
+        height, width = gray.shape[:2]
+        size = (max(width // self.downscale, 1), max(height // self.downscale, 1))
+        thumbnail = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+        self.frames += 1
+        previous, self.previous = self.previous, thumbnail
+        if previous is None or self.frames <= self.warmup:
+            return True
+
+        self.energy = int(np.count_nonzero(cv2.absdiff(thumbnail, previous) > self.pixel_threshold))
+        if self.energy >= self.min_changed:
+            return True
+        self.gated += 1
+        return False
+
+    def should_refresh(self):
+        """
+        Indique si le modèle de fond doit être mis à jour pendant une frame sans mouvement
+        """
+        return self.gated % self.refresh_every == 0
+
+    def stats(self):
+        return {
+            'gated': self.gated,
+            'gated_share': round(self.gated / self.frames, 3) if self.frames else 0.0,
+            'motion_energy': self.energy
+        }
+
+
+class Detector:
+    """
+    Interface des détecteurs d'une direction
+    detect(frame, timestamp) retourne (boîtes (N, 4) [x, y, w, h] à l'échelle d'affichage,
+    classes ou None, horodatage de la frame détectée), ou None si aucune nouvelle détection
+    n'est disponible pour cette frame (inférence en cours); une frame sans mouvement donne
+    un ensemble vide de boîtes
+    """
+    # Prétraitement regroupable par BatchPreprocessor
+    batchable = False
+
+    def __init__(self, display_size=(400, 300), detection_size=(200, 150), roi=None):
+        self.display_width, self.display_height = display_size
+
+        # La détection travaille sur une image réduite; les boîtes sont ramenées
+        # à l'échelle d'affichage pour le suivi et le dessin
+        self.detection_size = tuple(detection_size or display_size)
+        detection_width, detection_height = self.detection_size
+        self.scale = np.array([self.display_width / detection_width, self.display_height / detection_height,
+                               self.display_width / detection_width, self.display_height / detection_height])
+
+        # Voies de détection à l'échelle de détection
+        self.roi = roi if roi is not None else build_roi(None, self.detection_size)
+
+    def lane_indices(self, boxes):
+        """
+        Indice de voie (OUTSIDE hors des voies) du centre de boîtes à l'échelle d'affichage
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        centers = (boxes[:, :2] + boxes[:, 2:] / 2) / self.scale[:2] - self.roi.offset
+        return self.roi.lanes_at(centers)
+
+    def detect(self, frame, timestamp):
+        raise NotImplementedError
+
+    def params(self):
+        """
+        Paramètres dont dépendent les détections (clé du cache de détections)
+        """
+        return {
+            'type': type(self).__name__,
+            'display_size': [self.display_width, self.display_height],
+            'detection_size': list(self.detection_size),
+            'roi': {'names': self.roi.names, 'bounds': list(self.roi.bounds),
+                    'labels': hashlib.sha1(self.roi.labels.tobytes()).hexdigest()}
+        }
+
+    def stats(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+class MOG2Detector(Detector):
+    """
+    Détection par soustraction de fond (MOG2) sur une image réduite en niveaux de gris
+    Les objets en mouvement sont détectés sans classe
+    """
+    batchable = True
+
+    def __init__(self, display_size=(400, 300), detection_size=(200, 150), roi=None, motion_gate=True,
+                 blob_method='components', morph_size=0):
+        super().__init__(display_size, detection_size, roi)
+
+        # Paramètres de détection optimisés
+        self.object_detector = cv2.createBackgroundSubtractorMOG2(
+            history=100,
+            varThreshold=30,
+            detectShadows=False
+        )
+        # Seuil de surface exprimé à l'échelle d'affichage
+        self.area_threshold = 400
+        self.detection_area_threshold = self.area_threshold / (self.scale[0] * self.scale[1])
+        # Extraction des blobs du masque de premier plan ('components' ou 'contours')
+        self.blob_method = blob_method
+        # Ouverture morphologique du masque (taille du noyau carré, 0 pour désactiver)
+        self.morph_size = morph_size
+        self.morph_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (morph_size, morph_size)) \
+            if morph_size else None
+
+        # Porte de mouvement devant la détection complète (None pour toujours détecter)
+        self.gate = MotionGate(warmup=self.object_detector.getHistory()) if motion_gate else None
+
+    def prepare(self, frame):
+        """
+        Image de détection : frame réduite à la résolution de détection, en niveaux de gris
+        """
+        small = frame
+        if (frame.shape[1], frame.shape[0]) != self.detection_size:
+            small = cv2.resize(frame, self.detection_size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def foreground(self, gray):
+        """
+        Masque brut de premier plan du rectangle englobant des voies, ou None si la porte
+        de mouvement est restée fermée
+        """
+        crop = self.roi.crop(gray)
+        if self.gate is not None and not self.gate.is_open(crop):
+            # Scène immobile : seul le modèle de fond est entretenu, à faible cadence
+            if self.gate.should_refresh():
+                self.object_detector.apply(crop)
+            return None
+
+        # Soustraction de fond sur le seul rectangle englobant des voies
+        return self.object_detector.apply(crop)
+
+    def binarize(self, mask):
+        """
+        Seuillage, restriction aux voies et ouverture morphologique du masque brut (sur place)
+        """
+        cv2.threshold(mask, 254, 255, cv2.THRESH_BINARY, dst=mask)
+        if self.roi.mask is not None:
+            # Voies polygonales : les pixels hors voies sont ignorés par l'extraction
+            cv2.bitwise_and(mask, self.roi.mask, dst=mask)
+        if self.morph_kernel is not None:
+            cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.morph_kernel, dst=mask)
+        return mask
+
+    def blobs(self, mask):
+        """
+        Boîtes (N, 4) [x, y, w, h] à l'échelle d'affichage des blobs d'un masque binarisé
+        """
+        # Extraction des blobs (boîtes et surfaces en tableaux)
+        boxes, areas = extract_blobs(mask, self.blob_method)
+
+        # Filtrage par taille puis par voie : seuls les objets dont le centre est dans une voie sont conservés
+        boxes = boxes[areas > self.detection_area_threshold].astype(np.float64)
+        centers = boxes[:, :2] + boxes[:, 2:] / 2
+        boxes = boxes[self.roi.lanes_at(centers) != OUTSIDE]
+
+        # Retour à l'échelle d'affichage
+        boxes[:, :2] += self.roi.offset
+        return np.rint(boxes * self.scale).astype(np.int64)
+
+    def params(self):
+        gate = self.gate
+        return {
+            **super().params(),
+            'history': self.object_detector.getHistory(),
+            'var_threshold': self.object_detector.getVarThreshold(),
+            'area_threshold': self.area_threshold,
+            'blob_method': self.blob_method,
+            'morph_size': self.morph_size,
+            'motion_gate': [gate.downscale, gate.pixel_threshold, gate.min_changed, gate.refresh_every,
+                            gate.warmup] if gate is not None else None
+        }
+
+    def detect(self, frame, timestamp):
+        mask = self.foreground(self.prepare(frame))
+        if mask is None:
+            # Porte fermée : aucune détection, les pistes vieillissent et expirent normalement
+            return np.empty((0, 4), dtype=np.int64), None, timestamp
+        return self.blobs(self.binarize(mask)), None, timestamp
+
+    def stats(self):
+        """
+        Statistiques de la porte de mouvement (part des frames évitées)
+        """
+        return self.gate.stats() if self.gate is not None else {}
+
+
+def decode_yolo(output, frame_size, input_size, confidence_threshold=0.35, nms_threshold=0.45,
+                class_map=VEHICLE_CLASSES):
+    """
+    Décode la sortie d'un modèle YOLO exporté en ONNX pour une image
+    Formats acceptés : YOLOv5 (N, 85) avec score d'objet, YOLOv8 (84, N)
+    Retourne (boîtes (N, 4) [x, y, w, h] à l'échelle de la frame, noms de classes)
+    """
+    rows = np.asarray(output, dtype=np.float32)
+    rows = rows.reshape(rows.shape[-2], rows.shape[-1])
+    if rows.shape[0] < rows.shape[1]:
+        rows = rows.T
+    if rows.shape[1] == 85:
+        scores = rows[:, 5:] * rows[:, 4:5]
+    else:
+        scores = rows[:, 4:]
+
+    class_ids = scores.argmax(axis=1)
+    confidences = scores[np.arange(len(scores)), class_ids]
+    keep = (confidences > confidence_threshold) & np.isin(class_ids, list(class_map))
+    if not keep.any():
+        return np.empty((0, 4), dtype=np.int64), []
+
+    width, height = frame_size
+    sx, sy = width / input_size, height / input_size
+    cx, cy, w, h = rows[keep, :4].T
+    boxes = np.column_stack(((cx - w / 2) * sx, (cy - h / 2) * sy, w * sx, h * sy))
+    confidences = confidences[keep]
+    class_ids = class_ids[keep]
+
+    # Suppression des doublons toutes classes confondues (voiture/camion sur le même véhicule)
+    indices = cv2.dnn.NMSBoxes(boxes.tolist(), confidences.tolist(), confidence_threshold, nms_threshold)
+    indices = np.asarray(indices, dtype=np.intp).reshape(-1)
+    return np.rint(boxes[indices]).astype(np.int64), [class_map[c] for c in class_ids[indices].tolist()]
+
+
+class InferenceWorker:
+    """
+    Thread d'inférence cv2.dnn (CPU) partagé par toutes les directions
+    La dernière frame soumise par chaque direction est traitée en un seul appel net.forward();
+    les détecteurs récupèrent les résultats sans jamais attendre l'inférence
+    """
+    def __init__(self, model_path, input_size=320, confidence_threshold=0.35, nms_threshold=0.45):
+        self.model_path = model_path
+        self.net = cv2.dnn.readNetFromONNX(model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.input_size = input_size
+        self.confidence_threshold = confidence_threshold
+        self.nms_threshold = nms_threshold
+        # Passe à False si le modèle a été exporté avec un lot fixe de 1
+        self.batch_supported = True
+
+        self._condition = threading.Condition()
+        self._pending = {}
+        self._results = {}
+        self._running = False
+        self._thread = None
+
+        self.inferences = 0
+        self.inferred_frames = 0
+        # Frames remplacées par une plus récente avant d'avoir été traitées
+        self.replaced = 0
+        self.inference_time = 0.0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+    def submit(self, direction, frame, timestamp):
+        """
+        Soumet la frame courante d'une direction; une frame encore en attente est remplacée
+        """
+        with self._condition:
+            if direction in self._pending:
+                self.replaced += 1
+            self._pending[direction] = (frame, timestamp)
+            self._condition.notify_all()
+
+    def result(self, direction, timeout=0.0):
+        """
+        Dernier résultat disponible d'une direction (boîtes, classes, horodatage) ou None
+        timeout: attente maximale d'un résultat (None : jusqu'au résultat ou à l'arrêt)
+        """
+        with self._condition:
+            if timeout != 0:
+                self._condition.wait_for(lambda: direction in self._results or not self._running, timeout)
+            return self._results.pop(direction, None)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not self._pending:
+                    self._condition.wait(0.5)
+                if not self._running:
+                    return
+                batch, self._pending = self._pending, {}
+            try:
+                results = self._infer(batch)
+            except Exception as e:
+                # Le thread survit à une frame ou une sortie invalide
+                logger.error(f"Erreur d'inférence DNN ({self.model_path}): {e}")
+                # Pas de détection pour ces frames; les détecteurs en attente reprennent
+                results = dict.fromkeys(batch)
+            with self._condition:
+                self._results.update(results)
+                self._condition.notify_all()
+
+    def _forward(self, frames):
+        blob = cv2.dnn.blobFromImages(frames, 1 / 255.0, (self.input_size, self.input_size),
+                                      swapRB=True, crop=False)
+        self.net.setInput(blob)
+        output = self.net.forward()
+        return [output[i] for i in range(len(frames))]
+
+    def _infer(self, batch):
+        directions = list(batch)
+        frames = [batch[direction][0] for direction in directions]
+        started = time.perf_counter()
+
+        outputs = None
+        if self.batch_supported and len(frames) > 1:
+            try:
+                outputs = self._forward(frames)
+            except cv2.error:
+                self.batch_supported = False
+                logger.warning(f"Modèle {self.model_path} sans lot dynamique : inférence image par image")
+        if outputs is None:
+            outputs = [self._forward([frame])[0] for frame in frames]
+
+        duration = time.perf_counter() - started
+        self.inference_time = duration if not self.inferences else 0.8 * self.inference_time + 0.2 * duration
+        self.inferences += 1
+        self.inferred_frames += len(frames)
+
+        results = {}
+        for direction, frame, output in zip(directions, frames, outputs):
+            boxes, classes = decode_yolo(output, (frame.shape[1], frame.shape[0]), self.input_size,
+                                         self.confidence_threshold, self.nms_threshold)
+            results[direction] = (boxes, classes, batch[direction][1])
+        return results
+
+    def stats(self):
+        return {
+            'inference_ms': round(self.inference_time * 1000, 1),
+            'average_batch': round(self.inferred_frames / self.inferences, 2) if self.inferences else 0.0,
+            'replaced': self.replaced
+        }
+
+
+class DNNDetector(Detector):
+    """
+    Détection de véhicules classés (voiture, moto, bus, camion) par un modèle ONNX
+    L'inférence est asynchrone : detect() soumet la frame et retourne le dernier résultat
+    disponible, qui peut concerner une frame précédente (son horodatage est retourné)
+    Avec wait=True, detect() attend le résultat de la frame soumise (analyse hors ligne)
+    """
+    def __init__(self, direction, worker, display_size=(400, 300), detection_size=(200, 150), roi=None,
+                 wait=False):
+        super().__init__(display_size, detection_size, roi)
+        self.direction = direction
+        self.worker = worker
+        self.wait = wait
+
+    def detect(self, frame, timestamp):
+        # Copie : l'appelant dessine ensuite sur sa frame
+        self.worker.submit(self.direction, frame.copy(), timestamp)
+        result = self.worker.result(self.direction, None if self.wait else 0.0)
+        if result is None:
+            return None
+        boxes, classes, detected_at = result
+        if len(boxes):
+            keep = self.lane_indices(boxes) != OUTSIDE
+            boxes = boxes[keep]
+            classes = [name for name, kept in zip(classes, keep.tolist()) if kept]
+        return boxes, classes, detected_at
+
+    def params(self):
+        worker = self.worker
+        model = os.stat(worker.model_path)
+        return {
+            **super().params(),
+            'model': [os.path.abspath(worker.model_path), model.st_size, model.st_mtime_ns],
+            'input_size': worker.input_size,
+            'confidence_threshold': worker.confidence_threshold,
+            'nms_threshold': worker.nms_threshold
+        }
+
+    def stats(self):
+        return self.worker.stats()
+
+
+DETECTOR_MODES = ('mog2', 'dnn')
+
+
+def create_detector(mode='mog2', direction=None, display_size=(400, 300), detection_size=(200, 150),
+                    roi=None, inference_worker=None, wait=False):
+    """
+    Crée le détecteur d'une direction pour un mode ('mog2' ou 'dnn')
+    Le mode 'dnn' utilise le thread d'inférence partagé `inference_worker`
+    (wait=True : attente synchrone des résultats)
+    """
+    if mode == 'mog2':
+        return MOG2Detector(display_size, detection_size, roi)
+    if mode == 'dnn':
+        if inference_worker is None:
+            raise ValueError("Le mode de détection 'dnn' nécessite un InferenceWorker")
+        return DNNDetector(direction, inference_worker, display_size, detection_size, roi, wait)
+    raise ValueError(f"Mode de détection inconnu: {mode}. Options: {', '.join(DETECTOR_MODES)}")
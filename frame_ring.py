@@ -0,0 +1,145 @@
+from multiprocessing import shared_memory
+import threading
+import numpy as np
+
+# En-tête : séquence écrite, dernière séquence lue, frames écrasées sans lecture, puis séquence par emplacement
+_WRITE_SEQ, _READ_SEQ, _OVERWRITTEN, _SLOT_SEQ = 0, 1, 2, 3
+
+
+class FrameRing:
+    """
+    Anneau de frames préallouées à capacité fixe avec numéros de séquence
+    Politique : le producteur écrit toujours dans l'emplacement le plus ancien
+    (drop-oldest) et les lecteurs lisent la frame la plus récente, sans copie.
+    """
+    def __init__(self, shape, slots=8):
+        self.shape = tuple(shape)
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._writing = None
+        # Première séquence valide (les frames antérieures à clear() sont ignorées)
+        self._valid_from = 1
+        self._allocate()
+
+    def _allocate(self):
+        self.sequences = np.zeros(_SLOT_SEQ + self.slots, dtype=np.int64)
+        self.frames = np.zeros((self.slots,) + self.shape, dtype=np.uint8)
+
+    @property
+    def sequence(self):
+        return int(self.sequences[_WRITE_SEQ])
+
+    @property
+    def overwritten(self):
+        """
+        Nombre de frames écrasées avant d'avoir été lues
+        """
+        return int(self.sequences[_OVERWRITTEN])
+
+    def begin_write(self):
+        """
+        Réserve l'emplacement suivant et retourne une vue pour y écrire sur place
+        La frame n'est visible des lecteurs qu'après commit()
+        """
+        self._lock.acquire()
+        seq = int(self.sequences[_WRITE_SEQ]) + 1
+        slot = seq % self.slots
+        previous = int(self.sequences[_SLOT_SEQ + slot])
+        if previous > int(self.sequences[_READ_SEQ]):
+            self.sequences[_OVERWRITTEN] += 1
+        # Emplacement marqué invalide pendant l'écriture
+        self.sequences[_SLOT_SEQ + slot] = -1
+        self._writing = seq
+        return self.frames[slot]
+
+    def commit(self):
+        """
+        Publie la frame écrite dans l'emplacement réservé et retourne sa séquence
+        """
+        seq = self._writing
+        self._writing = None
+        self.sequences[_SLOT_SEQ + seq % self.slots] = seq
+        self.sequences[_WRITE_SEQ] = seq
+        self._lock.release()
+        return seq
+
+    def write(self, frame):
+        """
+        Copie la frame dans l'emplacement suivant et retourne son numéro de séquence
+        """
+        self.begin_write()[...] = frame
+        return self.commit()
+
+    def read_latest(self):
+        """
+        Retourne (séquence, vue sur la frame) de la frame la plus récente, ou (0, None)
+        La vue reste valide tant que is_current(séquence) est vrai
+        """
+        seq = int(self.sequences[_WRITE_SEQ])
+        if seq < self._valid_from:
+            return 0, None
+        if seq > self.sequences[_READ_SEQ]:
+            self.sequences[_READ_SEQ] = seq
+        return seq, self.frames[seq % self.slots]
+
+    def is_current(self, seq):
+        """
+        Indique si l'emplacement de cette séquence n'a pas encore été réécrit
+        """
+        return int(self.sequences[_SLOT_SEQ + seq % self.slots]) == seq
+
+    def clear(self):
+        """
+        Rend les frames déjà écrites invisibles aux lecteurs
+        """
+        self._valid_from = int(self.sequences[_WRITE_SEQ]) + 1
+
+    def stats(self):
+        return {
+            'slots': self.slots,
+            'sequence': self.sequence,
+            'overwritten': self.overwritten
+        }
+
+
+class SharedFrameRing(FrameRing):
+    """
+    Anneau de frames en mémoire partagée entre processus
+    Un seul producteur par anneau; l'en-tête de séquences est partagé avec les frames.
+    """
+    def __init__(self, shape, slots=4, name=None, create=True):
+        self._name = name
+        self.owner = create
+        super().__init__(shape, slots)
+
+    def _allocate(self):
+        frame_bytes = int(np.prod(self.shape))
+        header_bytes = (_SLOT_SEQ + self.slots) * 8
+
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(name=self._name, create=True,
+                                                  size=header_bytes + self.slots * frame_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=self._name)
+        self.name = self.shm.name
+
+        self.sequences = np.ndarray((_SLOT_SEQ + self.slots,), dtype=np.int64, buffer=self.shm.buf)
+        self.frames = np.ndarray((self.slots,) + self.shape, dtype=np.uint8,
+                                 buffer=self.shm.buf, offset=header_bytes)
+        if self.owner:
+            self.sequences[:] = 0
+
+    @classmethod
+    def attach(cls, name, shape, slots=4):
+        """
+        Ouvre depuis un autre processus un anneau créé par le processus principal
+        """
+        return cls(shape, slots, name=name, create=False)
+
+    def close(self):
+        # Les vues numpy doivent être libérées avant de fermer la mémoire partagée
+        self.sequences = None
+        self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,28 @@
+import threading
+
+
+class Notifier:
+    """
+    Numéro de version protégé par une condition
+    Les producteurs signalent chaque nouvelle donnée ou changement d'état (notify);
+    les consommateurs attendent une version différente de la dernière vue, ou l'échéance (wait),
+    au lieu de sonder à intervalle fixe
+    """
+    def __init__(self):
+        self._condition = threading.Condition()
+        self.version = 0
+
+    def notify(self):
+        with self._condition:
+            self.version += 1
+            self._condition.notify_all()
+
+    def wait(self, last_version, timeout=None):
+        """
+        Attend une version différente de last_version pendant au plus timeout secondes
+        Retourne la version courante (égale à last_version si l'échéance est passée)
+        Lire la version avant de consulter les données évite de manquer un signal
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self.version != last_version, timeout)
+            return self.version
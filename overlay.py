@@ -0,0 +1,95 @@
+import threading
+import cv2
+import numpy as np
+
+
+class OverlayRenderer:
+    """
+    Barre de titre et frames d'état (attente, erreur, fin) de l'affichage d'un flux
+    Chaque barre de titre et chaque frame d'état est dessinée une seule fois par texte et couleur
+    puis gardée en cache; les frames vidéo sont composées sur place (barre de titre au-dessus de
+    l'image affichée) dans l'emplacement réservé de l'anneau de frames (FrameRing.begin_write),
+    sans allocation ni concaténation par frame
+    """
+    def __init__(self, display_size=(400, 300), bar_height=30, max_templates=256):
+        self.display_width, self.display_height = display_size
+        self.bar_height = bar_height
+        self.shape = (self.display_height + bar_height, self.display_width, 3)
+        # Les textes changent avec les comptages : les modèles les plus anciens sont oubliés
+        self.max_templates = max_templates
+        self._templates = {}
+        self._lock = threading.Lock()
+
+        self.rendered = 0
+        self.hits = 0
+
+    def _template(self, key, draw):
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self.hits += 1
+                return template
+        template = draw()
+        # Les modèles sont partagés : lecture seule
+        template.flags.writeable = False
+        with self._lock:
+            if len(self._templates) >= self.max_templates:
+                del self._templates[next(iter(self._templates))]
+            self._templates[key] = template
+            self.rendered += 1
+        return template
+
+    def title_bar(self, text, color, font_scale=0.6):
+        """
+        Barre de titre de la couleur du flux avec son texte
+        """
+        def draw():
+            title_bar = np.empty((self.bar_height, self.display_width, 3), dtype=np.uint8)
+            title_bar[...] = color
+            cv2.putText(title_bar, text, (10, 20),
+                        cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), 2)
+            return title_bar
+        return self._template(('title', text, tuple(color), font_scale), draw)
+
+    def status_frame(self, title, color, message, origin, font_scale=0.8,
+                     message_color=(255, 255, 255), title_scale=0.6):
+        """
+        Frame d'état complète : barre de titre et message sur fond noir
+        origin: position du message dans l'image affichée
+        """
+        def draw():
+            frame = np.zeros(self.shape, dtype=np.uint8)
+            frame[:self.bar_height] = self.title_bar(title, color, title_scale)
+            cv2.putText(frame[self.bar_height:], message, origin,
+                        cv2.FONT_HERSHEY_SIMPLEX, font_scale, message_color, 2)
+            return frame
+        return self._template(('status', title, tuple(color), message, origin, font_scale,
+                               message_color, title_scale), draw)
+
+    def load(self, frame, out):
+        """
+        Copie (ou redimensionne) une frame vidéo dans la partie image de out
+        Retourne la vue sur cette partie, à annoter sur place
+        """
+        content = out[self.bar_height:]
+        if frame.shape == content.shape:
+            content[...] = frame
+        else:
+            resized = cv2.resize(frame, (self.display_width, self.display_height), dst=content)
+            if resized.ctypes.data != content.ctypes.data:
+                content[...] = resized
+        return content
+
+    def draw_title(self, out, text, color, font_scale=0.6):
+        """
+        Copie la barre de titre en cache au-dessus de l'image de out et retourne out
+        """
+        out[:self.bar_height] = self.title_bar(text, color, font_scale)
+        return out
+
+    def stats(self):
+        return {
+            'templates': len(self._templates),
+            'rendered': self.rendered,
+            'hits': self.hits
+        }
@@ -0,0 +1,120 @@
+import cv2
+from detectors import MOG2Detector
+
+
+def frame_timestamp(cap, frame_index, source_fps):
+    """
+    Horodatage média (secondes) de la dernière frame lue
+    Utilise CAP_PROP_POS_MSEC, ou l'indice de frame et le FPS source à défaut
+    """
+    pos_msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+    if pos_msec and pos_msec > 0:
+        return pos_msec / 1000.0
+    return frame_index / source_fps
+
+
+class DirectionPipeline:
+    """
+    Chaîne de détection, suivi et annotation d'une direction
+    Indépendante de Flask pour pouvoir tourner dans un thread ou un processus
+    """
+    def __init__(self, direction, color, tracker, lines=(), display_size=(400, 300),
+                 detection_size=(200, 150), roi=None, detector=None, draw=True):
+        self.direction = direction
+        self.color = color
+        self.tracker = tracker
+        # Lignes de comptage dessinées sur la frame
+        self.lines = list(lines)
+        self.display_width, self.display_height = display_size
+        # Annotation des frames (inutile sans affichage, par exemple en analyse hors ligne)
+        self.draw = draw
+
+        # Détecteur de la direction (soustraction de fond MOG2 par défaut)
+        self.detector = detector if detector is not None else MOG2Detector(display_size, detection_size, roi)
+        self.last_tracked = []
+
+        # Statistiques de la dernière frame traitée
+        self.current_count = 0
+        self.last_average_speed = None
+        # Voie et classe de chaque objet suivi de la dernière frame (None si inconnue)
+        self.last_lanes = []
+        self.last_classes = []
+
+    def lanes_of(self, tracked_objects):
+        """
+        Voie de chaque objet suivi (None hors des voies)
+        """
+        if not len(tracked_objects):
+            return []
+        boxes = [row[:4] for row in tracked_objects]
+        return self.detector.roi.lane_names(self.detector.lane_indices(boxes))
+
+    def annotate(self, frame, tracked_objects, classes=None):
+        """
+        Dessine les objets suivis et les lignes de comptage sur la frame
+        """
+        for i, (x, y, w, h, object_id, speed) in enumerate(tracked_objects):
+            # Dessiner le rectangle autour de l'objet
+            cv2.rectangle(frame, (x, y), (x + w, y + h), self.color, 2)
+
+            # Afficher l'ID, la classe si connue et la vitesse
+            object_class = classes[i] if classes else None
+            label = f"ID:{object_id} {object_class + ' ' if object_class else ''}{int(speed)}km/h"
+            cv2.putText(frame, label, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.color, 2)
+
+        for line in self.lines:
+            cv2.line(frame, tuple(line.start.astype(int)), tuple(line.end.astype(int)), (255, 255, 255), 1)
+
+    def process(self, frame, timestamp):
+        """
+        Détecte, suit et annote les objets d'une frame à l'échelle d'affichage
+        Retourne les objets suivis [x, y, w, h, id, vitesse]
+        """
+        result = self.detector.detect(frame, timestamp)
+        if result is None:
+            return self.track(frame, None, timestamp)
+        detections, classes, detected_at = result
+        return self.track(frame, detections, detected_at, classes)
+
+    def track(self, frame, detections, timestamp, classes=None):
+        """
+        Suit et annote les détections d'une frame
+        detections None : inférence en cours, pas encore de résultat pour cette frame
+        (une porte de mouvement fermée donne au contraire un ensemble vide de détections)
+        timestamp: horodatage de la frame sur laquelle les détections ont été faites
+        """
+        if detections is None:
+            # Les objets suivis restent ceux de la dernière inférence
+            tracked_objects = self.last_tracked
+        else:
+            tracked_objects = self.tracker.update(detections, timestamp=timestamp, classes=classes)
+            self.last_tracked = tracked_objects
+            self.last_classes = self.tracker.last_classes
+        self.last_lanes = self.lanes_of(tracked_objects)
+        return self._publish(frame, tracked_objects)
+
+    def replay(self, frame, tracked_objects, classes, lanes):
+        """
+        Annote des objets suivis relus depuis le cache de détections, sans détection ni suivi
+        """
+        self.last_tracked = tracked_objects
+        self.last_classes = classes
+        self.last_lanes = lanes
+        return self._publish(frame, tracked_objects)
+
+    def _publish(self, frame, tracked_objects):
+        if self.draw:
+            self.annotate(frame, tracked_objects, self.last_classes)
+
+        # Objets visibles et vitesse moyenne de la frame
+        self.current_count = len({row[4] for row in tracked_objects})
+        speeds = [row[5] for row in tracked_objects if row[5] > 0]
+        self.last_average_speed = sum(speeds) / len(speeds) if speeds else None
+
+        return tracked_objects
+
+    def stats(self):
+        """
+        Statistiques du détecteur (porte de mouvement, inférence)
+        """
+        return self.detector.stats()
@@ -0,0 +1,105 @@
+import logging
+import cv2
+import numpy as np
+from camera_config import load_camera_config, camera_settings, scale_points, CONFIG_FILE
+
+logger = logging.getLogger(__name__)
+
+# Indice de voie des pixels hors de la région de détection
+OUTSIDE = 255
+
+
+class DetectionROI:
+    """
+    Région de détection d'une direction, composée d'une ou plusieurs voies polygonales
+    Le recadrage, le masque et la carte des voies sont précalculés une seule fois
+    pour la résolution de détection
+    """
+    def __init__(self, lanes, size):
+        # lanes: liste de (nom, polygone) exprimés dans la résolution de détection
+        width, height = size
+        self.names = [name for name, _ in lanes]
+        if not self.names or len(self.names) >= OUTSIDE:
+            raise ValueError(f"Nombre de voies invalide: {len(self.names)}")
+
+        labels = np.full((height, width), OUTSIDE, dtype=np.uint8)
+        for index, (_, polygon) in enumerate(lanes):
+            points = np.rint(np.asarray(polygon, dtype=np.float64)).astype(np.int32).reshape(-1, 1, 2)
+            cv2.fillPoly(labels, [points], index)
+
+        inside = labels != OUTSIDE
+        ys, xs = np.nonzero(inside)
+        if not len(xs):
+            raise ValueError("Région de détection vide")
+
+        # Rectangle englobant des voies : seule cette partie de l'image est traitée
+        self.bounds = (int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1)
+        x0, y0, x1, y1 = self.bounds
+        self.labels = labels[y0:y1, x0:x1].copy()
+        # Masque inutile quand les voies remplissent tout le rectangle
+        crop_inside = inside[y0:y1, x0:x1]
+        self.mask = None if crop_inside.all() else crop_inside.astype(np.uint8) * 255
+
+    @property
+    def offset(self):
+        return self.bounds[0], self.bounds[1]
+
+    def crop(self, image):
+        """
+        Vue (sans copie) sur la partie de l'image couverte par les voies
+        """
+        x0, y0, x1, y1 = self.bounds
+        return image[y0:y1, x0:x1]
+
+    def lanes_at(self, points):
+        """
+        Indice de voie de points (N, 2) exprimés dans le recadrage, OUTSIDE hors des voies
+        """
+        points = np.asarray(points)
+        height, width = self.labels.shape
+        xs = points[:, 0].astype(np.intp)
+        ys = points[:, 1].astype(np.intp)
+        valid = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        lanes = np.full(len(points), OUTSIDE, dtype=np.uint8)
+        lanes[valid] = self.labels[ys[valid], xs[valid]]
+        return lanes
+
+    def lane_names(self, lanes):
+        """
+        Noms des voies correspondant à des indices, None hors des voies
+        """
+        return [self.names[lane] if lane != OUTSIDE else None for lane in lanes.tolist()]
+
+
+def build_roi(settings, size=(200, 150)):
+    """
+    Crée la région de détection d'une direction depuis la section 'roi' de cameras.json
+    Sans configuration, une seule voie couvre la bande de 20% à 90% de la hauteur
+    """
+    width, height = size
+    if not settings:
+        top, bottom = height * 0.2, height * 0.9
+        return DetectionROI([('voie', [(0, top), (width, top), (width, bottom), (0, bottom)])], size)
+
+    resolution = settings.get('resolution', size)
+    lanes = [(lane['name'], scale_points(lane['polygon'], resolution, size))
+             for lane in settings['lanes']]
+    return DetectionROI(lanes, size)
+
+
+def load_rois(videos, sizes, path=CONFIG_FILE):
+    """
+    Crée les régions de détection de chaque direction
+    videos: dictionnaire direction -> chemin vidéo
+    sizes: dictionnaire direction -> résolution de détection
+    """
+    config = load_camera_config(path)
+    rois = {}
+    for direction, video_path in videos.items():
+        settings = camera_settings(config, video_path, 'roi')
+        try:
+            rois[direction] = build_roi(settings, sizes[direction])
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"Région de détection invalide pour {direction} ({video_path}): {e}")
+            rois[direction] = build_roi(None, sizes[direction])
+    return rois
@@ -0,0 +1,107 @@
+import time
+
+
+class FrameScheduler:
+    """
+    Cadence la lecture d'un flux au FPS source et adapte l'intervalle de détection
+    pour tenir un budget de latence (retard de la frame publiée sur son heure d'affichage prévue)
+    Hors temps réel, ni attente ni abandon : l'intervalle reste fixe pour que les résultats
+    ne dépendent pas de la charge de la machine
+    """
+    def __init__(self, source_fps, latency_budget=0.2, interval=2, min_interval=1, max_interval=8,
+                 realtime=True, smoothing=0.2):
+        self.frame_period = 1.0 / source_fps
+        self.latency_budget = latency_budget
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.realtime = realtime
+        # Coefficient des moyennes glissantes (durée de détection, latence)
+        self.smoothing = smoothing
+
+        self.frames = 0
+        self.dropped = 0
+        self.detections = 0
+        self.detection_time = 0.0
+        self.latency = 0.0
+        self._origin = None
+
+    def lag(self, media_time):
+        """
+        Retard (secondes) de l'horloge murale sur l'heure prévue de la frame
+        L'origine est fixée à la première frame
+        """
+        now = time.perf_counter()
+        if self._origin is None:
+            self._origin = now - media_time
+        return now - (self._origin + media_time)
+
+    def should_drop(self, media_time):
+        """
+        Indique si une frame lue doit être abandonnée sans décodage pour rattraper le retard
+        """
+        if not self.realtime or self.lag(media_time) <= self.latency_budget:
+            return False
+        self.dropped += 1
+        return True
+
+    def should_detect(self):
+        """
+        Indique si la frame courante (non abandonnée) doit passer par la détection
+        """
+        self.frames += 1
+        return self.frames % self.interval == 0
+
+    def record_detection(self, duration, media_time):
+        """
+        Enregistre la durée d'une détection et ajuste l'intervalle de détection
+        """
+        self.detections += 1
+        alpha = self.smoothing
+        self.detection_time = duration if self.detections == 1 else \
+            (1 - alpha) * self.detection_time + alpha * duration
+        if not self.realtime:
+            return
+
+        # Retard accumulé avant la détection : la durée propre de la détection est déjà
+        # prise en compte par la comparaison au temps disponible
+        backlog = max(self.lag(media_time) - duration, 0.0)
+        self.latency = (1 - alpha) * self.latency + alpha * backlog
+        # Temps disponible par détection à l'intervalle courant
+        available = self.interval * self.frame_period
+        if self.latency > self.latency_budget / 2 or self.detection_time > available:
+            self.interval = min(self.interval + 1, self.max_interval)
+        elif self.latency < self.latency_budget / 4 and \
+                self.detection_time < (self.interval - 1) * self.frame_period / 2:
+            self.interval = max(self.interval - 1, self.min_interval)
+
+    def wait(self, media_time):
+        """
+        Attend l'heure prévue de la frame suivante (temps réel uniquement)
+        """
+        if not self.realtime:
+            return
+        delay = -self.lag(media_time + self.frame_period)
+        if delay > 0:
+            time.sleep(delay)
+
+    def params(self):
+        """
+        Paramètres dont dépendent les frames détectées (clé du cache de détections)
+        """
+        return {
+            'interval': self.interval,
+            'min_interval': self.min_interval,
+            'max_interval': self.max_interval,
+            'realtime': self.realtime,
+            'latency_budget': self.latency_budget
+        }
+
+    def stats(self):
+        return {
+            'interval': self.interval,
+            'frames': self.frames,
+            'dropped': self.dropped,
+            'detection_ms': round(self.detection_time * 1000, 2),
+            'latency_ms': round(self.latency * 1000, 1)
+        }
@@ -43,33 +43,38 @@ class Capteur:
         return f"{self.nom} : {self.file_attente} véhicules"
 
 
+# Approches du carrefour par défaut et leur ordre de passage
+APPROCHES = ["Nord", "Sud", "Est", "Ouest"]
+SEQUENCE = ["Nord", "Est", "Sud", "Ouest"]
+
+
 class Intersection:
-    def __init__(self, nom, four_way=False):
+    def __init__(self, nom, four_way=False, approches=None, sequence=None):
         self.nom = nom
         self.four_way = four_way
+        # Approches (une par caméra), dans leur ordre de passage si elles sont fournies
+        # sans séquence explicite
+        approches = list(approches) if approches is not None else list(APPROCHES)
         
         if four_way:
-            # Mode carrefour à quatre feux indépendants
-            self.feux = {
-                "Nord": FeuTricolore("Nord"),
-                "Sud": FeuTricolore("Sud"),
-                "Est": FeuTricolore("Est"),
-                "Ouest": FeuTricolore("Ouest")
-            }
+            # Mode carrefour à un feu indépendant par approche (quatre par défaut)
+            self.feux = {nom_approche: FeuTricolore(nom_approche) for nom_approche in approches}
             
-            # Initialiser les états des feux pour éviter les collisions
-            self.feux["Nord"].etat = "vert"
-            self.feux["Nord"].timer = self.feux["Nord"].temps_vert
-            self.feux["Sud"].etat = "rouge"
-            self.feux["Sud"].timer = self.feux["Sud"].temps_rouge
-            self.feux["Est"].etat = "rouge"
-            self.feux["Est"].timer = self.feux["Est"].temps_rouge
-            self.feux["Ouest"].etat = "rouge"
-            self.feux["Ouest"].timer = self.feux["Ouest"].temps_rouge
+            # Initialiser les états des feux pour éviter les collisions : seul le premier est vert
+            for feu in self.feux.values():
+                feu.etat = "rouge"
+                feu.timer = feu.temps_rouge
             
             # Définir l'ordre de passage
-            self.sequence = ["Nord", "Est", "Sud", "Ouest"]
+            if sequence is not None:
+                self.sequence = list(sequence)
+            else:
+                self.sequence = list(SEQUENCE) if approches == APPROCHES else list(approches)
             self.current_index = 0
+            if self.sequence:
+                premier = self.feux[self.sequence[0]]
+                premier.etat = "vert"
+                premier.timer = premier.temps_vert
         else:
             # Mode carrefour classique à deux groupes de feux
             self.feux = {
@@ -83,18 +88,43 @@ class Intersection:
             self.feux["Est-Ouest"].etat = "rouge"
             self.feux["Est-Ouest"].timer = self.feux["Est-Ouest"].temps_rouge
         
-        self.capteurs = {
-            "Nord": Capteur("Nord"),
-            "Sud": Capteur("Sud"),
-            "Est": Capteur("Est"),
-            "Ouest": Capteur("Ouest")
-        }
+        self.capteurs = {nom_approche: Capteur(nom_approche) for nom_approche in approches}
+
+    def ajouter_approche(self, nom):
+        """
+        Ajoute une approche (feu rouge en fin de séquence et capteur)
+        """
+        if nom in self.capteurs:
+            return
+        self.capteurs[nom] = Capteur(nom)
+        if self.four_way:
+            feu = FeuTricolore(nom)
+            feu.timer = feu.temps_rouge
+            self.feux[nom] = feu
+            self.sequence.append(nom)
+
+    def retirer_approche(self, nom):
+        """
+        Retire une approche; le feu suivant de la séquence prend le relais si besoin
+        Le feu est retiré avant le capteur : un feu présent a toujours son capteur
+        """
+        if self.four_way and nom in self.feux:
+            del self.feux[nom]
+            index = self.sequence.index(nom)
+            self.sequence.remove(nom)
+            if index < self.current_index:
+                self.current_index -= 1
+            if self.sequence:
+                self.current_index %= len(self.sequence)
+            else:
+                self.current_index = 0
+        self.capteurs.pop(nom, None)
 
     def mettre_a_jour(self):
         if self.four_way:
             
             # Mettre à jour tous les feux
-            for direction, feu in self.feux.items():
+            for direction, feu in list(self.feux.items()):
                 # Décrémenter le timer seulement si le feu est actif
                 if feu.timer > 0:
                     feu.decrementer_timer()
@@ -110,7 +140,7 @@ class Intersection:
                     break
             
             # Si aucun feu n'est vert, forcer le feu suivant à passer au vert
-            if not has_green:
+            if not has_green and self.sequence:
                 self.current_index = (self.current_index + 1) % len(self.sequence)
                 next_direction = self.sequence[self.current_index]
                 self.feux[next_direction].etat = "vert"
@@ -139,17 +169,14 @@ class SCOOTController:
             intersection.detecter_traffic()
             
             if intersection.four_way:
-                # Mode carrefour à quatre feux indépendants
-                nord_count = intersection.capteurs["Nord"].file_attente
-                sud_count = intersection.capteurs["Sud"].file_attente
-                est_count = intersection.capteurs["Est"].file_attente
-                ouest_count = intersection.capteurs["Ouest"].file_attente
-                
+                # Mode carrefour à un feu indépendant par approche
                 # Ajustement des temps en fonction du trafic
-                intersection.feux["Nord"].temps_vert = max(5, min(30, 10 + nord_count // 2))
-                intersection.feux["Sud"].temps_vert = max(5, min(30, 10 + sud_count // 2))
-                intersection.feux["Est"].temps_vert = max(5, min(30, 10 + est_count // 2))
-                intersection.feux["Ouest"].temps_vert = max(5, min(30, 10 + ouest_count // 2))
+                for nom, feu in list(intersection.feux.items()):
+                    capteur = intersection.capteurs.get(nom)
+                    if capteur is None:
+                        continue
+                    count = capteur.file_attente
+                    feu.temps_vert = max(5, min(30, 10 + count // 2))
             else:
                 # Mode carrefour classique
                 total_NS = intersection.capteurs["Nord"].file_attente + intersection.capteurs["Sud"].file_attente
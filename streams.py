@@ -0,0 +1,103 @@
+import os
+import time
+import numpy as np
+
+# Couleurs (BGR) attribuées aux flux ajoutés sans couleur, dans l'ordre
+STREAM_COLORS = [
+    (0, 165, 255),
+    (0, 255, 0),
+    (255, 0, 0),
+    (0, 0, 255),
+    (255, 0, 255),
+    (255, 255, 0),
+    (0, 255, 255),
+    (128, 0, 255)
+]
+
+
+def _array_bytes(obj):
+    """
+    Taille des tableaux NumPy portés directement par un objet
+    """
+    return sum(value.nbytes for value in vars(obj).values() if isinstance(value, np.ndarray))
+
+
+def stream_memory(ring, pipeline=None):
+    """
+    Mémoire propre à un flux (octets) : anneau de frames, pistes du tracker,
+    masques de voies et modèle de fond MOG2 (estimé : moyenne, variance et poids
+    en float32 par gaussienne et par pixel du recadrage)
+    """
+    total = ring.frames.nbytes if ring is not None else 0
+    if pipeline is None:
+        return total
+    tracker = pipeline.tracker
+    total += _array_bytes(tracker)
+    if hasattr(tracker, 'tracks'):
+        total += _array_bytes(tracker.tracks)
+    detector = pipeline.detector
+    total += _array_bytes(detector.roi)
+    background = getattr(detector, 'object_detector', None)
+    if background is not None:
+        crop_height, crop_width = detector.roi.labels.shape
+        total += crop_height * crop_width * (background.getNMixtures() * 3 * 4 + 1)
+    return total
+
+
+def process_rss():
+    """
+    Mémoire résidente du processus courant (octets), None hors Linux
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class StreamUsage:
+    """
+    Consommation CPU et mémoire d'un flux
+    Temps CPU du thread de traitement (mode threads) ou du processus de détection,
+    pourcentage calculé sur des fenêtres d'au moins `window` secondes
+    """
+    def __init__(self, window=1.0):
+        self.window = window
+        self.cpu_time = 0.0
+        self.cpu_percent = 0.0
+        self.memory_bytes = 0
+        self.rss_bytes = None
+        # Temps CPU des exécutions précédentes du flux
+        self._offset = 0.0
+        self._last = None
+
+    def begin(self):
+        """
+        Nouvelle exécution du flux (nouveau thread ou processus : compteur CPU repart de zéro)
+        """
+        self._offset = self.cpu_time
+        self._last = None
+
+    def sample(self, cpu_time, memory_bytes=None, rss_bytes=None):
+        """
+        cpu_time: temps CPU cumulé de l'exécution courante (time.thread_time, time.process_time)
+        """
+        now = time.monotonic()
+        self.cpu_time = self._offset + cpu_time
+        if self._last is None:
+            self._last = (now, cpu_time)
+        elif now - self._last[0] >= self.window:
+            self.cpu_percent = 100.0 * (cpu_time - self._last[1]) / (now - self._last[0])
+            self._last = (now, cpu_time)
+        if memory_bytes is not None:
+            self.memory_bytes = memory_bytes
+        if rss_bytes is not None:
+            self.rss_bytes = rss_bytes
+
+    def stats(self):
+        return {
+            'cpu_time': round(self.cpu_time, 2),
+            'cpu_percent': round(self.cpu_percent, 1),
+            'memory_bytes': self.memory_bytes,
+            'rss_bytes': self.rss_bytes
+        }
@@ -0,0 +1,92 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from batching import BatchPreprocessor, _MaskLayout
+from detectors import MOG2Detector
+from roi import DetectionROI, build_roi
+
+
+class Member:
+    # Seuls direction et detector sont lus par BatchPreprocessor.detect
+    def __init__(self, direction, detector):
+        self.direction = direction
+        self.detector = detector
+
+
+def detector(roi=None):
+    return MOG2Detector((400, 300), (200, 150), roi=roi, morph_size=3)
+
+
+def triangle_roi():
+    return DetectionROI([('voie', [(20, 10), (180, 10), (100, 140)])], (200, 150))
+
+
+def frames(count, seed):
+    rng = np.random.default_rng(seed)
+    background = rng.integers(60, 100, (300, 400, 3), dtype=np.uint8)
+    for step in range(count):
+        frame = background.copy()
+        x = 40 + 8 * step
+        frame[120:180, x:x + 70] = 240
+        yield frame
+
+
+def boxes(result):
+    return np.asarray(result).reshape(-1, 4).tolist()
+
+
+def test_layout_places_each_detector_in_its_slot():
+    first, second = detector(), detector(triangle_roi())
+    layout = _MaskLayout([first, second], pad=3)
+    assert layout.index == {first: 0, second: 1}
+    assert layout.covers([second])
+    assert not layout.covers([detector()])
+    # Voies polygonales : les pixels hors du triangle sont exclus du masque des voies
+    h, w = layout.shapes[1]
+    assert (layout.lanes[1, :h, :w] == second.roi.mask).all()
+    assert (layout.inside[:, h:] == 0).all()
+
+
+def test_batch_matches_per_direction_detection():
+    batcher = BatchPreprocessor(max_wait=1.0)
+    rois = {'nord': build_roi(None, (200, 150)), 'sud': triangle_roi()}
+    batched = {direction: Member(direction, detector(roi)) for direction, roi in rois.items()}
+    reference = {direction: detector(roi) for direction, roi in rois.items()}
+    for member in batched.values():
+        batcher.register(member.direction, member.detector)
+
+    streams = {'nord': list(frames(30, 1)), 'sud': list(frames(30, 2))}
+    with ThreadPoolExecutor(2) as pool:
+        for i in range(30):
+            futures = {d: pool.submit(batcher.detect, batched[d], streams[d][i]) for d in batched}
+            for direction, future in futures.items():
+                expected = reference[direction].detect(streams[direction][i], 0.0)[0]
+                assert boxes(future.result()) == boxes(expected)
+    assert batcher.stats()['average_batch'] == 2.0
+
+
+def test_new_detector_under_same_direction_gets_its_own_lanes():
+    batcher = BatchPreprocessor()
+    old = Member('nord', detector())
+    batcher.register('nord', old.detector)
+    for frame in frames(5, 3):
+        batcher.detect(old, frame)
+
+    # Reconfiguration du flux : même identifiant, nouvelle ROI
+    new = Member('nord', detector(triangle_roi()))
+    reference = detector(triangle_roi())
+    batcher.register('nord', new.detector)
+    for frame in frames(20, 3):
+        assert boxes(batcher.detect(new, frame)) == boxes(reference.detect(frame, 0.0)[0])
+
+    layout = next(iter(batcher._layouts.values()))
+    assert list(layout.index) == [new.detector]
+
+
+def test_unregister_drops_the_layouts():
+    batcher = BatchPreprocessor()
+    member = Member('nord', detector())
+    batcher.register('nord', member.detector)
+    batcher.detect(member, next(frames(1, 4)))
+    assert batcher._layouts
+    batcher.unregister('nord')
+    assert not batcher._layouts
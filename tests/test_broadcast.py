@@ -0,0 +1,108 @@
+import numpy as np
+from broadcast import ClientProfile, FrameBroadcaster, frame_signature, same_content
+from frame_ring import FrameRing
+
+SHAPE = (32, 48, 3)
+
+
+def encode(frame, quality, scale):
+    # « JPEG » de test : valeur du premier pixel, qualité et échelle
+    return True, np.array([frame[0, 0, 0], quality or 0, int(scale * 100)], dtype=np.uint8)
+
+
+def frame(value):
+    return np.full(SHAPE, value, dtype=np.uint8)
+
+
+def body(payload):
+    return list(payload[-5:-2])
+
+
+def test_frame_is_encoded_once_for_all_clients():
+    ring = FrameRing(SHAPE)
+    broadcaster = FrameBroadcaster(lambda: ring, encode)
+    ring.write(frame(10))
+
+    first = broadcaster.next_payload(0)
+    second = broadcaster.next_payload(0)
+    assert first == second
+    assert broadcaster.next_payload(first[0]) == (first[0], None)
+    stats = broadcaster.stats()
+    assert stats['encoded'] == 1 and stats['sent'] == 2
+
+
+def test_each_profile_has_its_own_encoding():
+    ring = FrameRing(SHAPE)
+    broadcaster = FrameBroadcaster(lambda: ring, encode)
+    ring.write(frame(10))
+    low = ClientProfile(85, quality=40, scale=0.5)
+    assert body(broadcaster.next_payload(0, low.key)[1]) == [10, 40, 50]
+    assert body(broadcaster.next_payload(0)[1]) == [10, 0, 100]
+    assert broadcaster.stats()['encoded'] == 2
+
+
+def test_unchanged_frame_is_not_encoded_again():
+    ring = FrameRing(SHAPE)
+    broadcaster = FrameBroadcaster(lambda: ring, encode)
+    ring.write(frame(10))
+    sequence, payload = broadcaster.next_payload(0)
+
+    noisy = frame(10)
+    noisy[0, 1] = 12
+    ring.write(noisy)
+    assert broadcaster.next_payload(sequence) == (sequence, None)
+    assert broadcaster.repeat_payload() == payload
+
+    ring.write(frame(60))
+    sequence, payload = broadcaster.next_payload(sequence)
+    assert body(payload)[0] == 60
+    stats = broadcaster.stats()
+    assert stats['encoded'] == 2 and stats['reused'] == 1
+
+
+def test_frame_rewritten_during_encoding_is_read_again():
+    ring = FrameRing(SHAPE, slots=2)
+    values = iter((20, 30))
+
+    def encode_while_producing(frame, quality, scale):
+        value = next(values, None)
+        if value is not None:
+            # Le producteur réécrit l'emplacement lu pendant l'encodage
+            ring.write(np.full(SHAPE, value, dtype=np.uint8))
+            ring.write(np.full(SHAPE, value, dtype=np.uint8))
+        return encode(frame, quality, scale)
+
+    broadcaster = FrameBroadcaster(lambda: ring, encode_while_producing, retries=3)
+    ring.write(frame(10))
+    _, payload = broadcaster.next_payload(0)
+    # Les lectures déchirées sont écartées : seule la frame stable est diffusée
+    assert body(payload)[0] == 30
+    assert broadcaster.stats()['torn'] == 2
+
+
+def test_idle_frame_is_encoded_once_per_profile():
+    ring = FrameRing(SHAPE)
+    broadcaster = FrameBroadcaster(lambda: ring, encode)
+    builds = []
+
+    def build():
+        builds.append(1)
+        return frame(5)
+
+    low = ClientProfile(85, quality=40, scale=0.5).key
+    assert body(broadcaster.idle_payload(build)) == [5, 0, 100]
+    assert body(broadcaster.idle_payload(build, low)) == [5, 40, 50]
+    assert broadcaster.idle_payload(build, low) is broadcaster.idle_payload(build, low)
+    assert len(builds) == 2
+
+
+def test_signature_tolerates_sensor_noise():
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 200, (64, 64, 3), dtype=np.uint8)
+    noisy = base + rng.integers(0, 2, base.shape, dtype=np.uint8)
+    moved = base.copy()
+    moved[8:24, 8:24] = 255
+    signature = frame_signature(base)
+    assert same_content(frame_signature(noisy), signature, 2)
+    assert not same_content(frame_signature(moved), signature, 2)
+    assert not same_content(signature, None, 2)
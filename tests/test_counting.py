@@ -0,0 +1,50 @@
+import numpy as np
+from counting import CountingLine, CountingZone, DirectionCounter, DEFAULT_CLASS
+
+
+def test_line_crossing_is_detected_per_track():
+    line = CountingLine('ligne', (0, 100), (400, 100))
+    previous = np.array([[50, 90], [50, 90], [50, 110], [500, 90]], dtype=np.float64)
+    current = np.array([[50, 110], [60, 95], [50, 90], [500, 110]], dtype=np.float64)
+    # Traversée vers le bas, pas de traversée, traversée vers le haut, passage hors du segment
+    assert line.crossed(previous, current).tolist() == [True, False, True, False]
+
+
+def test_object_is_counted_once_across_lines():
+    lines = [CountingLine('a', (0, 100), (400, 100)), CountingLine('b', (0, 120), (400, 120))]
+    counter = DirectionCounter(lines)
+    for step, y in enumerate((70, 90, 110, 130)):
+        counter.update([[100, y, 20, 20, 7, 30.0]], timestamp=step, classes=['voiture'], lanes=['gauche'])
+    assert counter.line_counts == {'a': 1, 'b': 1}
+    assert counter.total == 1
+    assert counter.classes == {'voiture': 1}
+    assert counter.lane_counts == {'gauche': 1}
+
+
+def test_zone_entry_is_counted():
+    zone = CountingZone('carrefour', [(0, 0), (100, 0), (100, 100), (0, 100)], (400, 300))
+    counter = DirectionCounter([], [zone])
+    counter.update([[200, 50, 20, 20, 1, 0.0]], timestamp=0.0)
+    counter.update([[40, 40, 20, 20, 1, 0.0]], timestamp=1.0)
+    counter.update([[30, 40, 20, 20, 1, 0.0]], timestamp=2.0)
+    assert counter.zone_counts == {'carrefour': 1}
+    assert counter.total == 1
+    assert counter.classes == {DEFAULT_CLASS: 1}
+
+
+def test_counts_are_binned_by_interval():
+    counter = DirectionCounter([CountingLine('ligne', (0, 100), (400, 100))], bin_seconds=60)
+    for object_id, start in enumerate((10.0, 20.0, 70.0)):
+        counter.update([[100, 80, 20, 20, object_id, 0.0]], timestamp=start)
+        counter.update([[100, 100, 20, 20, object_id, 0.0]], timestamp=start + 1)
+    assert [(b['start'], b['total']) for b in counter.intervals()] == [(0, 2), (60, 1)]
+    assert counter.snapshot()['current_interval']['total'] == 1
+    assert [b['start'] for b in counter.intervals(since=60)] == [60]
+
+
+def test_state_of_vanished_tracks_is_forgotten():
+    counter = DirectionCounter([CountingLine('ligne', (0, 100), (400, 100))], forget_after=3)
+    counter.update([[100, 50, 20, 20, 1, 0.0]], timestamp=0.0)
+    for step in range(4):
+        counter.update([], timestamp=step + 1.0)
+    assert counter._tracks == {}
@@ -0,0 +1,94 @@
+import os
+from detection_cache import CachedDetections, DetectionRecorder, cache_key, open_cache, pipeline_params
+from pipeline import DirectionPipeline
+from scheduler import FrameScheduler
+from tracker import create_tracker
+
+
+def video(tmp_path):
+    path = tmp_path / 'video.mp4'
+    path.write_bytes(b'contenu de la video')
+    return str(path)
+
+
+def pipeline():
+    return DirectionPipeline('nord', (0, 255, 0), create_tracker('euclidean'), draw=False)
+
+
+def record(recorder, count):
+    recorded = {}
+    for index in range(1, count + 1):
+        tracked = [[index, 2 * index, 40, 30, object_id, float(index)] for object_id in range(index % 3)]
+        recorder.add(index, index / 25, tracked, ['bus'] * len(tracked), ['gauche', None][:len(tracked)])
+        recorded[index] = tracked
+    return recorded
+
+
+def test_recorded_tracks_are_replayed(tmp_path):
+    recorder = DetectionRecorder(video(tmp_path), {'a': 1}, str(tmp_path), chunk_size=4)
+    recorded = record(recorder, 20)
+    recorder.save(True)
+
+    cached = CachedDetections(recorder.base_path)
+    assert cached.complete and cached.end == 20
+    for index, tracked in recorded.items():
+        tracked_objects, classes, lanes = cached.lookup(index)
+        assert tracked_objects == tracked
+        assert classes == ['bus'] * len(tracked)
+        assert lanes == ['gauche', None][:len(tracked)]
+    assert cached.next_id == 2
+    # Fichiers temporaires des blocs supprimés après l'écriture
+    assert sorted(os.listdir(tmp_path)) == sorted(['video.mp4'] + [
+        os.path.basename(recorder.base_path) + suffix for suffix in ('.json', '.frames.npy', '.rows.npy')])
+
+
+def test_unchanged_frames_are_not_duplicated(tmp_path):
+    recorder = DetectionRecorder(video(tmp_path), {}, str(tmp_path))
+    tracked = [[1, 2, 40, 30, 0, 0.0]]
+    recorder.add(2, 0.08, tracked, [None], [None])
+    recorder.add(4, 0.16, tracked, [None], [None])
+    recorder.save(True)
+    cached = CachedDetections(recorder.base_path)
+    assert len(cached.frames) == 1
+    assert cached.end == 4
+    assert cached.lookup(1) == ([], [], [])
+    assert cached.lookup(3)[0] == tracked
+
+
+def test_cache_key_depends_on_scheduling(tmp_path):
+    path = video(tmp_path)
+    replay = pipeline_params(pipeline(), FrameScheduler(25.0, realtime=False))
+    realtime = pipeline_params(pipeline(), FrameScheduler(25.0, realtime=True))
+    other_interval = pipeline_params(pipeline(), FrameScheduler(25.0, interval=3, realtime=False))
+    keys = {cache_key(path, params) for params in (replay, realtime, other_interval)}
+    assert len(keys) == 3
+
+
+def test_partial_cache_is_replayed_without_recording(tmp_path):
+    path = video(tmp_path)
+    scheduler = FrameScheduler(25.0, realtime=False)
+    cached, recorder = open_cache(path, pipeline(), scheduler, str(tmp_path))
+    assert cached is None and recorder is not None
+    record(recorder, 10)
+    recorder.save(False)
+
+    cached, recorder = open_cache(path, pipeline(), scheduler, str(tmp_path))
+    assert recorder is None
+    assert not cached.complete
+    assert cached.covers(10) and not cached.covers(11)
+
+
+def test_less_complete_cache_does_not_replace_existing(tmp_path):
+    path = video(tmp_path)
+    complete = DetectionRecorder(path, {}, str(tmp_path))
+    record(complete, 10)
+    complete.save(True)
+    partial = DetectionRecorder(path, {}, str(tmp_path))
+    record(partial, 5)
+    partial.save(False)
+    assert CachedDetections(complete.base_path).end == 10
+
+
+def test_unreadable_video_disables_the_cache(tmp_path):
+    missing = str(tmp_path / 'absente.mp4')
+    assert open_cache(missing, pipeline(), FrameScheduler(25.0), str(tmp_path)) == (None, None)
@@ -0,0 +1,68 @@
+import numpy as np
+from frame_ring import FrameRing, SharedFrameRing
+
+
+def frame(value, shape=(4, 4, 3)):
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def test_frame_is_visible_only_after_commit():
+    ring = FrameRing((4, 4, 3), slots=3)
+    assert ring.read_latest() == (0, None)
+
+    slot = ring.begin_write()
+    slot[...] = 7
+    assert ring.read_latest() == (0, None)
+    assert ring.commit() == 1
+
+    seq, view = ring.read_latest()
+    assert seq == 1
+    assert (view == 7).all()
+
+
+def test_slot_being_rewritten_is_not_current():
+    ring = FrameRing((4, 4, 3), slots=2)
+    seq = ring.write(frame(1))
+    ring.write(frame(2))
+    assert ring.is_current(seq)
+
+    # Même emplacement : invalide dès la réservation, puis occupé par une autre séquence
+    ring.begin_write()[...] = 3
+    assert not ring.is_current(seq)
+    ring.commit()
+    assert not ring.is_current(seq)
+
+
+def test_unread_frames_are_counted_as_overwritten():
+    ring = FrameRing((4, 4, 3), slots=2)
+    for value in range(4):
+        ring.write(frame(value))
+    assert ring.overwritten == 2
+
+    ring.read_latest()
+    ring.write(frame(9))
+    ring.write(frame(9))
+    assert ring.overwritten == 2
+
+
+def test_clear_hides_previous_frames():
+    ring = FrameRing((4, 4, 3), slots=2)
+    ring.write(frame(1))
+    ring.clear()
+    assert ring.read_latest() == (0, None)
+    seq = ring.write(frame(2))
+    assert ring.read_latest()[0] == seq
+
+
+def test_shared_ring_is_visible_from_an_attached_ring():
+    ring = SharedFrameRing((4, 4, 3), slots=2)
+    try:
+        attached = SharedFrameRing.attach(ring.name, (4, 4, 3), slots=2)
+        seq = attached.write(frame(5))
+        read_seq, view = ring.read_latest()
+        assert read_seq == seq
+        assert (view == 5).all()
+        del view
+        attached.close()
+    finally:
+        ring.close()
@@ -0,0 +1,47 @@
+import numpy as np
+from pipeline import DirectionPipeline
+from tracker import create_tracker
+
+
+def make_pipeline():
+    return DirectionPipeline('nord', (0, 255, 0), create_tracker('euclidean'), draw=False)
+
+
+def run(pipeline, frames, start=0.0):
+    timestamp = start
+    tracked = None
+    for frame in frames:
+        timestamp += 0.04
+        tracked = pipeline.process(frame, timestamp)
+    return tracked, timestamp
+
+
+def moving_box(background, steps):
+    for step in range(steps):
+        frame = background.copy()
+        frame[100:160, 50 + 10 * step:130 + 10 * step] = 250
+        yield frame
+
+
+def test_closed_motion_gate_lets_tracks_expire():
+    pipeline = make_pipeline()
+    background = np.full((300, 400, 3), 80, dtype=np.uint8)
+    gate = pipeline.detector.gate
+
+    _, timestamp = run(pipeline, [background] * (gate.warmup + 5))
+    tracked, timestamp = run(pipeline, moving_box(background, 10), timestamp)
+    assert len(tracked) == 1
+
+    # Scène immobile : porte fermée, les pistes vieillissent au lieu de rester figées
+    tracked, _ = run(pipeline, [background] * (pipeline.tracker.disappear_threshold + 5), timestamp)
+    assert gate.gated > 0
+    assert tracked == []
+    assert len(pipeline.tracker.tracks) == 0
+
+
+def test_pending_inference_keeps_last_tracked_objects():
+    pipeline = make_pipeline()
+    frame = np.zeros((300, 400, 3), dtype=np.uint8)
+    tracked = pipeline.track(frame, np.array([[100, 100, 60, 60]]), 0.0)
+    assert pipeline.track(frame, None, 0.04) is tracked
+    assert pipeline.current_count == 1
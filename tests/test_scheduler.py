@@ -0,0 +1,50 @@
+import time
+from scheduler import FrameScheduler
+
+
+def test_replay_never_drops_and_keeps_its_interval():
+    scheduler = FrameScheduler(25.0, interval=2, realtime=False)
+    scheduler._origin = time.perf_counter() - 10
+    assert not scheduler.should_drop(0.0)
+    for _ in range(5):
+        scheduler.record_detection(1.0, 0.0)
+    assert scheduler.interval == 2
+
+
+def test_late_frames_are_dropped_in_realtime():
+    scheduler = FrameScheduler(25.0, latency_budget=0.2)
+    assert not scheduler.should_drop(0.0)
+    # Horloge murale en avance de 10 s sur le temps média
+    scheduler._origin -= 10
+    assert scheduler.should_drop(0.04)
+    assert scheduler.stats()['dropped'] == 1
+
+
+def test_detection_cadence_follows_interval():
+    scheduler = FrameScheduler(25.0, interval=3, realtime=False)
+    detected = [scheduler.should_detect() for _ in range(9)]
+    assert detected == [False, False, True] * 3
+
+
+def test_interval_grows_when_detection_is_too_slow():
+    scheduler = FrameScheduler(25.0, latency_budget=0.2, interval=2, max_interval=4)
+    scheduler._origin = time.perf_counter()
+    for _ in range(10):
+        # 0,2 s par détection : bien plus que les 0,08 s disponibles à l'intervalle 2
+        scheduler.record_detection(0.2, 0.0)
+    assert scheduler.interval == 4
+
+
+def test_interval_shrinks_when_detection_is_fast():
+    scheduler = FrameScheduler(25.0, latency_budget=0.2, interval=4, min_interval=1)
+    scheduler._origin = time.perf_counter() + 1
+    for _ in range(10):
+        scheduler.record_detection(0.001, 0.0)
+    assert scheduler.interval == 1
+
+
+def test_params_describe_the_cadence():
+    params = FrameScheduler(25.0, latency_budget=0.3, interval=2, realtime=False).params()
+    assert params['interval'] == 2
+    assert params['realtime'] is False
+    assert params['latency_budget'] == 0.3
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from tracker import TrackTable, TRACKER_MODES, create_tracker
+
+
+def test_track_table_grows_and_keeps_tracks():
+    table = TrackTable(capacity=2)
+    slots = [table.add(i, (10 * i, 0, 40, 40), (10 * i + 20, 20), 0.0) for i in range(3)]
+    assert table.capacity == 4
+    assert len(table) == 3
+    assert table.ids[slots].tolist() == [0, 1, 2]
+    assert table.active_slots().tolist() == sorted(slots)
+
+
+def test_track_table_recycles_free_slots():
+    table = TrackTable(capacity=4)
+    first = table.add(0, (0, 0, 40, 40), (20, 20), 0.0)
+    table.add(1, (50, 0, 40, 40), (70, 20), 0.0)
+    table.remove(np.array([first]))
+    assert len(table) == 1
+
+    # L'emplacement libéré est réutilisé, avec un historique remis à zéro
+    slot = table.add(2, (0, 50, 40, 40), (20, 70), 1.0)
+    assert slot == first
+    assert table.ids[slot] == 2
+    assert table.history_len[slot] == 1
+    assert table.history_sum[slot].tolist() == [20, 70]
+
+
+def test_history_is_a_bounded_ring():
+    table = TrackTable(capacity=1, history_size=3)
+    slot = table.add(0, (0, 0, 40, 40), (0, 0), 0.0)
+    for x in range(1, 6):
+        table.push_history(np.array([slot]), np.array([[x, 0]], dtype=np.float64))
+    assert table.history_len[slot] == 3
+    # Somme glissante des trois dernières positions
+    assert table.history_sum[slot].tolist() == [3 + 4 + 5, 0]
+
+
+@pytest.mark.parametrize('mode', list(TRACKER_MODES))
+def test_moving_object_keeps_its_id(mode):
+    tracker = create_tracker(mode)
+    ids = []
+    for step in range(10):
+        tracked = tracker.update([[100 + 5 * step, 100, 60, 50]], timestamp=step * 0.04)
+        ids.append(tracked[0][4])
+    assert set(ids) == {0}
+    assert tracked[0][5] > 0
+
+
+def test_greedy_assignment_gives_the_track_to_the_nearest_detection():
+    tracker = create_tracker('euclidean')
+    tracker.update([[100, 100, 60, 60]], timestamp=0.0)
+    # Deux détections candidates pour la même piste : la plus proche la reprend
+    tracked = tracker.update([[115, 100, 60, 60], [103, 100, 60, 60]], timestamp=0.04)
+    by_x = {row[0]: row[4] for row in tracked}
+    assert by_x[103] == 0
+    assert by_x[115] == 1
+
+
+def test_tracks_expire_after_disappear_threshold():
+    tracker = create_tracker('euclidean')
+    tracker.update([[100, 100, 60, 60]], timestamp=0.0)
+    for step in range(tracker.disappear_threshold):
+        tracker.update(np.empty((0, 4)), timestamp=0.04 * (step + 1))
+    assert len(tracker.tracks) == 1
+    tracker.update(np.empty((0, 4)), timestamp=1.0)
+    assert len(tracker.tracks) == 0
@@ -0,0 +1,65 @@
+import threading
+import time
+from traffic_manager import TrafficManager, DEFAULT_APPROACHES, DEFAULT_SEQUENCE
+
+
+def test_default_crossing_keeps_its_sequence():
+    manager = TrafficManager()
+    intersection = manager.intersection
+    assert set(intersection.feux) == set(DEFAULT_APPROACHES)
+    assert intersection.sequence == list(DEFAULT_SEQUENCE)
+    assert intersection.feux['nord'].etat == 'vert'
+
+
+def test_approaches_are_keyed_by_exact_stream_id():
+    manager = TrafficManager()
+    manager.add_approach('NORD')
+    assert 'NORD' in manager.intersection.feux and 'nord' in manager.intersection.feux
+    assert manager.intersection.feux['NORD'] is not manager.intersection.feux['nord']
+
+    manager.update_detection('NORD', 7, {}, 20)
+    assert manager.intersection.capteurs['NORD'].file_attente == 7
+    assert manager.intersection.capteurs['nord'].file_attente == 0
+
+    # Retirer 'NORD' ne touche pas au feu du flux 'nord'
+    manager.remove_approach('NORD')
+    assert 'NORD' not in manager.intersection.feux
+    assert 'nord' in manager.intersection.feux
+    assert set(manager.get_traffic_state()['feux']) == set(DEFAULT_APPROACHES)
+
+
+def test_detection_for_removed_approach_is_ignored():
+    manager = TrafficManager()
+    manager.add_approach('cam5')
+    manager.remove_approach('cam5')
+    manager.update_detection('cam5', 3, {}, 20)
+    assert 'cam5' not in manager.detection_data
+    assert 'cam5' not in manager.intersection.capteurs
+
+
+def test_control_loop_survives_approach_churn():
+    manager = TrafficManager()
+    manager.start()
+    stop = threading.Event()
+
+    def churn():
+        i = 0
+        while not stop.is_set():
+            approach = f"cam{i % 3}"
+            manager.add_approach(approach)
+            manager.update_detection(approach, i % 5, {}, 30)
+            manager.remove_approach(approach)
+            i += 1
+
+    threads = [threading.Thread(target=churn) for _ in range(2)]
+    try:
+        for thread in threads:
+            thread.start()
+        time.sleep(1.5)
+        assert manager.thread.is_alive()
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        manager.stop()
+    assert set(manager.detection_data) == set(DEFAULT_APPROACHES)
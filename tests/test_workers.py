@@ -0,0 +1,57 @@
+from workers import DetectionWorkerPool
+
+
+class FakeRing:
+    # close() échoue tant qu'une vue est encore utilisée
+    def __init__(self, busy):
+        self.busy = busy
+        self.closed = False
+
+    def close(self):
+        if self.busy:
+            raise BufferError("vue encore utilisée")
+        self.closed = True
+
+
+def test_messages_of_a_replaced_worker_are_not_current(tmp_path):
+    pool = DetectionWorkerPool(frame_shape=(40, 40, 3), slots=2)
+    missing = str(tmp_path / 'absente.mp4')
+    try:
+        pool.start('nord', missing, (0, 255, 0))
+        first = pool.generations['nord']
+        pool.start('nord', missing, (0, 255, 0))
+        second = pool.generations['nord']
+        assert second != first
+
+        # Vidéo absente : chaque processus se termine par un message 'ended' portant son jeton
+        received = []
+        while len(received) < 2:
+            message = pool.poll(timeout=30)
+            assert message is not None
+            received.append(message)
+        assert sorted((kind, direction, generation) for kind, direction, generation, _ in received) == \
+            [('ended', 'nord', first), ('ended', 'nord', second)]
+        assert not pool.is_current('nord', first)
+        assert pool.is_current('nord', second)
+
+        pool.remove('nord')
+        assert not pool.is_current('nord', second)
+    finally:
+        pool.close()
+
+
+def test_ring_still_in_use_is_closed_later():
+    pool = DetectionWorkerPool()
+    ring = FakeRing(busy=True)
+    pool.rings['nord'] = ring
+    pool._close_ring('nord')
+    assert 'nord' not in pool.rings
+    assert pool.pending_close == [('nord', ring)]
+
+    pool.stop_all()
+    assert pool.pending_close == [('nord', ring)]
+
+    ring.busy = False
+    pool.close()
+    assert ring.closed
+    assert pool.pending_close == []
@@ -1,146 +1,450 @@
-import math
+import hashlib
 import time
 import numpy as np
 
+
+class TrackTable:
+    """
+    Table compacte des pistes, stockée dans des tableaux NumPy préalloués.
+    Les emplacements libérés sont recyclés via une free-list et l'historique
+    des positions est un tampon circulaire de taille fixe par piste.
+    """
+    def __init__(self, capacity=64, history_size=5):
+        self.history_size = history_size
+        self.capacity = 0
+        self.free_slots = []
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        """
+        Agrandit les tableaux à la capacité demandée en conservant les pistes existantes
+        """
+        old = self.capacity
+        h = self.history_size
+
+        def extend(name, shape, dtype):
+            array = np.zeros(shape, dtype=dtype)
+            if old:
+                array[:old] = getattr(self, name)
+            setattr(self, name, array)
+
+        extend('ids', (capacity,), np.int64)
+        extend('boxes', (capacity, 4), np.int64)
+        extend('active', (capacity,), bool)
+        extend('centers', (capacity, 2), np.float64)
+        extend('times', (capacity,), np.float64)
+        extend('speeds', (capacity,), np.float64)
+        extend('has_speed', (capacity,), bool)
+        extend('classes', (capacity,), object)
+        extend('frames_since_seen', (capacity,), np.int32)
+        extend('history', (capacity, h, 2), np.float64)
+        extend('history_len', (capacity,), np.int32)
+        extend('history_head', (capacity,), np.int32)
+        extend('history_sum', (capacity, 2), np.float64)
+
+        # Les nouveaux emplacements sont distribués par ordre croissant
+        self.free_slots.extend(range(capacity - 1, old - 1, -1))
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.capacity - len(self.free_slots)
+
+    def active_slots(self):
+        return np.flatnonzero(self.active)
+
+    def add(self, obj_id, box, center, current_time):
+        """
+        Réserve un emplacement pour une nouvelle piste et retourne son indice
+        """
+        if not self.free_slots:
+            self._grow(self.capacity * 2)
+        slot = self.free_slots.pop()
+
+        self.ids[slot] = obj_id
+        self.boxes[slot] = box
+        self.active[slot] = True
+        self.centers[slot] = center
+        self.times[slot] = current_time
+        self.speeds[slot] = 0
+        self.has_speed[slot] = False
+        self.classes[slot] = None
+        self.frames_since_seen[slot] = 0
+        self.history_len[slot] = 0
+        self.history_head[slot] = 0
+        self.history_sum[slot] = 0
+        self.push_history(np.array([slot]), np.asarray(center, dtype=np.float64).reshape(1, 2))
+        return slot
+
+    def remove(self, slots):
+        self.active[slots] = False
+        self.free_slots.extend(np.asarray(slots).tolist())
+
+    def push_history(self, slots, positions):
+        """
+        Ajoute une position à l'historique de chaque piste et met à jour la somme glissante
+        """
+        head = self.history_head[slots]
+        full = self.history_len[slots] == self.history_size
+
+        # La position la plus ancienne sort de la somme quand le tampon est plein
+        oldest = self.history[slots, head]
+        self.history_sum[slots] -= np.where(full[:, None], oldest, 0)
+
+        self.history[slots, head] = positions
+        self.history_sum[slots] += positions
+        self.history_head[slots] = (head + 1) % self.history_size
+        self.history_len[slots] = np.minimum(self.history_len[slots] + 1, self.history_size)
+
+    def filtered_positions(self, slots, current_positions):
+        """
+        Moyenne des dernières positions et de la position courante (si historique suffisant)
+        """
+        count = self.history_len[slots]
+        mean = (self.history_sum[slots] + current_positions) / (count + 1)[:, None]
+        filtered = np.where((count >= 3)[:, None], mean, current_positions)
+        return filtered.astype(int)
+
+
 class EuclideanDistTracker:
     def __init__(self):
-        # Stockage des positions centrales des objets
-        self.center_points = {}
-        # Stockage des timestamps pour chaque objet
-        self.time_points = {}
-        # Stockage des vitesses
-        self.speeds = {}
         # Compteur d'ID d'objets
         self.id_count = 0
         # Seuil de disparition
         self.disappear_threshold = 20
-        # Dictionnaire pour suivre les frames depuis la dernière apparition
-        self.frames_since_seen = {}
         # Échelle pixels vers mètres (à calibrer selon votre environnement)
         self.pixels_per_meter = 35  # exemple: 35 pixels = 1 mètre
-        # Mémorisation des dernières positions pour filtrage
-        self.position_history = {}
+        # Table pixel -> sol issue d'une calibration par homographie (remplace pixels_per_meter)
+        self.ground_lookup = None
         # Nombre de positions à garder pour le lissage
         self.history_size = 5
+        # Positions, temps, vitesses et historiques de toutes les pistes
+        self.tracks = TrackTable(history_size=self.history_size)
+        # Classe (ou None) de chaque objet retourné par la dernière mise à jour
+        self.last_classes = []
+
+    def params(self):
+        """
+        Paramètres dont dépendent les pistes et les vitesses (clé du cache de détections)
+        """
+        lookup = self.ground_lookup
+        return {
+            'type': type(self).__name__,
+            'disappear_threshold': self.disappear_threshold,
+            'pixels_per_meter': self.pixels_per_meter,
+            'history_size': self.history_size,
+            'ground_lookup': hashlib.sha1(lookup.table.tobytes()).hexdigest() if lookup is not None else None
+        }
 
-    def calculate_speed(self, obj_id, new_center, current_time):
-        if obj_id in self.center_points and obj_id in self.time_points:
-            old_center = self.center_points[obj_id]
-            old_time = self.time_points[obj_id]
-            
-            # Calcul de la distance en pixels
-            distance_pixels = math.hypot(new_center[0] - old_center[0], 
-                                      new_center[1] - old_center[1])
-            
-            # Conversion en mètres
+    def _update_speeds(self, slots, new_centers, current_time):
+        """
+        Calcule la vitesse (km/h) des pistes associées et applique le lissage exponentiel
+        """
+        old_centers = self.tracks.centers[slots]
+
+        if self.ground_lookup is not None:
+            # Distance mesurée sur le plan du sol calibré
+            delta = self.ground_lookup.to_ground(new_centers) - self.ground_lookup.to_ground(old_centers)
+            distance_meters = np.hypot(delta[:, 0], delta[:, 1])
+        else:
+            # Calcul de la distance en pixels puis conversion en mètres
+            distance_pixels = np.hypot(new_centers[:, 0] - old_centers[:, 0],
+                                       new_centers[:, 1] - old_centers[:, 1])
             distance_meters = distance_pixels / self.pixels_per_meter
-            
-            # Calcul du temps écoulé en secondes
-            time_diff = current_time - old_time
-            
-            if time_diff > 0:
-                # Vitesse en mètres par seconde
-                speed = distance_meters / time_diff
-                # Conversion en km/h
-                speed_kmh = speed * 3.6
-                
-                # Lissage de la vitesse avec moyenne mobile
-                if obj_id in self.speeds:
-                    # Lissage exponentiel
-                    alpha = 0.3  # Facteur de lissage
-                    self.speeds[obj_id] = (self.speeds[obj_id] * (1-alpha) + speed_kmh * alpha)
-                    
-                    # Limiter les valeurs aberrantes
-                    if self.speeds[obj_id] > 120:  # Limite max en km/h
-                        self.speeds[obj_id] = 120
-                else:
-                    self.speeds[obj_id] = min(speed_kmh, 120)
-                
-                return self.speeds[obj_id]
-        return 0
-
-    def update_position_history(self, obj_id, position):
-        # Initialiser l'historique si nécessaire
-        if obj_id not in self.position_history:
-            self.position_history[obj_id] = []
-        
-        # Ajouter la nouvelle position
-        self.position_history[obj_id].append(position)
-        
-        # Limiter la taille de l'historique
-        if len(self.position_history[obj_id]) > self.history_size:
-            self.position_history[obj_id].pop(0)
-    
-    def get_filtered_position(self, obj_id, current_position):
-        # Si pas assez d'historique, retourner la position actuelle
-        if obj_id not in self.position_history or len(self.position_history[obj_id]) < 3:
-            return current_position
-        
-        # Sinon, calculer la position moyenne des dernières positions
-        positions = self.position_history[obj_id] + [current_position]
-        filtered_position = np.mean(positions, axis=0).astype(int)
-        
-        return filtered_position
-
-    
-    def update(self, objects_rect):
-        objects_bbs_ids = []
-        current_time = time.time()
+
+        # Calcul du temps écoulé en secondes
+        time_diff = current_time - self.tracks.times[slots]
+        valid = time_diff > 0
+
+        speed_kmh = np.zeros(len(slots))
+        np.divide(distance_meters * 3.6, time_diff, out=speed_kmh, where=valid)
+
+        # Lissage exponentiel si une vitesse existe déjà
+        alpha = 0.3  # Facteur de lissage
+        previous = self.tracks.speeds[slots]
+        smoothed = np.where(self.tracks.has_speed[slots],
+                            previous * (1 - alpha) + speed_kmh * alpha,
+                            speed_kmh)
+        # Limiter les valeurs aberrantes
+        smoothed = np.minimum(smoothed, 120)  # Limite max en km/h
+
+        updated = slots[valid]
+        self.tracks.speeds[updated] = smoothed[valid]
+        self.tracks.has_speed[updated] = True
+
+        return np.where(valid, smoothed, 0)
+
+    def _predict(self, slots, current_time):
+        """
+        Étape de prédiction avant association (aucune en mode euclidien)
+        """
+        pass
+
+    def _reference_centers(self, slots):
+        """
+        Positions des pistes utilisées pour l'association
+        """
+        return self.tracks.centers[slots]
+
+    def _correct(self, slots, measurements):
+        """
+        Prise en compte des mesures associées (aucune en mode euclidien)
+        """
+        pass
+
+    def _start_track(self, slot, center):
+        """
+        Initialisation spécifique d'une nouvelle piste (aucune en mode euclidien)
+        """
+        pass
+
+    def _association_costs(self, rects, centers, slots):
+        """
+        Matrice de coût détections x pistes et masque des couples admissibles
+        """
+        track_centers = self._reference_centers(slots)
+
+        # Matrice des distances détections x pistes en une seule opération
+        diff = centers[:, None, :] - track_centers[None, :, :]
+        distances = np.hypot(diff[..., 0], diff[..., 1])
+
+        # Utiliser un seuil dynamique pour la distance en fonction de la taille de l'objet
+        thresholds = np.maximum(25, np.minimum(rects[:, 2], rects[:, 3]) // 2)
+
+        # Seuls les couples sous le seuil de la détection sont candidats
+        return distances, distances < thresholds[:, None]
+
+    def _match_detections(self, rects, centers, slots):
+        """
+        Association globale détections/pistes à partir de la matrice de coût
+        Retourne les indices des détections et les emplacements des pistes associées
+        """
+        empty = np.empty(0, dtype=np.int64)
+        if len(centers) == 0 or len(slots) == 0:
+            return empty, empty
+
+        costs, admissible = self._association_costs(rects, centers, slots)
+        det_idx, trk_idx = np.nonzero(admissible)
+        if len(det_idx) == 0:
+            return empty, empty
+
+        # Affectation gloutonne par coût croissant (chaque piste et détection au plus une fois)
+        order = np.argsort(costs[det_idx, trk_idx], kind='stable')
+        used_dets = set()
+        used_tracks = set()
+        matched_dets = []
+        matched_tracks = []
+        for d, t in zip(det_idx[order].tolist(), trk_idx[order].tolist()):
+            if d in used_dets or t in used_tracks:
+                continue
+            used_dets.add(d)
+            used_tracks.add(t)
+            matched_dets.append(d)
+            matched_tracks.append(t)
+        return np.array(matched_dets, dtype=np.int64), slots[matched_tracks]
+
+    def update(self, objects_rect, timestamp=None, classes=None):
+        """
+        Associe les détections aux pistes existantes
+        timestamp: horodatage de la frame en secondes (temps média de la vidéo);
+        à défaut l'horloge murale est utilisée
+        classes: classe de chaque détection (optionnel); chaque piste garde la dernière classe vue,
+        disponible dans last_classes pour les objets retournés
+        """
+        current_time = time.time() if timestamp is None else timestamp
+        tracks = self.tracks
+
+        rects = np.asarray(objects_rect, dtype=np.int64).reshape(-1, 4)
 
         # Obtention du point central des nouveaux objets
-        for rect in objects_rect:
-            x, y, w, h = rect
-            cx = (x + x + w) // 2
-            cy = (y + y + h) // 2
-
-            same_object_detected = False
-            # Utiliser un seuil dynamique pour la distance en fonction de la taille de l'objet
-            distance_threshold = max(25, min(w, h) // 2)
-            
-            for obj_id, pt in list(self.center_points.items()):
-                dist = math.hypot(cx - pt[0], cy - pt[1])
-
-                if dist < distance_threshold:
-                    # Calcul de la vitesse
-                    speed = self.calculate_speed(obj_id, (cx, cy), current_time)
-                    
-                    # Mettre à jour l'historique des positions
-                    self.update_position_history(obj_id, (cx, cy))
-                    
-                    # Obtenir la position filtrée
-                    filtered_pos = self.get_filtered_position(obj_id, (cx, cy))
-                    cx_filtered, cy_filtered = filtered_pos
-                    
-                    self.center_points[obj_id] = (cx_filtered, cy_filtered)
-                    self.time_points[obj_id] = current_time
-                    objects_bbs_ids.append([x, y, w, h, obj_id, speed])
-                    same_object_detected = True
-                    self.frames_since_seen[obj_id] = 0
-                    break
-
-            if not same_object_detected:
-                # Ne considérer que les objets d'une certaine taille
-                min_size = 40  # Taille minimale (largeur ou hauteur) en pixels
-                if w > min_size or h > min_size:
-                    self.center_points[self.id_count] = (cx, cy)
-                    self.time_points[self.id_count] = current_time
-                    self.update_position_history(self.id_count, (cx, cy))
-                    objects_bbs_ids.append([x, y, w, h, self.id_count, 0])
-                    self.frames_since_seen[self.id_count] = 0
-                    self.id_count += 1
+        centers = np.empty((len(rects), 2), dtype=np.int64)
+        centers[:, 0] = (2 * rects[:, 0] + rects[:, 2]) // 2
+        centers[:, 1] = (2 * rects[:, 1] + rects[:, 3]) // 2
+
+        active = tracks.active_slots()
+        self._predict(active, current_time)
+        det_idx, slots = self._match_detections(rects, centers, active)
+
+        ids = np.full(len(rects), -1, dtype=np.int64)
+        speeds = np.zeros(len(rects))
+        labels = np.empty(len(rects), dtype=object)
+        if classes is not None:
+            labels[:] = list(classes)
+        known = labels != None  # noqa: E711 (comparaison élément par élément)
+
+        if len(slots):
+            new_centers = centers[det_idx].astype(np.float64)
+
+            # Calcul de la vitesse
+            speeds[det_idx] = self._update_speeds(slots, new_centers, current_time)
+
+            # Mettre à jour l'historique et obtenir la position filtrée
+            tracks.push_history(slots, new_centers)
+            self._correct(slots, new_centers)
+            filtered = tracks.filtered_positions(slots, new_centers)
+
+            tracks.centers[slots] = filtered
+            tracks.boxes[slots] = rects[det_idx]
+            tracks.times[slots] = current_time
+            tracks.frames_since_seen[slots] = 0
+            classified = known[det_idx]
+            tracks.classes[slots[classified]] = labels[det_idx[classified]]
+            ids[det_idx] = tracks.ids[slots]
+            labels[det_idx] = tracks.classes[slots]
+
+        # Ne considérer que les nouveaux objets d'une certaine taille
+        min_size = 40  # Taille minimale (largeur ou hauteur) en pixels
+        unmatched = np.ones(len(rects), dtype=bool)
+        unmatched[det_idx] = False
+        large = (rects[:, 2] > min_size) | (rects[:, 3] > min_size)
+        for i in np.flatnonzero(unmatched & large).tolist():
+            slot = tracks.add(self.id_count, rects[i], centers[i], current_time)
+            tracks.classes[slot] = labels[i]
+            self._start_track(slot, centers[i])
+            ids[i] = self.id_count
+            self.id_count += 1
 
         # Gestion des objets disparus
-        for obj_id in list(self.frames_since_seen.keys()):
-            if obj_id not in [item[4] for item in objects_bbs_ids]:
-                self.frames_since_seen[obj_id] += 1
-                if self.frames_since_seen[obj_id] > self.disappear_threshold:
-                    del self.center_points[obj_id]
-                    del self.time_points[obj_id]
-                    if obj_id in self.speeds:
-                        del self.speeds[obj_id]
-                    if obj_id in self.position_history:
-                        del self.position_history[obj_id]
-                    del self.frames_since_seen[obj_id]
+        missed = np.setdiff1d(active, slots, assume_unique=True)
+        if len(missed):
+            tracks.frames_since_seen[missed] += 1
+            expired = missed[tracks.frames_since_seen[missed] > self.disappear_threshold]
+            if len(expired):
+                tracks.remove(expired)
+
+        kept = np.flatnonzero(ids >= 0)
+        self.last_classes = labels[kept].tolist()
+        objects_bbs_ids = []
+        for (x, y, w, h), obj_id, speed in zip(rects[kept].tolist(), ids[kept].tolist(),
+                                               speeds[kept].tolist()):
+            objects_bbs_ids.append([x, y, w, h, obj_id, speed])
 
         return objects_bbs_ids
-    
\ No newline at end of file
+
+
+class KalmanTracker(EuclideanDistTracker):
+    """
+    Suivi de type SORT : filtre de Kalman à vitesse constante appliqué à toutes
+    les pistes en une seule opération vectorisée. L'association se fait sur les
+    positions prédites, ce qui tolère un intervalle de traitement plus grand.
+    """
+    def __init__(self):
+        super().__init__()
+        # Bruit de processus (accélération, px/s²) et bruit de mesure (px)
+        self.process_noise = 100.0
+        self.measurement_noise = 4.0
+        # Incertitude initiale sur la vitesse (px/s)
+        self.initial_velocity_std = 400.0
+        # État [cx, cy, vx, vy] et covariance de chaque emplacement de la table
+        self.state = np.zeros((0, 4))
+        self.covariance = np.zeros((0, 4, 4))
+        self.last_update_time = None
+
+    def params(self):
+        return {**super().params(), 'process_noise': self.process_noise,
+                'measurement_noise': self.measurement_noise, 'initial_velocity_std': self.initial_velocity_std}
+
+    def _ensure_capacity(self):
+        capacity = self.tracks.capacity
+        old = len(self.state)
+        if old < capacity:
+            state = np.zeros((capacity, 4))
+            covariance = np.zeros((capacity, 4, 4))
+            state[:old] = self.state
+            covariance[:old] = self.covariance
+            self.state = state
+            self.covariance = covariance
+
+    def _predict(self, slots, current_time):
+        dt = 0.0 if self.last_update_time is None else current_time - self.last_update_time
+        self.last_update_time = current_time
+        if len(slots) == 0 or dt <= 0:
+            return
+
+        self._ensure_capacity()
+
+        transition = np.eye(4)
+        transition[0, 2] = transition[1, 3] = dt
+
+        # Bruit d'accélération constante par morceaux sur chaque axe
+        q = self.process_noise ** 2
+        noise = np.zeros((4, 4))
+        noise[[0, 1], [0, 1]] = q * dt ** 4 / 4
+        noise[[0, 1, 2, 3], [2, 3, 0, 1]] = q * dt ** 3 / 2
+        noise[[2, 3], [2, 3]] = q * dt ** 2
+
+        self.state[slots] = self.state[slots] @ transition.T
+        self.covariance[slots] = transition @ self.covariance[slots] @ transition.T + noise
+
+    def _reference_centers(self, slots):
+        return self.state[slots, :2]
+
+    def _correct(self, slots, measurements):
+        covariance = self.covariance[slots]
+
+        # Gain de Kalman pour une mesure de position (H = [I 0])
+        innovation_cov = covariance[:, :2, :2] + np.eye(2) * self.measurement_noise ** 2
+        gain = covariance[:, :, :2] @ np.linalg.inv(innovation_cov)
+        innovation = measurements - self.state[slots, :2]
+
+        self.state[slots] += (gain @ innovation[:, :, None])[:, :, 0]
+        self.covariance[slots] = covariance - gain @ covariance[:, :2, :]
+
+    def _start_track(self, slot, center):
+        self._ensure_capacity()
+        self.state[slot] = (center[0], center[1], 0, 0)
+        self.covariance[slot] = np.diag([self.measurement_noise ** 2] * 2 +
+                                        [self.initial_velocity_std ** 2] * 2)
+
+
+class IoUTracker(EuclideanDistTracker):
+    """
+    Association par recouvrement des boîtes (IoU) plutôt que par distance des centres,
+    plus robuste quand des véhicules de tailles très différentes sont côte à côte.
+    """
+    def __init__(self):
+        super().__init__()
+        # Recouvrement minimal pour associer une détection à une piste
+        self.iou_threshold = 0.2
+
+    def params(self):
+        return {**super().params(), 'iou_threshold': self.iou_threshold}
+
+    def _association_costs(self, rects, centers, slots):
+        boxes = self.tracks.boxes[slots]
+
+        # Coins des boîtes (x1, y1, x2, y2) des détections et des pistes
+        det_x1, det_y1 = rects[:, 0, None], rects[:, 1, None]
+        det_x2, det_y2 = det_x1 + rects[:, 2, None], det_y1 + rects[:, 3, None]
+        trk_x1, trk_y1 = boxes[None, :, 0], boxes[None, :, 1]
+        trk_x2, trk_y2 = trk_x1 + boxes[None, :, 2], trk_y1 + boxes[None, :, 3]
+
+        # Matrice d'intersection détections x pistes
+        inter_w = np.clip(np.minimum(det_x2, trk_x2) - np.maximum(det_x1, trk_x1), 0, None)
+        inter_h = np.clip(np.minimum(det_y2, trk_y2) - np.maximum(det_y1, trk_y1), 0, None)
+        intersection = inter_w * inter_h
+
+        det_area = rects[:, 2, None] * rects[:, 3, None]
+        trk_area = boxes[None, :, 2] * boxes[None, :, 3]
+        union = det_area + trk_area - intersection
+
+        iou = np.zeros(intersection.shape)
+        np.divide(intersection, union, out=iou, where=union > 0)
+
+        return 1.0 - iou, iou >= self.iou_threshold
+
+
+# Modes de suivi disponibles, sélectionnables par direction dans app.py
+TRACKER_MODES = {
+    'euclidean': EuclideanDistTracker,
+    'kalman': KalmanTracker,
+    'iou': IoUTracker,
+}
+
+
+def create_tracker(mode='euclidean'):
+    """
+    Crée un tracker selon le mode demandé ('euclidean', 'kalman' ou 'iou')
+    """
+    if mode not in TRACKER_MODES:
+        raise ValueError(f"Mode de suivi inconnu: {mode}. Options: {', '.join(TRACKER_MODES)}")
+    return TRACKER_MODES[mode]()
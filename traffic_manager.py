@@ -1,34 +1,64 @@
 from scoot import SCOOTController, Intersection, FeuTricolore
+from notify import Notifier
 import threading
 import time
 import random
 import math
 
+# Approches par défaut (une par caméra) et leur ordre de passage
+DEFAULT_APPROACHES = ('nord', 'sud', 'est', 'ouest')
+DEFAULT_SEQUENCE = ('nord', 'est', 'sud', 'ouest')
+
+
 class TrafficManager:
-    def __init__(self):
-        self.intersection = Intersection("Carrefour Principal", four_way=True)
+    def __init__(self, approaches=DEFAULT_APPROACHES):
+        approaches = list(approaches)
+        # Feux et capteurs portent l'identifiant exact du flux ('nord' et 'NORD' sont deux approches);
+        # le carrefour par défaut garde sa séquence nord, est, sud, ouest
+        sequence = DEFAULT_SEQUENCE if tuple(approaches) == DEFAULT_APPROACHES else None
+        self.intersection = Intersection("Carrefour Principal", four_way=True, approches=approaches,
+                                         sequence=sequence)
         self.scoot = SCOOTController([self.intersection])
         self.detection_data = {
-            'nord': {'count': 0, 'speed_avg': 0, 'objects': set()},
-            'sud': {'count': 0, 'speed_avg': 0, 'objects': set()},
-            'est': {'count': 0, 'speed_avg': 0, 'objects': set()},
-            'ouest': {'count': 0, 'speed_avg': 0, 'objects': set()}
+            approach: {'count': 0, 'speed_avg': 0, 'objects': {}} for approach in approaches
         }
         self.running = False
         self.thread = None
         # Add manual override mode
         self.manual_mode = False
-        self.manual_override = {
-            'nord': None,
-            'sud': None,
-            'est': None,
-            'ouest': None
-        }
+        self.manual_override = dict.fromkeys(approaches)
        
         self.simulation_mode = False
         self.simulation_scenario = "normal"
         self.simulation_thread = None
         self.simulation_speed = 1.0  
+        # Signalé à chaque changement de commande (arrêt, mode manuel, état forcé d'un feu)
+        self.changed = Notifier()
+        # Arrêt de la simulation sans attendre la fin de son pas
+        self.simulation_stop = threading.Event()
+        # Protège feux, capteurs et séquence : approches ajoutées ou retirées depuis les requêtes
+        # pendant que la régulation et la simulation les parcourent
+        self.lock = threading.RLock()
+
+    def add_approach(self, approach):
+        """
+        Ajoute une approche (nouvelle caméra) au carrefour régulé
+        """
+        with self.lock:
+            if approach in self.detection_data:
+                return
+            self.intersection.ajouter_approche(approach)
+            self.manual_override[approach] = None
+            self.detection_data[approach] = {'count': 0, 'speed_avg': 0, 'objects': {}}
+
+    def remove_approach(self, approach):
+        """
+        Retire une approche du carrefour régulé
+        """
+        with self.lock:
+            self.detection_data.pop(approach, None)
+            self.manual_override.pop(approach, None)
+            self.intersection.retirer_approche(approach)
 
     def start(self):
         self.running = True
@@ -38,93 +68,98 @@ class TrafficManager:
 
     def stop(self):
         self.running = False
+        self.changed.notify()
         if self.thread:
             self.thread.join()
         self.stop_simulation()
 
     def _run_traffic_control(self):
+        """
+        Cycle des feux à une seconde par pas; les états forcés du mode manuel sont
+        appliqués dès leur changement
+        """
+        version = self.changed.version
+        next_step = time.monotonic()
         while self.running:
-            if not self.manual_mode:
-                self._update_scoot()
-                self.intersection.mettre_a_jour()
-            else:
-                
-                for direction, state in self.manual_override.items():
-                    if state is not None:
-                        dir_key = direction.capitalize()
-                        if state != self.intersection.feux[dir_key].etat:
-                            
-                            self.intersection.feux[dir_key].etat = state
-                            if state == "vert":
-                                self.intersection.feux[dir_key].timer = self.intersection.feux[dir_key].temps_vert
-                            elif state == "orange":
-                                self.intersection.feux[dir_key].timer = self.intersection.feux[dir_key].temps_orange
-                            elif state == "rouge":
-                                self.intersection.feux[dir_key].timer = self.intersection.feux[dir_key].temps_rouge
+            now = time.monotonic()
+            try:
+                with self.lock:
+                    if now >= next_step:
+                        if not self.manual_mode:
+                            self._update_scoot()
+                            self.intersection.mettre_a_jour()
+                        next_step = now + 1
+                    if self.manual_mode:
+                        self._apply_manual_override()
+            except Exception as e:
+                # Une erreur sur un pas ne doit pas arrêter la régulation
+                print(f"Erreur dans la régulation des feux: {e}")
+                next_step = now + 1
             
-            time.sleep(1)  
+            # Attente du pas suivant ou d'un changement de commande
+            version = self.changed.wait(version, timeout=max(next_step - time.monotonic(), 0.0))
+
+    def _apply_manual_override(self):
+        for direction, state in list(self.manual_override.items()):
+            if state is not None:
+                feu = self.intersection.feux.get(direction)
+                if feu is not None and state != feu.etat:
+                    
+                    feu.etat = state
+                    if state == "vert":
+                        feu.timer = feu.temps_vert
+                    elif state == "orange":
+                        feu.timer = feu.temps_orange
+                    elif state == "rouge":
+                        feu.timer = feu.temps_rouge
 
     def update_detection(self, direction, objects_count, current_objects, speed_avg):
         """
         Mise à jour des données de détection pour une direction
+        current_objects: résumé de taille constante des compteurs de passage
         """
-      
         if self.simulation_mode:
             return
-            
-        
-        print(f"Mise à jour des données de détection pour {direction}: {objects_count} objets")
-            
-        self.detection_data[direction]['count'] = objects_count
-        self.detection_data[direction]['objects'] = current_objects
-        self.detection_data[direction]['speed_avg'] = speed_avg
 
-        # Mise à jour immédiate du capteur SCOOT correspondant
-        self.intersection.capteurs[direction.capitalize()].file_attente = objects_count
-        
-        # Forcer une mise à jour immédiate de la logique de régulation
-        # si les données ont significativement changé
-        needs_update = False
-        if direction == 'nord' and objects_count > 0:
-            needs_update = True
-        elif direction == 'sud' and objects_count > 0:
-            needs_update = True
-        elif direction == 'est' and objects_count > 0:
-            needs_update = True
-        elif direction == 'ouest' and objects_count > 0:
-            needs_update = True
+        # Vérification et écriture sous le verrou : l'approche peut être retirée entre-temps
+        with self.lock:
+            data = self.detection_data.get(direction)
+            if data is None:
+                return
+
+            print(f"Mise à jour des données de détection pour {direction}: {objects_count} objets")
+
+            data['count'] = objects_count
+            data['objects'] = current_objects
+            data['speed_avg'] = speed_avg
+
+            # Mise à jour immédiate du capteur SCOOT correspondant
+            capteur = self.intersection.capteurs.get(direction)
+            if capteur is not None:
+                capteur.file_attente = objects_count
             
-        if needs_update and not self.manual_mode:
-            self._update_scoot()
+            # Forcer une mise à jour immédiate de la logique de régulation
+            # si les données ont significativement changé
+            needs_update = objects_count > 0
+                
+            if needs_update and not self.manual_mode:
+                self._update_scoot()
 
     def _update_scoot(self):
         """
         Mise à jour du contrôleur SCOOT basée sur les données de détection
         """
         # Récupérer les comptages pour chaque direction
-        nord_count = self.detection_data['nord']['count']
-        sud_count = self.detection_data['sud']['count']
-        est_count = self.detection_data['est']['count']
-        ouest_count = self.detection_data['ouest']['count']
+        counts = {direction: data['count'] for direction, data in list(self.detection_data.items())}
         
         # Vérifier que les données sont réellement mises à jour
         print(f"Données actuelles de comptage pour la régulation:")
-        print(f"- Nord: {nord_count} objets")
-        print(f"- Sud: {sud_count} objets")
-        print(f"- Est: {est_count} objets")
-        print(f"- Ouest: {ouest_count} objets")
+        for direction, count in counts.items():
+            print(f"- {direction.capitalize()}: {count} objets")
         
         # Calculer les densités relatives
-        total_count = max(1, nord_count + sud_count + est_count + ouest_count)
-        
-        # Éviter les divisions par zéro et garantir une équité de base
-        if total_count == 0:
-            nord_ratio = sud_ratio = est_ratio = ouest_ratio = 0.25
-        else:
-            nord_ratio = nord_count / total_count
-            sud_ratio = sud_count / total_count
-            est_ratio = est_count / total_count
-            ouest_ratio = ouest_count / total_count
+        total_count = max(1, sum(counts.values()))
+        ratios = {direction: count / total_count for direction, count in counts.items()}
         
         # Déterminer les temps de feu vert pour chaque direction
         base_time = 10  # Temps de base en secondes
@@ -135,59 +170,45 @@ class TrafficManager:
         adjustment_factor = 3.0
         
         # Formule améliorée pour le temps de feu vert
-        nord_time = min(max(min_time, base_time * (1 + nord_ratio * adjustment_factor)), max_time)
-        sud_time = min(max(min_time, base_time * (1 + sud_ratio * adjustment_factor)), max_time)
-        est_time = min(max(min_time, base_time * (1 + est_ratio * adjustment_factor)), max_time)
-        ouest_time = min(max(min_time, base_time * (1 + ouest_ratio * adjustment_factor)), max_time)
+        green_times = {direction: min(max(min_time, base_time * (1 + ratio * adjustment_factor)), max_time)
+                       for direction, ratio in ratios.items()}
         
         # Imprimer des informations sur la mise à jour des temps pour le débogage
         print(f"Mise à jour des temps de feux:")
-        print(f"Nord: {nord_count} objets -> {nord_time:.1f}s")
-        print(f"Sud: {sud_count} objets -> {sud_time:.1f}s")
-        print(f"Est: {est_count} objets -> {est_time:.1f}s")
-        print(f"Ouest: {ouest_count} objets -> {ouest_time:.1f}s")
+        for direction, green_time in green_times.items():
+            print(f"{direction.capitalize()}: {counts[direction]} objets -> {green_time:.1f}s")
         
         # Mettre à jour les temps des feux
-        self.intersection.feux["Nord"].temps_vert = int(nord_time)
-        self.intersection.feux["Sud"].temps_vert = int(sud_time)
-        self.intersection.feux["Est"].temps_vert = int(est_time)
-        self.intersection.feux["Ouest"].temps_vert = int(ouest_time)
+        for direction, green_time in green_times.items():
+            feu = self.intersection.feux.get(direction)
+            if feu is not None:
+                feu.temps_vert = int(green_time)
 
     def get_traffic_state(self):
         """
         Retourne l'état actuel du trafic
         """
-        return {
-            'feux': {
-                'nord': {
-                    'etat': self.intersection.feux["Nord"].etat,
-                    'timer': self.intersection.feux["Nord"].timer,
-                    'temps_vert': self.intersection.feux["Nord"].temps_vert
-                },
-                'sud': {
-                    'etat': self.intersection.feux["Sud"].etat,
-                    'timer': self.intersection.feux["Sud"].timer,
-                    'temps_vert': self.intersection.feux["Sud"].temps_vert
-                },
-                'est': {
-                    'etat': self.intersection.feux["Est"].etat,
-                    'timer': self.intersection.feux["Est"].timer,
-                    'temps_vert': self.intersection.feux["Est"].temps_vert
+        with self.lock:
+            return {
+                'feux': {
+                    direction: {
+                        'etat': feu.etat,
+                        'timer': feu.timer,
+                        'temps_vert': feu.temps_vert
+                    }
+                    for direction, feu in ((direction, self.intersection.feux.get(direction))
+                                           for direction in list(self.detection_data))
+                    if feu is not None
                 },
-                'ouest': {
-                    'etat': self.intersection.feux["Ouest"].etat,
-                    'timer': self.intersection.feux["Ouest"].timer,
-                    'temps_vert': self.intersection.feux["Ouest"].temps_vert
+                # Copie : l'état est sérialisé hors du verrou
+                'detection': {direction: dict(data) for direction, data in self.detection_data.items()},
+                'manual_mode': self.manual_mode,
+                'simulation': {
+                    'active': self.simulation_mode,
+                    'scenario': self.simulation_scenario,
+                    'speed': self.simulation_speed
                 }
-            },
-            'detection': self.detection_data,
-            'manual_mode': self.manual_mode,
-            'simulation': {
-                'active': self.simulation_mode,
-                'scenario': self.simulation_scenario,
-                'speed': self.simulation_speed
             }
-        }
         
     def set_manual_mode(self, enabled):
         """
@@ -200,27 +221,24 @@ class TrafficManager:
         self.manual_mode = enabled
         if not enabled:
             
-            self.manual_override = {
-                'nord': None,
-                'sud': None,
-                'est': None,
-                'ouest': None
-            }
+            self.manual_override = dict.fromkeys(self.detection_data)
+        self.changed.notify()
         return {'success': True, 'manual_mode': self.manual_mode}
     
     def set_light_state(self, direction, state):
         """
         Définit manuellement l'état d'un feu de circulation
-        direction: 'nord', 'sud', 'est', 'ouest'
+        direction: une des approches du carrefour ('nord', 'sud', 'est', 'ouest' par défaut)
         state: 'vert', 'orange', 'rouge'
         """
-        if direction not in ['nord', 'sud', 'est', 'ouest']:
+        if direction not in self.detection_data:
             return {'success': False, 'error': 'Direction invalide'}
             
         if state not in ['vert', 'orange', 'rouge']:
             return {'success': False, 'error': 'État invalide'}
             
         self.manual_override[direction] = state
+        self.changed.notify()
         return {'success': True, 'direction': direction, 'state': state}
     
     def start_simulation(self, scenario, speed=1.0):
@@ -242,6 +260,7 @@ class TrafficManager:
         
         
         self.simulation_mode = True
+        self.simulation_stop.clear()
         self.simulation_scenario = scenario
         self.simulation_speed = max(0.1, min(5.0, speed))  
         
@@ -265,15 +284,17 @@ class TrafficManager:
         """
         if self.simulation_mode:
             self.simulation_mode = False
+            self.simulation_stop.set()
             if self.simulation_thread:
                 self.simulation_thread.join(timeout=2)
                 self.simulation_thread = None
             
           
-            for direction in self.detection_data:
-                self.detection_data[direction]['count'] = 0
-                self.detection_data[direction]['speed_avg'] = 0
-                self.detection_data[direction]['objects'] = set()
+            with self.lock:
+                for data in self.detection_data.values():
+                    data['count'] = 0
+                    data['speed_avg'] = 0
+                    data['objects'] = {}
                 
             return {'success': True, 'message': 'Simulation arrêtée'}
         else:
@@ -287,24 +308,28 @@ class TrafficManager:
         
         while self.simulation_mode and self.running:
             
-            if self.simulation_scenario == 'normal':
-                self._simulate_normal_traffic(iteration)
-            elif self.simulation_scenario == 'rush_hour':
-                self._simulate_rush_hour(iteration)
-            elif self.simulation_scenario == 'night':
-                self._simulate_night_traffic(iteration)
-            elif self.simulation_scenario == 'north_congestion':
-                self._simulate_north_congestion(iteration)
-            elif self.simulation_scenario == 'east_west_heavy':
-                self._simulate_east_west_heavy(iteration)
-            
-            
-            for direction, data in self.detection_data.items():
-                self.intersection.capteurs[direction.capitalize()].file_attente = data['count']
+            # Données simulées et capteurs écrits sous le verrou, comme les détections réelles
+            with self.lock:
+                if self.simulation_scenario == 'normal':
+                    self._simulate_normal_traffic(iteration)
+                elif self.simulation_scenario == 'rush_hour':
+                    self._simulate_rush_hour(iteration)
+                elif self.simulation_scenario == 'night':
+                    self._simulate_night_traffic(iteration)
+                elif self.simulation_scenario == 'north_congestion':
+                    self._simulate_north_congestion(iteration)
+                elif self.simulation_scenario == 'east_west_heavy':
+                    self._simulate_east_west_heavy(iteration)
+
+                for direction, data in self.detection_data.items():
+                    capteur = self.intersection.capteurs.get(direction)
+                    if capteur is not None:
+                        capteur.file_attente = data['count']
             
             
             sleep_time = 1.0 / self.simulation_speed
-            time.sleep(sleep_time)
+            if self.simulation_stop.wait(sleep_time):
+                break
             iteration += 1
     
     def _simulate_normal_traffic(self, iteration):
@@ -317,16 +342,17 @@ class TrafficManager:
         
         cycle = (iteration % 60) / 60.0  
         
-        self.detection_data['nord']['count'] = base_traffic + int(variation * (0.5 + 0.5 * math.sin(cycle * 2 * math.pi)))
-        self.detection_data['sud']['count'] = base_traffic + int(variation * (0.5 + 0.5 * math.sin(cycle * 2 * math.pi + math.pi/2)))
-        self.detection_data['est']['count'] = base_traffic + int(variation * (0.5 + 0.5 * math.sin(cycle * 2 * math.pi + math.pi)))
-        self.detection_data['ouest']['count'] = base_traffic + int(variation * (0.5 + 0.5 * math.sin(cycle * 2 * math.pi + 3*math.pi/2)))
+        # Approches déphasées régulièrement sur le cycle
+        approaches = list(self.detection_data)
+        for i, direction in enumerate(approaches):
+            phase = i * 2 * math.pi / len(approaches)
+            self.detection_data[direction]['count'] = base_traffic + int(variation * (0.5 + 0.5 * math.sin(cycle * 2 * math.pi + phase)))
         
        
-        for direction in self.detection_data:
+        for direction in list(self.detection_data):
             self.detection_data[direction]['speed_avg'] = 40 + random.randint(-5, 5)
             
-            self.detection_data[direction]['objects'] = set(range(1, self.detection_data[direction]['count'] + 1))
+            self.detection_data[direction]['objects'] = {'total': self.detection_data[direction]['count']}
     
     def _simulate_rush_hour(self, iteration):
         """
@@ -345,17 +371,19 @@ class TrafficManager:
         
         cycle = (iteration % 60) / 60.0
         
-        self.detection_data['nord']['count'] = int(ns_multiplier * (base_traffic + variation * (0.7 + 0.3 * math.sin(cycle * 2 * math.pi))))
-        self.detection_data['sud']['count'] = int(ns_multiplier * (base_traffic + variation * (0.7 + 0.3 * math.sin(cycle * 2 * math.pi + math.pi/4))))
-        self.detection_data['est']['count'] = int(ew_multiplier * (base_traffic + variation * (0.7 + 0.3 * math.sin(cycle * 2 * math.pi + math.pi/2))))
-        self.detection_data['ouest']['count'] = int(ew_multiplier * (base_traffic + variation * (0.7 + 0.3 * math.sin(cycle * 2 * math.pi + 3*math.pi/4))))
+        # Première moitié des approches sur l'axe nord-sud, seconde moitié sur l'axe est-ouest
+        approaches = list(self.detection_data)
+        for i, direction in enumerate(approaches):
+            multiplier = ns_multiplier if i < len(approaches) / 2 else ew_multiplier
+            phase = i * math.pi / len(approaches)
+            self.detection_data[direction]['count'] = int(multiplier * (base_traffic + variation * (0.7 + 0.3 * math.sin(cycle * 2 * math.pi + phase))))
         
         
-        for direction in self.detection_data:
+        for direction in list(self.detection_data):
             count = self.detection_data[direction]['count']
             
             self.detection_data[direction]['speed_avg'] = max(10, 50 - count/2) + random.randint(-3, 3)
-            self.detection_data[direction]['objects'] = set(range(1, count + 1))
+            self.detection_data[direction]['objects'] = {'total': count}
     
     def _simulate_night_traffic(self, iteration):
         """
@@ -365,7 +393,7 @@ class TrafficManager:
         max_variation = 2  
         
         
-        for direction in self.detection_data:
+        for direction in list(self.detection_data):
             if random.random() < 0.3:  
                 self.detection_data[direction]['count'] = random.randint(0, base_traffic + max_variation)
             else:
@@ -373,7 +401,7 @@ class TrafficManager:
                 
            
             self.detection_data[direction]['speed_avg'] = 55 + random.randint(-10, 10)
-            self.detection_data[direction]['objects'] = set(range(1, self.detection_data[direction]['count'] + 1))
+            self.detection_data[direction]['objects'] = {'total': self.detection_data[direction]['count']}
     
     def _simulate_north_congestion(self, iteration):
         """
@@ -381,22 +409,22 @@ class TrafficManager:
         """
         cycle = (iteration % 60) / 60.0
         
-        
-        self.detection_data['nord']['count'] = 15 + int(5 * math.sin(cycle * 2 * math.pi))
-        
-        self.detection_data['sud']['count'] = 5 + int(3 * math.sin(cycle * 2 * math.pi + math.pi/2))
-        self.detection_data['est']['count'] = 3 + int(2 * math.sin(cycle * 2 * math.pi + math.pi))
-        self.detection_data['ouest']['count'] = 4 + int(2 * math.sin(cycle * 2 * math.pi + 3*math.pi/2))
-        
-        
-        self.detection_data['nord']['speed_avg'] = 15 + random.randint(-5, 5)
-        
-        for direction in ['sud', 'est', 'ouest']:
-            self.detection_data[direction]['speed_avg'] = 40 + random.randint(-10, 10)
+        # La première approche (nord par défaut) est congestionnée, les autres sont fluides
+        approaches = list(self.detection_data)
+        light_traffic = [(5, 3), (3, 2), (4, 2)]
+        for i, direction in enumerate(approaches):
+            phase = i * 2 * math.pi / len(approaches)
+            if i == 0:
+                self.detection_data[direction]['count'] = 15 + int(5 * math.sin(cycle * 2 * math.pi + phase))
+                self.detection_data[direction]['speed_avg'] = 15 + random.randint(-5, 5)
+            else:
+                base, amplitude = light_traffic[(i - 1) % len(light_traffic)]
+                self.detection_data[direction]['count'] = base + int(amplitude * math.sin(cycle * 2 * math.pi + phase))
+                self.detection_data[direction]['speed_avg'] = 40 + random.randint(-10, 10)
             
         
-        for direction in self.detection_data:
-            self.detection_data[direction]['objects'] = set(range(1, self.detection_data[direction]['count'] + 1))
+        for direction in list(self.detection_data):
+            self.detection_data[direction]['objects'] = {'total': self.detection_data[direction]['count']}
     
     def _simulate_east_west_heavy(self, iteration):
         """
@@ -404,19 +432,21 @@ class TrafficManager:
         """
         cycle = (iteration % 60) / 60.0
         
-        
-        self.detection_data['nord']['count'] = 2 + int(2 * math.sin(cycle * 2 * math.pi))
-        self.detection_data['sud']['count'] = 3 + int(2 * math.sin(cycle * 2 * math.pi + math.pi/4))
-        
-        self.detection_data['est']['count'] = 12 + int(6 * math.sin(cycle * 2 * math.pi + math.pi/2))
-        self.detection_data['ouest']['count'] = 10 + int(5 * math.sin(cycle * 2 * math.pi + 3*math.pi/4))
-        
-    
-        for direction in ['nord', 'sud']:
-            self.detection_data[direction]['speed_avg'] = 45 + random.randint(-5, 5)
-        for direction in ['est', 'ouest']:
-            self.detection_data[direction]['speed_avg'] = 25 + random.randint(-10, 10)
+        # Première moitié des approches sur l'axe nord-sud (fluide), seconde moitié sur l'axe est-ouest
+        approaches = list(self.detection_data)
+        light_traffic = [(2, 2), (3, 2)]
+        heavy_traffic = [(12, 6), (10, 5)]
+        half = (len(approaches) + 1) // 2
+        for i, direction in enumerate(approaches):
+            phase = i * math.pi / len(approaches)
+            if i < half:
+                base, amplitude = light_traffic[i % len(light_traffic)]
+                self.detection_data[direction]['speed_avg'] = 45 + random.randint(-5, 5)
+            else:
+                base, amplitude = heavy_traffic[(i - half) % len(heavy_traffic)]
+                self.detection_data[direction]['speed_avg'] = 25 + random.randint(-10, 10)
+            self.detection_data[direction]['count'] = base + int(amplitude * math.sin(cycle * 2 * math.pi + phase))
             
         
-        for direction in self.detection_data:
-            self.detection_data[direction]['objects'] = set(range(1, self.detection_data[direction]['count'] + 1))
+        for direction in list(self.detection_data):
+            self.detection_data[direction]['objects'] = {'total': self.detection_data[direction]['count']}
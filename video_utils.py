@@ -1,10 +1,10 @@
 import cv2
-import numpy as np
 import threading
 import os
 import time
 import logging
-from queue import Queue, Empty
+from frame_ring import FrameRing
+from overlay import OverlayRenderer
 
 logger = logging.getLogger(__name__)
 
@@ -19,32 +19,29 @@ class VideoProcessor:
         self.threads = {}
         self.video_ended = {}
         self.stop_flags = {}
+        self.overlays = {}
     
-    def initialize(self, directions, video_paths, buffer_size=30):
+    def initialize(self, directions, video_paths, buffer_size=8):
         """
         Initialise les ressources pour chaque direction
+        buffer_size: nombre d'emplacements de l'anneau de frames
         """
         for direction in directions:
             self.locks[direction] = threading.Lock()
-            self.frame_buffers[direction] = Queue(maxsize=buffer_size)
+            self.frame_buffers[direction] = FrameRing((330, 400, 3), slots=buffer_size)
             self.video_ended[direction] = True
             self.stop_flags[direction] = False
             self.caps[direction] = None
+            self.overlays[direction] = OverlayRenderer((400, 300))
     
     def create_error_frame(self, direction, message, colors):
         """
         Crée une frame d'erreur avec un message pour une direction donnée
         """
         display_width, display_height = 400, 300
-        error_frame = np.zeros((display_height + 30, display_width, 3), dtype=np.uint8)
-        title_bar = np.zeros((30, display_width, 3), dtype=np.uint8)
-        color = colors[direction]
-        cv2.rectangle(title_bar, (0, 0), (display_width, 30), color, -1)
-        cv2.putText(title_bar, f"{direction.upper()}: ERREUR", (10, 20), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-        cv2.putText(error_frame[30:, :], message, (int(display_width/2) - 120, int(display_height/2)), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-        return np.vstack((title_bar, error_frame[30:, :]))
+        return self.overlays[direction].status_frame(
+            f"{direction.upper()}: ERREUR", colors[direction], message,
+            (int(display_width/2) - 120, int(display_height/2)), 0.7, (0, 0, 255))
     
     def start_video(self, direction, video_path, colors):
         """
@@ -74,12 +71,7 @@ class VideoProcessor:
             error_frame = self.create_error_frame(direction, "Fichier vidéo non trouvé", colors)
             
             # Mettre la frame d'erreur dans le buffer
-            while not self.frame_buffers[direction].empty():
-                try:
-                    self.frame_buffers[direction].get(block=False)
-                except:
-                    pass
-            self.frame_buffers[direction].put(error_frame)
+            self.frame_buffers[direction].write(error_frame)
             
             self.video_ended[direction] = True
             return False
@@ -108,12 +100,7 @@ class VideoProcessor:
                 error_frame = self.create_error_frame(direction, "Impossible d'ouvrir la vidéo", colors)
                 
                 # Mettre la frame d'erreur dans le buffer
-                while not self.frame_buffers[direction].empty():
-                    try:
-                        self.frame_buffers[direction].get(block=False)
-                    except:
-                        pass
-                self.frame_buffers[direction].put(error_frame)
+                self.frame_buffers[direction].write(error_frame)
                 
                 self.video_ended[direction] = True
                 return
@@ -122,50 +109,37 @@ class VideoProcessor:
             with self.locks[direction]:
                 self.caps[direction] = capture
             
-            display_width, display_height = 400, 300
             color = colors[direction]
+            # Barre de titre en cache, composée avec l'image dans l'anneau
+            overlay = self.overlays[direction]
+            decoded = None
             
             while not self.stop_flags[direction]:
                 # Lire une frame
                 with self.locks[direction]:
                     if self.caps[direction] is None:
                         break
-                    ret, frame = self.caps[direction].read()
+                    ret, decoded = self.caps[direction].read(decoded)
                 
                 # Vérifier si la vidéo est terminée
                 if not ret:
                     final_frame = self.create_error_frame(direction, "Vidéo terminée", colors)
                     
-                    # Vider la file d'attente et ajouter la frame finale
-                    while not self.frame_buffers[direction].empty():
-                        try:
-                            self.frame_buffers[direction].get(block=False)
-                        except:
-                            pass
-                    self.frame_buffers[direction].put(final_frame)
+                    # Publier la frame finale
+                    self.frame_buffers[direction].write(final_frame)
                     
                     self.video_ended[direction] = True
                     break
                 
-                # Redimensionner pour l'affichage
-                frame = cv2.resize(frame, (display_width, display_height))
-                
-                # Créer la barre de titre
-                title_bar = np.zeros((30, display_width, 3), dtype=np.uint8)
-                cv2.rectangle(title_bar, (0, 0), (display_width, 30), color, -1)
-                cv2.putText(title_bar, f"{direction.upper()}", (10, 20), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-                
-                # Combiner la barre de titre et la frame
-                frame_with_title = np.vstack((title_bar, frame))
-                
-                # Mettre la frame dans le buffer sans bloquer
-                if self.frame_buffers[direction].full():
-                    try:
-                        self.frame_buffers[direction].get(block=False)
-                    except:
-                        pass
-                self.frame_buffers[direction].put(frame_with_title)
+                # Redimensionner pour l'affichage sous la barre de titre, directement dans
+                # l'emplacement suivant de l'anneau (le plus ancien est écrasé), publié par commit()
+                ring = self.frame_buffers[direction]
+                frame_with_title = ring.begin_write()
+                try:
+                    overlay.load(decoded, frame_with_title)
+                    overlay.draw_title(frame_with_title, f"{direction.upper()}", color)
+                finally:
+                    ring.commit()
                 
                 # Délai pour éviter d'écraser le CPU
                 time.sleep(0.03)
@@ -195,41 +169,22 @@ class VideoProcessor:
             final_frame = self.create_error_frame(direction, "Vidéo arrêtée", colors)
             
             # Mettre la frame finale dans le buffer
-            if not self.frame_buffers[direction].full():
-                while not self.frame_buffers[direction].empty():
-                    try:
-                        self.frame_buffers[direction].get(block=False)
-                    except:
-                        pass
-                self.frame_buffers[direction].put(final_frame)
+            self.frame_buffers[direction].write(final_frame)
             
             return True
         return False
     
     def get_frame(self, direction, colors):
         """
-        Récupère une frame de la file d'attente ou génère une frame d'attente
+        Récupère la frame la plus récente (sans copie) ou génère une frame d'attente
         """
-        try:
-            if not self.frame_buffers[direction].empty():
-                return self.frame_buffers[direction].get(block=False)
-            else:
-                # Générer une frame d'attente
-                display_width, display_height = 400, 300
-                wait_frame = np.zeros((display_height + 30, display_width, 3), dtype=np.uint8)
-                title_bar = np.zeros((30, display_width, 3), dtype=np.uint8)
-                color = colors[direction]
-                cv2.rectangle(title_bar, (0, 0), (display_width, 30), color, -1)
-                cv2.putText(title_bar, f"{direction.upper()}: En attente...", (10, 20), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-                cv2.putText(wait_frame[30:, :], "En attente de vidéo...", (80, 150), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
-                return np.vstack((title_bar, wait_frame[30:, :]))
-        except Empty:
-            # Gérer le cas où la queue est vide entre le check et le get
-            display_width, display_height = 400, 300
-            wait_frame = np.zeros((display_height + 30, display_width, 3), dtype=np.uint8)
-            return wait_frame
+        seq, frame = self.frame_buffers[direction].read_latest()
+        if frame is not None:
+            return frame
+        else:
+            # Frame d'attente (en cache)
+            return self.overlays[direction].status_frame(
+                f"{direction.upper()}: En attente...", colors[direction], "En attente de vidéo...", (80, 150))
     
     def cleanup(self):
         """
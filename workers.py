@@ -0,0 +1,279 @@
+import atexit
+import multiprocessing as mp
+import os
+import queue
+import time
+import logging
+import cv2
+from frame_ring import SharedFrameRing
+from tracker import create_tracker
+from calibration import load_calibrations
+from counting import load_counters
+from roi import load_rois
+from pipeline import DirectionPipeline, frame_timestamp
+from scheduler import FrameScheduler
+from detectors import create_detector, InferenceWorker
+from detection_cache import open_cache
+from streams import stream_memory, process_rss
+from overlay import OverlayRenderer
+
+logger = logging.getLogger(__name__)
+
+
+def run_detection_worker(direction, video_path, color, tracker_mode, ring_name, frame_shape, slots,
+                         results, stop_event, total_count, realtime, latency_budget=0.2,
+                         detection_size=(200, 150), detector_mode='mog2', model_path=None,
+                         use_cache=False, generation=0):
+    """
+    Boucle décodage + détection + suivi d'une direction, exécutée dans son propre processus
+    Les frames annotées passent par l'anneau en mémoire partagée, les détections par la file `results`
+    En mode 'dnn', le processus a son propre thread d'inférence
+    use_cache: rejoue ou enregistre les détections dans le cache de détections
+    generation: jeton du démarrage, joint à chaque message pour écarter ceux d'un processus remplacé
+    """
+    # Un seul thread OpenCV par processus : le parallélisme vient des processus
+    cv2.setNumThreads(1)
+
+    display_height, display_width = frame_shape[0] - 30, frame_shape[1]
+    ring = SharedFrameRing.attach(ring_name, frame_shape, slots)
+
+    tracker = create_tracker(tracker_mode)
+    calibration = load_calibrations({direction: video_path}).get(direction)
+    if calibration is not None:
+        tracker.ground_lookup = calibration.lookup(display_width, display_height)
+    # Seules les lignes servent ici (affichage) : le comptage reste dans le processus principal
+    lines = load_counters({direction: video_path}, size=(display_width, display_height))[direction].lines
+    roi = load_rois({direction: video_path}, {direction: detection_size})[direction]
+
+    inference_worker = None
+    if detector_mode == 'dnn':
+        try:
+            inference_worker = InferenceWorker(model_path)
+            inference_worker.start()
+        except cv2.error as e:
+            logger.error(f"Modèle DNN indisponible ({model_path}), repli sur MOG2 pour {direction}: {e}")
+            detector_mode = 'mog2'
+    detector = create_detector(detector_mode, direction, display_size=(display_width, display_height),
+                               detection_size=detection_size, roi=roi, inference_worker=inference_worker)
+    pipeline = DirectionPipeline(direction, color, tracker, lines=lines,
+                                 display_size=(display_width, display_height), detector=detector)
+
+    # Barres de titre en cache, composées avec l'image dans l'anneau
+    overlay = OverlayRenderer((display_width, display_height))
+
+    cached, recorder = None, None
+    completed = False
+
+    media_time = 0.0
+    cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+    try:
+        if not cap.isOpened():
+            logger.error(f"Impossible d'ouvrir la vidéo {video_path} pour la direction {direction}")
+            return
+
+        source_fps = cap.get(cv2.CAP_PROP_FPS)
+        if not source_fps or source_fps <= 0:
+            source_fps = 25.0
+        frame_index = 0
+        scheduler = FrameScheduler(source_fps, latency_budget=latency_budget, realtime=realtime)
+        if use_cache:
+            cached, recorder = open_cache(os.path.abspath(video_path), pipeline, scheduler)
+        decoded = None
+
+        while not stop_event.is_set():
+            if not cap.grab():
+                completed = True
+                break
+            frame_index += 1
+            media_time = frame_timestamp(cap, frame_index, source_fps)
+            if scheduler.should_drop(media_time):
+                continue
+            ret, decoded = cap.retrieve(decoded)
+            if not ret:
+                completed = True
+                break
+
+            if scheduler.should_detect():
+                # Frame composée sur place dans l'emplacement réservé de l'anneau, publiée par commit()
+                frame_with_title = ring.begin_write()
+                try:
+                    frame = overlay.load(decoded, frame_with_title)
+                    started = time.perf_counter()
+                    if cached is not None and cached.covers(frame_index):
+                        tracked_objects = pipeline.replay(frame, *cached.lookup(frame_index))
+                    else:
+                        if cached is not None:
+                            pipeline.tracker.id_count = cached.next_id
+                            cached = None
+                        tracked_objects = pipeline.process(frame, media_time)
+                        if recorder is not None:
+                            recorder.add(frame_index, media_time, tracked_objects,
+                                         pipeline.last_classes, pipeline.last_lanes)
+                    overlay.draw_title(frame_with_title, f"{direction.upper()}: {total_count.value} objets",
+                                       color)
+                finally:
+                    ring.commit()
+                scheduler.record_detection(time.perf_counter() - started, media_time)
+                # Consommation du processus, propre à cette direction
+                usage = {'cpu_time': time.process_time(), 'memory_bytes': stream_memory(ring, pipeline),
+                         'rss_bytes': process_rss()}
+                results.put(('detections', direction, generation, media_time, tracked_objects, pipeline.last_lanes,
+                             pipeline.last_classes, pipeline.current_count, pipeline.last_average_speed,
+                             {**scheduler.stats(), **pipeline.stats()}, usage))
+
+            scheduler.wait(media_time)
+    except Exception as e:
+        logger.error(f"Erreur dans le processus de détection {direction}: {e}")
+    finally:
+        cap.release()
+        if inference_worker is not None:
+            inference_worker.stop()
+        if recorder is not None:
+            recorder.save(completed)
+        ring.close()
+        results.put(('ended', direction, generation, media_time))
+
+
+class DetectionWorkerPool:
+    """
+    Un processus de détection par direction, avec un anneau de frames en mémoire partagée
+    et une file commune pour remonter détections et statistiques au processus principal
+    """
+    def __init__(self, frame_shape=(330, 400, 3), slots=4):
+        self.frame_shape = frame_shape
+        self.slots = slots
+        # 'spawn' : même comportement sous Windows et Linux, sans hériter des threads Flask
+        self.context = mp.get_context('spawn')
+        self.results = self.context.Queue()
+        self.stop_events = {}
+        self.rings = {}
+        self.processes = {}
+        self.totals = {}
+        # Jeton du dernier démarrage de chaque direction
+        self.generations = {}
+        self._next_generation = 0
+        # Anneaux dont la fermeture a échoué (vue encore utilisée), réessayée plus tard
+        self.pending_close = []
+        # Libération de la mémoire partagée à la sortie de l'application
+        atexit.register(self.close)
+
+    def start(self, direction, video_path, color, tracker_mode='euclidean', realtime=True,
+              latency_budget=0.2, frame_shape=None, detection_size=(200, 150), detector_mode='mog2',
+              model_path=None, use_cache=False):
+        """
+        Démarre le processus de détection d'une direction
+        frame_shape: forme des frames diffusées de cette direction (par défaut celle du pool)
+        """
+        self.stop(direction)
+        self._close_ring(direction)
+        self._retry_pending_close()
+
+        # Nouveau jeton : les messages encore en file de l'ancien processus seront ignorés
+        self._next_generation += 1
+        generation = self._next_generation
+        self.generations[direction] = generation
+
+        frame_shape = tuple(frame_shape or self.frame_shape)
+        ring = SharedFrameRing(frame_shape, self.slots)
+        total = self.context.Value('i', 0, lock=False)
+        stop_event = self.context.Event()
+        process = self.context.Process(
+            target=run_detection_worker,
+            args=(direction, video_path, color, tracker_mode, ring.name, frame_shape, self.slots,
+                  self.results, stop_event, total, realtime, latency_budget, detection_size,
+                  detector_mode, model_path, use_cache, generation),
+            daemon=True
+        )
+        process.start()
+
+        self.rings[direction] = ring
+        self.totals[direction] = total
+        self.stop_events[direction] = stop_event
+        self.processes[direction] = process
+
+    def poll(self, timeout=0.1):
+        """
+        Retourne le prochain message des processus ou None
+        """
+        try:
+            return self.results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def is_current(self, direction, generation):
+        """
+        Vrai si le message vient du dernier démarrage de la direction
+        """
+        return self.generations.get(direction) == generation
+
+    def set_total(self, direction, total):
+        """
+        Transmet au processus le total compté (affiché dans la barre de titre)
+        """
+        if direction in self.totals:
+            self.totals[direction].value = total
+
+    def stop(self, direction, timeout=2.0):
+        """
+        Demande l'arrêt du processus d'une direction et attend sa fin
+        """
+        process = self.processes.pop(direction, None)
+        if process is None:
+            return
+        # Référence gardée jusqu'à la fin du processus : un processus encore en démarrage
+        # doit pouvoir ouvrir l'événement
+        stop_event = self.stop_events.pop(direction)
+        stop_event.set()
+        if process.is_alive():
+            process.join(timeout)
+        if process.is_alive():
+            process.terminate()
+            # Processus réellement terminé au retour : plus aucun accès à son anneau
+            process.join()
+
+    def remove(self, direction, timeout=2.0):
+        """
+        Arrête le processus d'une direction et libère son anneau de frames
+        """
+        self.stop(direction, timeout)
+        self.totals.pop(direction, None)
+        self.generations.pop(direction, None)
+        self._close_ring(direction)
+
+    def stop_all(self, timeout=2.0):
+        """
+        Arrête tous les processus; les anneaux restent lisibles pour afficher la dernière frame
+        """
+        # Signaler l'arrêt à tous avant d'attendre chacun
+        for stop_event in self.stop_events.values():
+            stop_event.set()
+        for direction in list(self.processes):
+            self.stop(direction, timeout)
+        self._retry_pending_close()
+
+    def close(self):
+        """
+        Arrête les processus et libère tous les anneaux de frames
+        """
+        self.stop_all()
+        for direction in list(self.rings):
+            self._close_ring(direction)
+        self._retry_pending_close()
+
+    def _close_ring(self, direction):
+        ring = self.rings.pop(direction, None)
+        if ring is not None:
+            try:
+                ring.close()
+            except BufferError:
+                # Une vue est encore utilisée par un client : nouvel essai au prochain démarrage
+                logger.warning(f"Anneau de frames {direction} encore utilisé, fermeture différée")
+                self.pending_close.append((direction, ring))
+
+    def _retry_pending_close(self):
+        pending, self.pending_close = self.pending_close, []
+        for direction, ring in pending:
+            try:
+                ring.close()
+            except BufferError:
+                self.pending_close.append((direction, ring))